@@ -0,0 +1,175 @@
+from config.settings import settings
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import re
+import threading
+
+class ContextBuilder:
+    """Assembles agent input against a token budget.
+
+    Sections go from most to least stable (customer profile, cart, history, the menu items
+    ranked against this message, current message) so consecutive turns share the prefix
+    after the agent instructions for as long as possible, which lets the provider reuse
+    its prompt cache; the menu slice changes almost every turn, so it comes last. When
+    the budget is exceeded the oldest history goes first, then the least relevant menu items.
+    """
+
+    def __init__(self, max_tokens: int = 1200, menu_top_k: int = 8, history_limit: int = 6,
+                 history_chars: int = 240):
+        self.max_tokens = max_tokens
+        self.menu_top_k = menu_top_k
+        self.history_limit = history_limit
+        self.history_chars = history_chars
+        self._lock = threading.Lock()
+        self.stats = {"turns": 0, "total_tokens": 0, "max_tokens": 0, "last_tokens": 0, "trimmed_turns": 0}
+        # Agent latency by prompt size, so prompt growth shows up next to its cost
+        self._latency_by_size: Dict[str, List[float]] = {}
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token count (~4 characters per token for English/Roman Urdu text)"""
+        return (len(text) + 3) // 4
+
+    def build_restaurant_context(self, user_data: Dict, phone_number: str, message: str, intents: FrozenSet[str],
+                                 cart_items: List, menu_items: List[Dict], history: Dict,
+                                 is_voice: bool = False, is_new_session: bool = False,
+                                 show_menu: bool = False, instructions: str = "") -> str:
+        """Context for the restaurant agent"""
+        profile = (f"CUSTOMER: {user_data.get('name', '')} (Phone: {phone_number})\n"
+                   f"ADDRESS: {user_data.get('address', '')}, {user_data.get('city', '')}")
+
+        ranked_menu = self._rank_menu(message, menu_items)
+
+        if cart_items:
+            cart = "; ".join(f"{item.quantity}x {item.name} (#{item.id})" for item in cart_items)
+            cart_total = sum(item.subtotal for item in cart_items)
+            cart = f"CART: {cart} = PKR {cart_total:.0f}"
+        else:
+            cart = "CART: empty"
+
+        flags = ", ".join(sorted(intents)) or "none"
+        if is_new_session:
+            flags += ", new_session"
+        if show_menu:
+            flags += ", show_menu"
+        current = f"INTENTS: {flags}\nMESSAGE{' (voice)' if is_voice else ''}: {message}"
+
+        history_lines = self._history_lines(history)
+
+        fixed_tokens = (self.estimate_tokens(instructions) + self.estimate_tokens(profile)
+                        + self.estimate_tokens(cart) + self.estimate_tokens(current))
+        trimmed = False
+        while True:
+            menu = self._menu_section(ranked_menu)
+            recent = "RECENT:\n" + "\n".join(history_lines) if history_lines else "RECENT: none"
+            context = "\n\n".join([profile, cart, recent, menu, current])
+            total = fixed_tokens + self.estimate_tokens(menu) + self.estimate_tokens(recent)
+            if total <= self.max_tokens:
+                break
+            trimmed = True
+            if history_lines:
+                history_lines = history_lines[1:]
+            elif len(ranked_menu) > 1:
+                ranked_menu = ranked_menu[:-1]
+            else:
+                break
+
+        self._record(total, trimmed)
+        return context
+
+    def build_registration_context(self, phone_number: str, message: str, history: Dict,
+                                   is_voice: bool = False, draft: Optional[Dict] = None,
+                                   instructions: str = "") -> str:
+        """Context for the registration agent"""
+        header = f"NEW USER REGISTRATION\nPhone: {phone_number}"
+        if draft:
+            header += "\nDETAILS SO FAR: " + ", ".join(f"{field}={value}" for field, value in draft.items())
+        current = f"MESSAGE{' (voice)' if is_voice else ''}: {message}"
+        history_lines = self._history_lines(history)
+
+        fixed_tokens = self.estimate_tokens(instructions) + self.estimate_tokens(header) + self.estimate_tokens(current)
+        trimmed = False
+        while True:
+            recent = "RECENT:\n" + "\n".join(history_lines) if history_lines else "RECENT: none"
+            total = fixed_tokens + self.estimate_tokens(recent)
+            if total <= self.max_tokens or not history_lines:
+                break
+            trimmed = True
+            history_lines = history_lines[1:]
+
+        self._record(total, trimmed)
+        return "\n\n".join([header, recent, current])
+
+    def _rank_menu(self, message: str, menu_items: List[Dict]) -> List[Dict]:
+        """The top-K menu items by word overlap with the message, kept in menu order"""
+        words = self._words(message)
+        scored: List[Tuple[int, int, Dict]] = []
+        for position, item in enumerate(menu_items):
+            item_words = self._words(f"{item.get('name', '')} {item.get('category', '')}")
+            scored.append((-len(words & item_words), position, item))
+        top = sorted(scored, key=lambda entry: (entry[0], entry[1]))[:self.menu_top_k]
+        # Least relevant last, so trimming to the budget drops those first
+        return [item for _, _, item in top]
+
+    @staticmethod
+    def _words(text: str) -> set:
+        # Crude singularisation so 'pizzas' matches 'Pizza'
+        return {word.rstrip("s") if len(word) > 3 else word for word in re.findall(r"\w+", (text or "").lower())}
+
+    @staticmethod
+    def _menu_section(items: List[Dict]) -> str:
+        if not items:
+            return "MENU ITEMS: unavailable"
+        # Listed by id so the section stays the same across turns about the same items
+        items = sorted(items, key=lambda item: str(item.get("id")).zfill(6))
+        lines = [f"#{item.get('id')} {item.get('name')} - PKR {item.get('price', 0):.0f}" for item in items]
+        return "MENU ITEMS (id, name, price):\n" + "\n".join(lines)
+
+    def _history_lines(self, history: Optional[Dict]) -> List[str]:
+        messages = (history or {}).get("messages", [])[-self.history_limit:]
+        lines = []
+        for msg in messages:
+            role = "Customer" if msg.get("role") == "user" else "Assistant"
+            text = " ".join(str(msg.get("message", "")).split())
+            if len(text) > self.history_chars:
+                text = text[:self.history_chars] + "…"
+            lines.append(f"{role}: {text}")
+        return lines
+
+    def _record(self, tokens: int, trimmed: bool):
+        with self._lock:
+            self.stats["turns"] += 1
+            self.stats["total_tokens"] += tokens
+            self.stats["last_tokens"] = tokens
+            self.stats["max_tokens"] = max(self.stats["max_tokens"], tokens)
+            if trimmed:
+                self.stats["trimmed_turns"] += 1
+        print(f"🧮 Prompt size: ~{tokens} tokens{' (trimmed to budget)' if trimmed else ''}")
+
+    def observe_run(self, prompt_tokens: int, seconds: float):
+        """Record how long an agent run took for a prompt of this size"""
+        bucket = f"<{(prompt_tokens // 500 + 1) * 500}"
+        with self._lock:
+            totals = self._latency_by_size.setdefault(bucket, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            turns = self.stats["turns"]
+            return {
+                **self.stats,
+                "avg_tokens": round(self.stats["total_tokens"] / turns, 1) if turns else 0.0,
+                "budget": self.max_tokens,
+                "avg_latency_s_by_tokens": {
+                    bucket: round(total / count, 2)
+                    for bucket, (count, total) in sorted(self._latency_by_size.items(),
+                                                         key=lambda entry: int(entry[0][1:]))
+                }
+            }
+
+# Global instance
+context_builder = ContextBuilder(
+    max_tokens=settings.CONTEXT_MAX_TOKENS,
+    menu_top_k=settings.CONTEXT_MENU_TOP_K,
+    history_limit=settings.CONTEXT_HISTORY_MESSAGES
+)
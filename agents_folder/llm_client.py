@@ -0,0 +1,107 @@
+from agents import AsyncOpenAI, OpenAIChatCompletionsModel, RunConfig
+from config.settings import settings
+from utils.run_trace import current_turn
+from typing import Dict, Optional
+import importlib.util
+import threading
+import time
+import httpx
+
+class InstrumentedChatCompletionsModel(OpenAIChatCompletionsModel):
+    """Chat completions model that records each call's latency and tokens in the current turn trace"""
+
+    async def get_response(self, *args, **kwargs):
+        turn = current_turn()
+        if turn is None:
+            return await super().get_response(*args, **kwargs)
+        started = time.monotonic()
+        try:
+            response = await super().get_response(*args, **kwargs)
+        except Exception as e:
+            turn.add_llm_call(str(self.model), time.monotonic() - started, error=type(e).__name__)
+            raise
+        usage = response.usage
+        turn.add_llm_call(str(self.model), time.monotonic() - started, usage.input_tokens, usage.output_tokens)
+        return response
+
+class LLMClientManager:
+    """One pooled LLM client per process, shared by every agent.
+
+    The httpx pool keeps connections to the Gemini endpoint alive between turns (and uses
+    HTTP/2 multiplexing when the `h2` package is installed), so TLS handshakes only happen
+    when the pool grows. A trace hook counts new connections against requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client: Optional[AsyncOpenAI] = None
+        self._run_configs: Dict[str, RunConfig] = {}
+        self.http2 = settings.LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+        self.stats = {"requests": 0, "connections_opened": 0, "tls_handshakes": 0, "http2_requests": 0}
+
+    def get_client(self) -> AsyncOpenAI:
+        """The process-wide AsyncOpenAI client (created on first use)"""
+        with self._lock:
+            if self._client is None:
+                if settings.LLM_HTTP2 and not self.http2:
+                    print("⚠️ HTTP/2 requested for the LLM client but 'h2' is not installed; using HTTP/1.1")
+                http_client = httpx.AsyncClient(
+                    http2=self.http2,
+                    limits=httpx.Limits(
+                        max_connections=settings.LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS
+                    ),
+                    timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT_SECONDS, connect=10.0),
+                    event_hooks={"request": [self._attach_trace]}
+                )
+                self._client = AsyncOpenAI(
+                    api_key=settings.GEMINI_API_KEY,
+                    base_url=settings.GEMINI_BASE_URL,
+                    http_client=http_client
+                )
+            return self._client
+
+    def get_run_config(self, model_name: Optional[str] = None) -> RunConfig:
+        """Shared run configuration for a model (default MODEL_NAME) using the pooled client"""
+        model_name = model_name or settings.MODEL_NAME
+        client = self.get_client()
+        with self._lock:
+            if model_name not in self._run_configs:
+                model = InstrumentedChatCompletionsModel(
+                    model=model_name,
+                    openai_client=client
+                )
+                self._run_configs[model_name] = RunConfig(
+                    model=model,
+                    tracing_disabled=True
+                )
+            return self._run_configs[model_name]
+
+    async def _attach_trace(self, request: httpx.Request):
+        self.stats["requests"] += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: Dict):
+        if event_name == "connection.connect_tcp.complete":
+            self.stats["connections_opened"] += 1
+        elif event_name == "connection.start_tls.complete":
+            self.stats["tls_handshakes"] += 1
+        elif event_name == "http2.send_request_headers.started":
+            self.stats["http2_requests"] += 1
+
+    async def aclose(self):
+        """Close the pooled connections (on shutdown)"""
+        if self._client is not None:
+            await self._client.close()
+
+    def get_stats(self) -> Dict:
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "http2": self.http2,
+            "connection_reuse": round(1 - self.stats["connections_opened"] / requests, 3) if requests else 0.0
+        }
+
+# Global instance
+llm_client_manager = LLMClientManager()
@@ -0,0 +1,197 @@
+from collections import OrderedDict, deque
+from config.settings import settings
+from typing import Deque, Dict, List, Optional
+import asyncio
+import time
+
+class LLMOverloadedError(Exception):
+    """Raised when a request would wait in the LLM queue longer than its deadline"""
+
+class LLMTicket:
+    def __init__(self, phone_number: str, priority: int, estimated_tokens: int):
+        self.phone_number = phone_number
+        self.priority = priority
+        self.estimated_tokens = estimated_tokens
+        self.enqueued_at = time.monotonic()
+        self.started_at = 0.0
+        self.future: Optional[asyncio.Future] = None
+
+    @property
+    def queue_wait(self) -> float:
+        return (self.started_at or time.monotonic()) - self.enqueued_at
+
+class LLMScheduler:
+    """Admission control for agent runs on the bot event loop.
+
+    At most `max_in_flight` runs talk to the model at once and estimated token use is held
+    under a tokens-per-minute budget. Waiting runs are served by priority class
+    (checkout before ordering before chat), and round-robin between customers within a
+    class so one chatty customer can't starve the rest. A request that would wait longer
+    than `max_queue_wait_seconds` is shed so the caller can send a quick canned reply.
+    """
+
+    CHECKOUT = 0
+    ORDERING = 1
+    CHAT = 2
+    PRIORITY_NAMES = {CHECKOUT: "checkout", ORDERING: "ordering", CHAT: "chat"}
+
+    def __init__(self, max_in_flight: int = 8, tokens_per_minute: int = 200000,
+                 max_queue_wait_seconds: float = 8.0):
+        self.max_in_flight = max(1, max_in_flight)
+        self.tokens_per_minute = max(1, tokens_per_minute)
+        self.max_queue_wait_seconds = max_queue_wait_seconds
+        # priority -> phone -> waiting tickets; dict order is the round-robin order
+        self._queues: List["OrderedDict[str, Deque[LLMTicket]]"] = [OrderedDict() for _ in self.PRIORITY_NAMES]
+        self._queued = 0
+        self.in_flight = 0
+        self._budget = float(self.tokens_per_minute)
+        self._budget_updated = time.monotonic()
+        self._refill_timer: Optional[asyncio.TimerHandle] = None
+        self._avg_run_seconds: Optional[float] = None
+        self._queue_waits: Deque[float] = deque(maxlen=1000)
+        self._run_latencies: Deque[float] = deque(maxlen=1000)
+        self.stats = {"admitted": 0, "shed": 0, "throttled": 0, "tokens_used": 0,
+                      **{f"shed_{name}": 0 for name in self.PRIORITY_NAMES.values()}}
+
+    async def acquire(self, phone_number: str, priority: int, estimated_tokens: int,
+                      max_wait: Optional[float] = None) -> LLMTicket:
+        """Wait for a slot; raises LLMOverloadedError instead of waiting past the deadline"""
+        ticket = LLMTicket(phone_number, priority, min(estimated_tokens, self.tokens_per_minute))
+        max_wait = self.max_queue_wait_seconds if max_wait is None else min(max_wait, self.max_queue_wait_seconds)
+        if max_wait <= 0 or self.expected_wait(priority, ticket.estimated_tokens) > max_wait:
+            self._shed(ticket, max_wait)
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(phone_number, deque()).append(ticket)
+        self._queued += 1
+        self._pump()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if not ticket.future.done():
+                self._remove(ticket)
+                self._shed(ticket, max_wait)
+        except asyncio.CancelledError:
+            if ticket.future.done():
+                self.release(ticket)
+            else:
+                self._remove(ticket)
+            raise
+        return ticket
+
+    def release(self, ticket: LLMTicket, actual_tokens: Optional[int] = None):
+        """Give the slot back, correcting the token budget with the real usage if known"""
+        self.in_flight -= 1
+        elapsed = time.monotonic() - ticket.started_at
+        self._run_latencies.append(elapsed)
+        if self._avg_run_seconds is None:
+            self._avg_run_seconds = elapsed
+        else:
+            self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * elapsed
+        if actual_tokens is not None:
+            self._refill()
+            self._budget = max(-self.tokens_per_minute, self._budget - (actual_tokens - ticket.estimated_tokens))
+            self.stats["tokens_used"] += actual_tokens - ticket.estimated_tokens
+        self._pump()
+
+    def expected_wait(self, priority: int, tokens: int = 0) -> float:
+        """Rough time until a new request of this priority would start"""
+        ahead = sum(len(waiting) for queue in self._queues[:priority + 1] for waiting in queue.values())
+        busy = self.in_flight + ahead - self.max_in_flight + 1
+        # No estimate until a run has finished; the queue deadline still applies
+        wait = max(0, busy) / self.max_in_flight * (self._avg_run_seconds or 0.0)
+        self._refill()
+        deficit = tokens - self._budget
+        if deficit > 0:
+            wait = max(wait, deficit * 60 / self.tokens_per_minute)
+        return wait
+
+    def _pump(self):
+        while self.in_flight < self.max_in_flight:
+            ticket = self._peek()
+            if ticket is None:
+                return
+            self._refill()
+            if self._budget < ticket.estimated_tokens:
+                self.stats["throttled"] += 1
+                if self._refill_timer is None:
+                    delay = (ticket.estimated_tokens - self._budget) * 60 / self.tokens_per_minute
+                    self._refill_timer = asyncio.get_running_loop().call_later(delay, self._on_refill)
+                return
+            self._pop(ticket)
+            self._budget -= ticket.estimated_tokens
+            self.in_flight += 1
+            ticket.started_at = time.monotonic()
+            self._queue_waits.append(ticket.queue_wait)
+            self.stats["admitted"] += 1
+            self.stats["tokens_used"] += ticket.estimated_tokens
+            ticket.future.set_result(None)
+
+    def _on_refill(self):
+        self._refill_timer = None
+        self._pump()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._budget = min(self.tokens_per_minute,
+                           self._budget + (now - self._budget_updated) * self.tokens_per_minute / 60)
+        self._budget_updated = now
+
+    def _peek(self) -> Optional[LLMTicket]:
+        for queue in self._queues:
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _pop(self, ticket: LLMTicket):
+        queue = self._queues[ticket.priority]
+        waiting = queue[ticket.phone_number]
+        waiting.popleft()
+        if waiting:
+            # This customer goes to the back of the rotation
+            queue.move_to_end(ticket.phone_number)
+        else:
+            del queue[ticket.phone_number]
+        self._queued -= 1
+
+    def _remove(self, ticket: LLMTicket):
+        queue = self._queues[ticket.priority]
+        waiting = queue.get(ticket.phone_number)
+        if waiting and ticket in waiting:
+            waiting.remove(ticket)
+            if not waiting:
+                del queue[ticket.phone_number]
+            self._queued -= 1
+
+    def _shed(self, ticket: LLMTicket, max_wait: float):
+        name = self.PRIORITY_NAMES[ticket.priority]
+        self.stats["shed"] += 1
+        self.stats[f"shed_{name}"] += 1
+        raise LLMOverloadedError(f"LLM queue too long for {name} request (wait > {max_wait:.1f}s)")
+
+    def get_stats(self) -> Dict:
+        def percentile(values: Deque[float], p: float) -> float:
+            ordered = sorted(values)
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+        self._refill()
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "queued": self._queued,
+            "token_budget_left": int(self._budget),
+            "queue_wait_p50_s": percentile(self._queue_waits, 0.50),
+            "queue_wait_p95_s": percentile(self._queue_waits, 0.95),
+            "model_latency_p50_s": percentile(self._run_latencies, 0.50),
+            "model_latency_p95_s": percentile(self._run_latencies, 0.95)
+        }
+
+# Global instance (one per process; used from the bot event loop)
+llm_scheduler = LLMScheduler(
+    max_in_flight=settings.LLM_MAX_IN_FLIGHT,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+    max_queue_wait_seconds=settings.LLM_MAX_QUEUE_WAIT_SECONDS
+)
@@ -0,0 +1,204 @@
+from agents import Agent, RunHooks, Runner
+from collections import OrderedDict, deque
+from config.settings import settings
+from .llm_client import llm_client_manager
+from utils.run_trace import current_turn
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+import time
+
+class ToolCallTracker(RunHooks):
+    """Records which tools an agent run started"""
+
+    def __init__(self):
+        self.tool_calls: List[str] = []
+
+    async def on_tool_start(self, context, agent, tool):
+        self.tool_calls.append(tool.name)
+        turn = current_turn()
+        if turn is not None:
+            turn.tools_started.append(tool.name)
+
+class ModelRouter:
+    """Picks a model tier per agent turn and escalates when the fast model falls short.
+
+    Simple restaurant turns (adding items, cart, menu, greetings, confirmation) go to the
+    fast model; registration, open-ended messages and customers whose recent turns needed
+    escalation go to the strong one. A fast run is retried on the strong model when it
+    errors (e.g. a malformed tool call), answers emptily or unsure, or skips the tool its
+    intent needs, unless it already changed the cart or placed an order.
+    """
+
+    FAST = "fast"
+    STRONG = "strong"
+
+    SIMPLE_INTENTS = {"adding_items", "view_order", "confirmation", "menu_request", "greeting"}
+    SIDE_EFFECT_TOOLS = {"add_to_order", "confirm_order", "validate_and_save_user"}
+    # Tool the agent is expected to call for an intent
+    EXPECTED_TOOLS = {"adding_items": "add_to_order", "confirmation": "confirm_order",
+                      "view_order": "view_current_order"}
+    LOW_CONFIDENCE_PHRASES = (
+        "not sure", "don't understand", "didn't understand", "do not understand", "could you clarify",
+        "unable to", "can't help", "cannot help", "i'm sorry, but"
+    )
+
+    def __init__(self, fast_model: str, strong_model: str, fast_price: str = "0,0", strong_price: str = "0,0",
+                 max_simple_words: int = 25, sticky_seconds: float = 600, max_tracked_customers: int = 10000):
+        self.models = {self.FAST: fast_model, self.STRONG: strong_model}
+        # USD per million input and output tokens
+        self.prices = {self.FAST: self._parse_price(fast_price), self.STRONG: self._parse_price(strong_price)}
+        self.max_simple_words = max_simple_words
+        self.sticky_seconds = sticky_seconds
+        self.max_tracked_customers = max_tracked_customers
+        self._escalated: "OrderedDict[str, float]" = OrderedDict()
+        self._latencies: Dict[str, Deque[float]] = {tier: deque(maxlen=1000) for tier in self.models}
+        self.stats = {
+            tier: {"runs": 0, "errors": 0, "model_calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+            for tier in self.models
+        }
+        self.escalations: Dict[str, int] = {}
+        self.escalations_skipped = 0
+
+    @staticmethod
+    def _parse_price(price: str) -> Tuple[float, float]:
+        input_price, output_price = (float(part) for part in price.split(","))
+        return input_price, output_price
+
+    @property
+    def enabled(self) -> bool:
+        return self.models[self.FAST] != self.models[self.STRONG]
+
+    def choose(self, agent_kind: str, intents: FrozenSet[str], message: str, phone_number: str = "",
+               is_voice: bool = False) -> str:
+        """Model tier for a turn"""
+        if not self.enabled or agent_kind != "restaurant":
+            return self.STRONG
+        escalated_at = self._escalated.get(phone_number)
+        if escalated_at and time.time() - escalated_at < self.sticky_seconds:
+            return self.STRONG
+        if is_voice or not intents & self.SIMPLE_INTENTS:
+            return self.STRONG
+        if len((message or "").split()) > self.max_simple_words:
+            return self.STRONG
+        return self.FAST
+
+    async def run(self, agent: Agent, context: str, tier: str, phone_number: str = "",
+                  intents: FrozenSet[str] = frozenset()):
+        """Run an agent on the chosen tier, escalating once if needed.
+
+        Returns (result, tool_calls, total_tokens); re-raises the last error if every attempt failed.
+        """
+        tool_calls: List[str] = []
+        total_tokens = 0
+        while True:
+            tracker = ToolCallTracker()
+            started = time.time()
+            result, error = None, None
+            try:
+                result = await Runner.run(
+                    starting_agent=agent,
+                    input=context,
+                    run_config=llm_client_manager.get_run_config(self.models[tier]),
+                    hooks=tracker
+                )
+            except Exception as e:
+                error = e
+            tool_calls.extend(tracker.tool_calls)
+            total_tokens += self._record(tier, time.time() - started, result, error)
+
+            reason = self._escalation_reason(tier, result, error, tracker.tool_calls, intents)
+            if reason is None:
+                break
+            if set(tracker.tool_calls) & self.SIDE_EFFECT_TOOLS:
+                # Re-running would repeat the side effect; keep what the fast model did
+                self.escalations_skipped += 1
+                break
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+            self._remember_escalation(phone_number)
+            turn = current_turn()
+            if turn is not None:
+                turn.escalations.append(reason)
+                turn.tier = self.STRONG
+            print(f"⤴️ Escalating {agent.name} from {self.models[tier]} to "
+                  f"{self.models[self.STRONG]} ({reason})")
+            tier = self.STRONG
+
+        if error is not None:
+            raise error
+        return result, tool_calls, total_tokens
+
+    def _escalation_reason(self, tier: str, result, error: Optional[Exception], tool_calls: List[str],
+                           intents: FrozenSet[str]) -> Optional[str]:
+        if tier == self.STRONG:
+            return None
+        if error is not None:
+            return f"error:{type(error).__name__}"
+        output = str(result.final_output or "").strip()
+        if len(output) < 2:
+            return "empty_output"
+        lowered = output.lower()
+        if any(phrase in lowered for phrase in self.LOW_CONFIDENCE_PHRASES):
+            return "low_confidence"
+        for intent, tool in self.EXPECTED_TOOLS.items():
+            if intent in intents and tool not in tool_calls:
+                return f"missing_tool:{tool}"
+        return None
+
+    def _record(self, tier: str, seconds: float, result, error: Optional[Exception]) -> int:
+        stats = self.stats[tier]
+        stats["runs"] += 1
+        self._latencies[tier].append(seconds)
+        if error is not None:
+            stats["errors"] += 1
+            return 0
+        usage = result.context_wrapper.usage
+        input_price, output_price = self.prices[tier]
+        stats["model_calls"] += usage.requests
+        stats["input_tokens"] += usage.input_tokens
+        stats["output_tokens"] += usage.output_tokens
+        stats["cost_usd"] += (usage.input_tokens * input_price + usage.output_tokens * output_price) / 1_000_000
+        return usage.total_tokens
+
+    def _remember_escalation(self, phone_number: str):
+        if not phone_number:
+            return
+        self._escalated[phone_number] = time.time()
+        self._escalated.move_to_end(phone_number)
+        while len(self._escalated) > self.max_tracked_customers:
+            self._escalated.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        def percentile(values: Deque[float], p: float) -> float:
+            ordered = sorted(values)
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+
+        fast_runs = self.stats[self.FAST]["runs"]
+        escalated = sum(self.escalations.values())
+        tiers = {}
+        for tier, model in self.models.items():
+            stats = self.stats[tier]
+            tiers[tier] = {
+                **stats,
+                "model": model,
+                "cost_usd": round(stats["cost_usd"], 4),
+                "model_calls_per_run": round(stats["model_calls"] / stats["runs"], 2) if stats["runs"] else 0.0,
+                "latency_p50_s": percentile(self._latencies[tier], 0.50),
+                "latency_p95_s": percentile(self._latencies[tier], 0.95)
+            }
+        return {
+            "enabled": self.enabled,
+            **tiers,
+            "escalations": dict(self.escalations),
+            "escalations_skipped": self.escalations_skipped,
+            "escalation_rate": round(escalated / fast_runs, 3) if fast_runs else 0.0
+        }
+
+# Global instance
+model_router = ModelRouter(
+    fast_model=settings.FAST_MODEL_NAME,
+    strong_model=settings.STRONG_MODEL_NAME,
+    fast_price=settings.FAST_MODEL_PRICE,
+    strong_price=settings.STRONG_MODEL_PRICE,
+    sticky_seconds=settings.MODEL_ESCALATION_STICKY_SECONDS
+)
@@ -1,5 +1,5 @@
-from agents import Agent, AsyncOpenAI, OpenAIChatCompletionsModel, RunConfig
-from config.settings import settings
+from agents import Agent
+from .llm_client import llm_client_manager
 from tools.menu_tools import show_menu
 from tools.order_tools import add_to_order, view_current_order, confirm_order
 from tools.registration_tools import validate_name, validate_address, validate_and_save_user
@@ -8,24 +8,8 @@ from .prompts import RESTAURANT_AGENT_PROMPT, REGISTRATION_AGENT_PROMPT
 class AgentFactory:
     @staticmethod
     def _create_base_config():
-        """Create base configuration for agents"""
-        external_client = AsyncOpenAI(
-            api_key=settings.GEMINI_API_KEY,
-            base_url=settings.GEMINI_BASE_URL,
-        )
-
-        model = OpenAIChatCompletionsModel(
-            model=settings.MODEL_NAME,
-            openai_client=external_client
-        )
-
-        config = RunConfig(
-            model=model,
-            model_provider=external_client,
-            tracing_disabled=True
-        )
-
-        return config, external_client
+        """Create base configuration for agents (shared pooled client)"""
+        return llm_client_manager.get_run_config(), llm_client_manager.get_client()
 
     @staticmethod
     def create_registration_agent():
@@ -61,3 +45,14 @@ class AgentFactory:
         )
 
         return restaurant_agent, config
+
+    @staticmethod
+    def create_agents():
+        """Create both agents once; they share one run config and connection pool"""
+        registration_agent, config = AgentFactory.create_registration_agent()
+        restaurant_agent, _ = AgentFactory.create_restaurant_agent()
+        return {
+            "registration": registration_agent,
+            "restaurant": restaurant_agent,
+            "config": config
+        }
@@ -0,0 +1,166 @@
+from tools.menu_tools import show_menu_base
+from tools.order_tools import view_current_order_base
+from tools.registration_tools import validate_and_save_user_base
+from typing import Callable, Dict, FrozenSet, List, Optional
+import re
+
+class PlannedCall:
+    """A single tool call the planner is sure about, plus how to word the reply"""
+
+    def __init__(self, tool: str, func: Optional[Callable], args: tuple = (), template: str = "{result}",
+                 draft: Optional[Dict] = None):
+        self.tool = tool
+        self.func = func
+        self.args = args
+        self.template = template
+        # Registration details to remember for the next turn
+        self.draft = draft
+
+    def __repr__(self) -> str:
+        return f"PlannedCall({self.tool})"
+
+class ToolPlanner:
+    """Runs obvious single-tool turns without the LLM.
+
+    Registration: details are pulled out of labelled messages ("Name: ..., City: ...")
+    and explicit phrases ("my name is ...", "my address is ..."), and kept as a draft
+    between turns; the user is saved as soon as name, address and city are known, and
+    the next missing field is asked for from a template. Bare replies, questions and
+    refusals go to the registration agent. Restaurant: a cart question or a menu request
+    naming one category maps straight to its tool. Tool output is already WhatsApp-ready,
+    so templates are enough and the model is not asked to rephrase it.
+    """
+
+    FIELD_PATTERNS = {
+        "name": r"(?:name|naam)",
+        "address": r"(?:address|addr|pata)",
+        "city": r"(?:city|shehar|sheher)",
+        "postal_code": r"(?:postal\s*code|post\s*code|postcode|zip(?:\s*code)?)",
+    }
+    NAME_PHRASES = re.compile(r"^(?:my name is|my name's|name is|mera naam)\s+(.+?)(?:\s+hai)?$", re.I)
+    ADDRESS_PHRASES = re.compile(r"^(?:my address is|address is|i live at|i live in|deliver to)\s+(.+)$", re.I)
+    CITY_PHRASES = re.compile(r"^(?:my city is|city is|i am from|i'm from|from)\s+([a-z][a-z ]{1,30})$", re.I)
+    PLAIN_NAME = re.compile(r"^[a-z][a-z.'\- ]{1,40}$", re.I)
+    NOT_A_NAME = {"hi", "hello", "hey", "salam", "salaam", "aoa", "yes", "no", "ok", "okay", "menu",
+                  "thanks", "register", "help", "what", "why", "how", "hungry", "fine", "good"}
+    # A value containing one of these is a question, a refusal or a sentence, not a detail
+    NOT_A_DETAIL = {
+        "what", "whats", "why", "how", "when", "where", "who", "which",
+        "no", "not", "nope", "none", "nothing", "dont", "don't", "wont", "won't", "never", "later", "skip",
+        "rather", "prefer", "private", "secret", "you", "your",
+        "is", "are", "am", "was", "want", "need", "have", "has", "do", "does", "can", "could",
+        "would", "should", "will", "tell", "give", "share", "know", "show", "send", "help"
+    }
+
+    def __init__(self):
+        self.stats = {"planned": 0, "agent_turns": 0, "by_tool": {}}
+
+    def plan_registration(self, phone_number: str, message: str, draft: Dict) -> Optional[PlannedCall]:
+        """A save or a templated follow-up question, or None when the agent is needed"""
+        if "?" in message:
+            return None
+        found = self._extract_labelled(message)
+        if not found:
+            found = self._extract_phrase(message)
+        if not found or any(self._is_sentence(value) for value in found.values()):
+            return None
+
+        draft = {**draft, **found}
+        if all(draft.get(field) for field in ("name", "address", "city")):
+            args = (phone_number, draft["name"], draft["address"], draft["city"], draft.get("postal_code", ""))
+            return self._record(PlannedCall("validate_and_save_user", validate_and_save_user_base, args, draft={}))
+
+        if not draft.get("name"):
+            template = "Thanks! 😊 And what's your *name*?"
+        elif not draft.get("address"):
+            template = (f"Nice to meet you, *{draft['name']}*! 😊\n\n"
+                        "What's your *delivery address* and *city*?")
+        else:
+            template = "Got it! 📍 Which *city* is that in?"
+        return self._record(PlannedCall("registration_followup", None, template=template, draft=draft))
+
+    def plan_restaurant(self, phone_number: str, message: str, intents: FrozenSet[str],
+                        menu_items: List[Dict]) -> Optional[PlannedCall]:
+        """Cart or single-category menu turns, or None when the agent is needed"""
+        if any(char.isdigit() for char in message or ""):
+            return None
+        # Keyword tags only used for history summaries, and 'order'/'want' without a quantity
+        intents = intents - {"order_mention", "confirmation_mention", "adding_items"}
+        if "confirmation" in intents:
+            return None
+        if intents == {"view_order"}:
+            return self._record(PlannedCall("view_current_order", view_current_order_base, (phone_number,)))
+        if "menu_request" in intents and not intents - {"menu_request", "greeting"}:
+            words = set(re.findall(r"\w+", message.lower()))
+            categories = {item.get("category") for item in menu_items if item.get("category")}
+            named = [c for c in categories if {c.lower(), c.lower() + "s", c.lower().rstrip("s")} & words]
+            if len(named) == 1:
+                return self._record(PlannedCall("show_menu", show_menu_base, (named[0],)))
+        return None
+
+    def execute(self, plan: PlannedCall) -> str:
+        """Run the planned tool (blocking) and fill the reply template"""
+        result = plan.func(*plan.args) if plan.func else ""
+        return plan.template.format(result=result).strip()
+
+    def record_agent_turn(self):
+        self.stats["agent_turns"] += 1
+
+    def _record(self, plan: PlannedCall) -> PlannedCall:
+        self.stats["planned"] += 1
+        self.stats["by_tool"][plan.tool] = self.stats["by_tool"].get(plan.tool, 0) + 1
+        return plan
+
+    def _extract_labelled(self, message: str) -> Dict:
+        found = {}
+        # Each field runs until the next label, a newline or a semicolon
+        labels = "|".join(self.FIELD_PATTERNS.values())
+        for field, pattern in self.FIELD_PATTERNS.items():
+            match = re.search(rf"\b{pattern}\s*[:=\-]\s*(.+?)(?=\s*(?:[,;\n]\s*)?\b(?:{labels})\s*[:=\-]|[\n;]|$)",
+                              message, re.I)
+            if match:
+                value = match.group(1).strip(" ,.")
+                if value:
+                    found[field] = value
+        return found
+
+    def _extract_phrase(self, message: str) -> Dict:
+        text = " ".join(message.split()).strip(" .!")
+        match = self.NAME_PHRASES.match(text)
+        if match and self._looks_like_name(match.group(1)):
+            return {"name": match.group(1).strip().title()}
+        match = self.ADDRESS_PHRASES.match(text)
+        if match:
+            return self._split_address(match.group(1))
+        match = self.CITY_PHRASES.match(text)
+        if match:
+            return {"city": match.group(1).strip().title()}
+        return {}
+
+    def _split_address(self, text: str) -> Dict:
+        """'House 5, Street 2, Lahore' -> address and city (city only when it is clearly last)"""
+        parts = [part.strip() for part in text.split(",") if part.strip()]
+        if len(parts) >= 2 and re.fullmatch(r"[a-z][a-z ]{1,30}", parts[-1], re.I) and len(parts[-1].split()) <= 3:
+            return {"address": ", ".join(parts[:-1]), "city": parts[-1].title()}
+        return {"address": text.strip()}
+
+    def _looks_like_name(self, text: str) -> bool:
+        words = text.split()
+        return (bool(self.PLAIN_NAME.match(text)) and 1 <= len(words) <= 4
+                and not {word.lower() for word in words} & self.NOT_A_NAME)
+
+    def _is_sentence(self, value: str) -> bool:
+        return bool({word.lower() for word in re.findall(r"[\w']+", value)} & self.NOT_A_DETAIL)
+
+    def get_stats(self) -> Dict:
+        turns = self.stats["planned"] + self.stats["agent_turns"]
+        return {
+            **self.stats,
+            "by_tool": dict(self.stats["by_tool"]),
+            # A direct call saves at least the tool-call and continuation round trips
+            "model_calls_saved": self.stats["planned"] * 2,
+            "planned_rate": round(self.stats["planned"] / turns, 3) if turns else 0.0
+        }
+
+# Global instance
+tool_planner = ToolPlanner()
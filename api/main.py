@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import menu, order, auth  # Add auth import
+from api.routers import menu, order, auth, admin  # Add auth import
 
 app = FastAPI(
     title="Restaurant Menu & Order API",
@@ -40,6 +40,7 @@ app.add_middleware(
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(menu.router, prefix="/api/v1/menu", tags=["menu"])
 app.include_router(order.router, prefix="/api/v1/orders", tags=["orders"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -50,6 +51,7 @@ async def root():
             "auth": "/api/v1/auth",
             "menu": "/api/v1/menu",
             "orders": "/api/v1/orders",
+            "admin": "/api/v1/admin",
             "docs": "/docs",
             "redoc": "/redoc"
         }
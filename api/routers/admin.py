@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Query, Depends
+from api.services.admin_service import AdminAPIService
+from api.dependencies.auth import require_admin
+
+router = APIRouter()
+admin_service = AdminAPIService()
+
+@router.get("/agent-runs", dependencies=[Depends(require_admin)])
+async def get_agent_run_stats(
+    recent: int = Query(20, ge=0, le=200, description="Number of latest traced turns per worker")
+):
+    """Agent turn timings per bot worker: p50/p95/p99 summaries and the latest turn traces - ADMIN"""
+    workers = await admin_service.get_agent_run_stats(recent=recent)
+    return {"workers": workers, "total": len(workers)}
@@ -0,0 +1,18 @@
+from typing import Dict, List
+from config.database import db
+
+class AdminAPIService:
+    def __init__(self):
+        self.agent_run_stats = db.agent_run_stats
+
+    async def get_agent_run_stats(self, recent: int = 20) -> List[Dict]:
+        """Latest agent run summary published by each bot worker"""
+        workers = []
+        for doc in self.agent_run_stats.find().sort("_id", 1):
+            workers.append({
+                "worker_id": doc["_id"],
+                "updated_at": doc.get("updated_at"),
+                "summary": doc.get("summary", {}),
+                "recent": doc.get("recent", [])[-recent:] if recent else []
+            })
+        return workers
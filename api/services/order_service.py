@@ -68,7 +68,7 @@ class OrderAPIService:
              "$push": {"status_history": status_entry}}
         )
 
-        self.whatsapp_service.send_order_status_notification(
+        await self.whatsapp_service.send_order_status_notification_async(
             phone_number=order["phone_number"],
             order_number=order_number,
             status=new_status,
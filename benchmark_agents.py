@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Load test: drive registration and ordering conversations through WhatsAppHandler offline.
+
+Start the stub LLM and the fake GreenAPI (only used while the bot starts up), then run:
+
+    python stub_llm_server.py --port 8098 --latency lognormal:1.0,0.4 &
+    python fake_greenapi_server.py --port 8099 &
+    python benchmark_agents.py --customers 50 --concurrency 20
+
+Each virtual customer registers and then orders; a turn is timed from the moment its
+message is dispatched until the handler has finished with it. Replies are captured
+instead of sent. Test customers use phone numbers starting with 92399 and their users,
+states, conversations and orders are removed before and after the run (unless
+--keep-data). It uses the Mongo database from MONGO_URI, which needs a menu.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+PHONE_PREFIX = "92399"
+
+def configure_environment(args):
+    """Point the bot at the local stubs before its settings are imported"""
+    os.environ["GEMINI_BASE_URL"] = args.llm_url
+    os.environ["GREEN_API_HOST"] = args.greenapi_url
+    os.environ["WHATSAPP_RECEIVE_MODE"] = "polling"
+    os.environ["BOT_CLUSTER_ENABLED"] = "false"
+    os.environ["INBOUND_QUEUE_ENABLED"] = "false"
+    os.environ["MESSAGE_COALESCE_WINDOW_MS"] = str(args.coalesce_ms)
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false" if args.no_response_cache else "true"
+
+def percentiles(values):
+    ordered = sorted(values)
+    if not ordered:
+        return "n/a"
+    pick = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return f"p50 {pick(0.50):.2f}s  p95 {pick(0.95):.2f}s  p99 {pick(0.99):.2f}s  max {ordered[-1]:.2f}s"
+
+def conversation(index: int, menu_items):
+    """(step, message) pairs for one customer: register, then browse, order and check out"""
+    first, second = random.sample(menu_items, 2) if len(menu_items) > 1 else (menu_items[0], menu_items[0])
+    return [
+        ("greeting", "hi"),
+        ("register", f"Name: Bench Customer {index}, Address: House {index} Street 1, City: Lahore"),
+        ("browse", "what do you have today?"),
+        ("order", f"I'd like {random.randint(1, 3)} {first['name']} and a {second['name']} please"),
+        ("cart", "what's in my cart?"),
+        ("checkout", "yes confirm my order please"),
+    ]
+
+def cleanup(db):
+    query = {"phone_number": {"$regex": f"^{PHONE_PREFIX}"}}
+    for collection in (db.users, db.user_states, db.conversations, db.orders):
+        collection.delete_many(query)
+
+def build_handler():
+    from handlers.whatsapp_handler import WhatsAppHandler
+    from whatsapp_chatbot_python import Notification
+
+    class BenchmarkHandler(WhatsAppHandler):
+        """Captures replies instead of sending them and reports when each message is settled"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.replies = {}
+            self._waiters = {}
+
+        async def _answer(self, notification, message):
+            self.replies.setdefault(notification.chat, []).append(message)
+            return True
+
+        async def _settle(self, notifications, error=None):
+            await super()._settle(notifications, error)
+            for notification in notifications:
+                waiter = self._waiters.pop(notification.event["idMessage"], None)
+                if waiter and not waiter.done():
+                    waiter.set_result(error)
+
+        async def send(self, phone_number: str, text: str):
+            """Dispatch one customer message; returns (seconds until handled, error)"""
+            chat_id = f"{phone_number}@c.us"
+            event = {
+                "typeWebhook": "incomingMessageReceived",
+                "idMessage": uuid.uuid4().hex.upper(),
+                "timestamp": int(time.time()),
+                "senderData": {"chatId": chat_id, "sender": chat_id, "senderName": "Benchmark"},
+                "messageData": {"typeMessage": "textMessage", "textMessageData": {"textMessage": text}},
+            }
+            notification = Notification(event, self.bot.api, self.bot.router.message.state_manager)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[event["idMessage"]] = waiter
+            started = time.monotonic()
+            self._dispatch(notification)
+            error = await waiter
+            return time.monotonic() - started, error
+
+    from config.settings import settings
+    return BenchmarkHandler(
+        instance_id=settings.WHATSAPP_INSTANCE_ID,
+        token=settings.WHATSAPP_TOKEN,
+        worker_id="benchmark",
+        receiver=False
+    )
+
+async def run_customers(handler, customers: int, concurrency: int, menu_items, think_ms: int):
+    slots = asyncio.Semaphore(concurrency)
+    timings = {}
+    errors = []
+
+    async def customer(index: int):
+        phone_number = f"{PHONE_PREFIX}{index:07d}"
+        async with slots:
+            for step, message in conversation(index, menu_items):
+                seconds, error = await handler.send(phone_number, message)
+                timings.setdefault(step, []).append(seconds)
+                if error:
+                    errors.append((phone_number, step, error))
+                if think_ms:
+                    await asyncio.sleep(random.uniform(0, think_ms) / 1000)
+
+    started = time.monotonic()
+    await asyncio.gather(*(customer(index) for index in range(customers)))
+    return timings, errors, time.monotonic() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent flows against a stub LLM")
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10, help="customers talking at the same time")
+    parser.add_argument("--think-ms", type=int, default=0, help="max random pause between a customer's messages")
+    parser.add_argument("--llm-url", default="http://127.0.0.1:8098/")
+    parser.add_argument("--greenapi-url", default="http://127.0.0.1:8099")
+    parser.add_argument("--coalesce-ms", type=int, default=0, help="burst coalescing window (0 = off)")
+    parser.add_argument("--no-response-cache", action="store_true")
+    parser.add_argument("--keep-data", action="store_true", help="leave the test customers in the database")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from config.database import db
+    from tools.menu_tools import menu_cache
+    from services.metrics_service import metrics_registry
+
+    menu_items = menu_cache.get_items()
+    if not menu_items:
+        print("❌ The menu is empty; start the API once (or run main.py) to load it")
+        return
+    cleanup(db)
+
+    handler = build_handler()
+    handler._start_loop()
+    print(f"\n🏁 {args.customers} customers, {args.concurrency} at a time, LLM at {args.llm_url}")
+    try:
+        timings, errors, wall = asyncio.run_coroutine_threadsafe(
+            run_customers(handler, args.customers, args.concurrency, menu_items, args.think_ms), handler.loop
+        ).result()
+    finally:
+        handler.shutdown()
+        if not args.keep_data:
+            cleanup(db)
+
+    turns = sum(len(values) for values in timings.values())
+    print(f"\n📈 {turns} turns in {wall:.1f}s = {turns / wall:.2f} turns/s "
+          f"({args.customers / wall * 60:.1f} conversations/min), {len(errors)} error(s)")
+    print(f"   all turns  {percentiles([v for values in timings.values() for v in values])}")
+    for step, values in timings.items():
+        print(f"   {step:<10} {percentiles(values)}")
+
+    snapshot = metrics_registry.snapshot()
+    for name in ("warmup", "agent_runs", "llm_scheduler", "model_router", "tool_planner", "fast_path"):
+        if name in snapshot:
+            print(f"📊 {name}: {snapshot[name]}")
+    try:
+        import httpx
+        print(f"🤖 Stub LLM: {httpx.get(args.llm_url.rstrip('/') + '/stats', timeout=5).json()}")
+    except Exception as e:
+        print(f"⚠️ Could not read stub LLM stats: {e}")
+    for phone_number, step, error in errors[:10]:
+        print(f"❌ {phone_number} {step}: {error}")
+
+if __name__ == "__main__":
+    main()
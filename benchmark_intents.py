@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: compiled IntentMatcher vs the old any(word in lower_message) scans
+"""
+import random
+import sys
+import time
+from services.intent_matcher import intent_matcher
+
+# Keyword lists exactly as the handler and ConversationService used to scan them
+LEGACY_KEYWORDS = {
+    "greeting": ['hi', 'hello', 'hey', 'good morning', 'good afternoon',
+                 'good evening', 'salam', 'assalam', 'aoa'],
+    "confirmation": ['confirm', 'place order', 'yes confirm', 'checkout', 'proceed', "that's it", 'done'],
+    "view_order": ['view order', 'show cart', 'my order', 'current order'],
+    "adding_items": ['add', 'want', 'order'],
+    "menu_request": ['menu', 'show menu', 'what do you have'],
+    "order_mention": ["add", "order", "want", "pizza", "burger"],
+    "confirmation_mention": ["yes", "confirm"],
+}
+
+MESSAGE_TEMPLATES = [
+    "hi", "hello there", "Assalam o alaikum, menu bhej dein", "add 1 and 3", "2x pepperoni",
+    "confirm", "view order", "I want 2 pepperoni pizzas and a coke please",
+    "can you deliver this to my office address instead of home?",
+    "what do you have for dessert today", "this is taking too long, where is my order?",
+    "my address is House 12, Street 4, Gulberg III, Lahore. Please call before coming.",
+    "Thanks! That's it for now", "mujhe do pizza aur ek coke chahiye",
+    "Is the chicken spicy? My kids don't eat spicy food, so I need something mild for them.",
+    "Could you tell me which items are vegetarian and which ones have nuts in them?",
+    "ok done", "show menu", "yes confirm my order", "nothing else, thank you so much",
+]
+
+FILLER = ("please note that we are ordering for a small family gathering tonight and "
+          "would appreciate it if everything arrives hot and on time ").split()
+
+def build_corpus(size: int, seed: int = 7):
+    """Real-length messages: templates padded with filler to 5-300 characters"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        message = rng.choice(MESSAGE_TEMPLATES)
+        while rng.random() < 0.35 and len(message) < 300:
+            message += " " + " ".join(rng.sample(FILLER, rng.randint(3, 8)))
+        corpus.append(message)
+    return corpus
+
+def legacy_classify(message: str):
+    lower_message = message.lower()
+    found = set()
+    for intent, keywords in LEGACY_KEYWORDS.items():
+        if any(word in lower_message for word in keywords):
+            found.add(intent)
+    return found
+
+def time_it(func, corpus, rounds: int):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for message in corpus:
+            func(message)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_benchmark(size: int = 50000, rounds: int = 3):
+    corpus = build_corpus(size)
+    avg_len = sum(len(m) for m in corpus) / len(corpus)
+    print(f"Corpus: {len(corpus)} messages, average length {avg_len:.0f} chars")
+
+    legacy_time = time_it(legacy_classify, corpus, rounds)
+    # Uncached scan: every message is new (worst case, e.g. a fresh customer message)
+    compiled_time = time_it(lambda m: intent_matcher._classify_uncached(m.lower()), corpus, rounds)
+    # Cached scan: history rows are re-classified on every turn, so repeats are the norm there
+    cached_time = time_it(intent_matcher.classify, corpus, rounds)
+
+    print(f"Legacy substring scans:          {legacy_time * 1e6 / len(corpus):.2f} µs/message")
+    print(f"Compiled IntentMatcher (cold):   {compiled_time * 1e6 / len(corpus):.2f} µs/message "
+          f"({legacy_time / compiled_time:.2f}x)")
+    print(f"Compiled IntentMatcher (cached): {cached_time * 1e6 / len(corpus):.2f} µs/message "
+          f"({legacy_time / cached_time:.2f}x, {intent_matcher.cache_info().hits} cache hits)")
+
+    # Show where the two disagree (mostly substring false positives)
+    differences = {}
+    for message in set(corpus):
+        removed = legacy_classify(message) - intent_matcher.classify(message)
+        for intent in removed:
+            differences.setdefault(intent, []).append(message)
+    print("\nIntents the legacy scan reported but word-boundary matching does not:")
+    for intent, messages in sorted(differences.items()):
+        print(f"  {intent}: {len(messages)} distinct messages, e.g. {messages[0][:70]!r}")
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    run_benchmark(size)
@@ -1,6 +1,7 @@
 from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ConfigurationError
 from .settings import settings
+from utils.run_trace import mongo_command_timer
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,19 +15,29 @@ class Database:
                 serverSelectionTimeoutMS=5000,  # 5 seconds timeout
                 connectTimeoutMS=5000,  # 5 seconds connection timeout
                 socketTimeoutMS=5000,   # 5 seconds socket timeout
+                minPoolSize=settings.MONGO_MIN_POOL_SIZE,  # Keep warm connections open
+                event_listeners=[mongo_command_timer],  # Mongo time per agent turn
             )
             
             # Test the connection
             self.client.admin.command('ping')
             logger.info("Successfully connected to MongoDB")
             
-            self.db = self.client['restaurant_db']
+            self.db = self.client[settings.MONGO_DB_NAME]
             self.users = self.db['users']
             self.orders = self.db['orders']
+            self.counters = self.db['counters']
             self.menu = self.db['menu']
             self.conversations = self.db['conversations']
             self.user_states = self.db['user_states']
             self.notifications = self.db['notifications']  # Add this line
+            self.processed_messages = self.db['processed_messages']
+            self.outbound_messages = self.db['outbound_messages']
+            self.inbound_messages = self.db['inbound_messages']
+            self.inbound_dead_letters = self.db['inbound_dead_letters']
+            self.bot_workers = self.db['bot_workers']
+            self.response_cache = self.db['response_cache']
+            self.agent_run_stats = self.db['agent_run_stats']
         
         except (ConnectionFailure, ConfigurationError) as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
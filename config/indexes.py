@@ -0,0 +1,178 @@
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from typing import Dict, List, Optional
+
+# Bump when an index is added or changed below so every deployment applies it once
+INDEX_VERSION = 2
+
+# Indexes the queries in services/, api/services/ and tools/ rely on, per collection.
+# TTL indexes are owned by the services that set their expiry (retention_service,
+# response_cache, idempotency_service) and are not declared here.
+INDEXES: Dict[str, List[Dict]] = {
+    "conversations": [
+        # History: phone_number + timestamp range, newest first (with _id as tie-break)
+        {"name": "phone_timestamp", "keys": [("phone_number", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]},
+    ],
+    "users": [
+        {"name": "phone_number", "keys": [("phone_number", ASCENDING)]},
+        # API accounts log in by email; WhatsApp customers have none
+        {"name": "email_unique", "keys": [("email", ASCENDING)], "unique": True,
+         "partialFilterExpression": {"email": {"$exists": True}}},
+    ],
+    "user_states": [
+        # One state (and cart) per customer; cart_store relies on it for concurrent upserts
+        {"name": "phone_number_unique", "keys": [("phone_number", ASCENDING)], "unique": True},
+    ],
+    "orders": [
+        {"name": "order_number_unique", "keys": [("order_number", ASCENDING)], "unique": True},
+        {"name": "status_created_at", "keys": [("status", ASCENDING), ("created_at", DESCENDING)]},
+        {"name": "phone_created_at", "keys": [("phone_number", ASCENDING), ("created_at", DESCENDING)]},
+        # Order list without a status filter and the active-orders view
+        {"name": "created_at", "keys": [("created_at", DESCENDING)]},
+    ],
+    "menu": [
+        {"name": "id_unique", "keys": [("id", ASCENDING)], "unique": True},
+        # Category filter, distinct categories and the (category, id) menu listing
+        {"name": "category_id", "keys": [("category", ASCENDING), ("id", ASCENDING)]},
+    ],
+    "notifications": [
+        {"name": "read_created_at", "keys": [("read", ASCENDING), ("created_at", DESCENDING)]},
+    ],
+    "inbound_messages": [
+        # claim(): pending items that are due, or leased items whose lease ran out
+        {"name": "status_available_at", "keys": [("status", ASCENDING), ("available_at", ASCENDING)]},
+        {"name": "status_lease_until", "keys": [("status", ASCENDING), ("lease_until", ASCENDING)]},
+        {"name": "claim_id", "keys": [("claim_id", ASCENDING)], "sparse": True},
+    ],
+    "inbound_dead_letters": [
+        {"name": "created_at", "keys": [("created_at", ASCENDING)]},
+    ],
+    "outbound_messages": [
+        {"name": "status_created_at", "keys": [("status", ASCENDING), ("created_at", ASCENDING)]},
+    ],
+}
+
+class IndexManager:
+    """Creates the declared indexes and reports on the ones in the database.
+
+    Applying is idempotent: indexes that already exist are left alone, and the applied
+    version is stored in `schema_migrations`, so a start with nothing new to do costs one
+    read per collection. An index that can't be built (duplicate data under a unique
+    index, or the same key under another name) is reported and retried on the next
+    start; it never stops the application from starting.
+    """
+
+    MIGRATION_ID = "indexes"
+    # Options compared with the existing index; a difference means it is rebuilt
+    OPTIONS = ("unique", "sparse", "partialFilterExpression")
+
+    def __init__(self, database, indexes: Dict[str, List[Dict]] = None, version: int = INDEX_VERSION):
+        self.database = database
+        self.indexes = INDEXES if indexes is None else indexes
+        self.version = version
+
+    def _matches(self, spec: Dict, info: Dict) -> bool:
+        return info.get("key") == list(spec["keys"]) and \
+            all(info.get(option) == spec.get(option) for option in self.OPTIONS)
+
+    def missing(self) -> Dict[str, List[str]]:
+        """Declared indexes that don't exist with the declared key and options, per collection"""
+        missing = {}
+        for collection_name, specs in self.indexes.items():
+            existing = self.database[collection_name].index_information()
+            names = [spec["name"] for spec in specs if not self._matches(spec, existing.get(spec["name"], {}))]
+            if names:
+                missing[collection_name] = names
+        return missing
+
+    def apply(self, force: bool = False) -> Dict:
+        """Create missing indexes (rebuilding changed ones); returns what was created and what failed"""
+        record = self.database["schema_migrations"].find_one({"_id": self.MIGRATION_ID}) or {}
+        missing = self.missing()
+        report = {"version": self.version, "previous_version": record.get("version"),
+                  "created": [], "failed": {}}
+        if not missing and record.get("version") == self.version and not force:
+            print(f"🗂️ Indexes up to date (version {self.version})")
+            return report
+
+        for collection_name, names in missing.items():
+            collection = self.database[collection_name]
+            existing = collection.index_information()
+            for spec in self.indexes[collection_name]:
+                if spec["name"] not in names:
+                    continue
+                options = {key: value for key, value in spec.items() if key != "keys"}
+                try:
+                    if spec["name"] in existing:
+                        # Declared differently in an earlier version
+                        collection.drop_index(spec["name"])
+                    collection.create_index(spec["keys"], **options)
+                    report["created"].append(f"{collection_name}.{spec['name']}")
+                except OperationFailure as e:
+                    report["failed"][f"{collection_name}.{spec['name']}"] = str(e)
+
+        if report["created"]:
+            print(f"🗂️ Created {len(report['created'])} index(es): {', '.join(report['created'])}")
+        for name, error in report["failed"].items():
+            print(f"⚠️ Could not create index {name}: {error}")
+        if not report["failed"]:
+            self.database["schema_migrations"].replace_one(
+                {"_id": self.MIGRATION_ID},
+                {"_id": self.MIGRATION_ID, "version": self.version, "applied_at": datetime.utcnow(),
+                 "indexes": {name: [spec["name"] for spec in specs] for name, specs in self.indexes.items()}},
+                upsert=True
+            )
+            print(f"✅ Indexes at version {self.version}")
+        return report
+
+    def usage(self) -> Optional[Dict[str, Dict]]:
+        """Operations served by each index since mongod started ($indexStats), or None if not available"""
+        usage = {}
+        try:
+            for collection_name in self.indexes:
+                for stat in self.database[collection_name].aggregate([{"$indexStats": {}}]):
+                    usage[f"{collection_name}.{stat['name']}"] = {
+                        "ops": stat["accesses"]["ops"],
+                        "since": stat["accesses"]["since"]
+                    }
+        except OperationFailure:
+            return None
+        return usage
+
+    def report(self) -> Dict:
+        """Missing declared indexes, indexes with no recorded use, and indexes nobody declared"""
+        declared = {f"{collection_name}.{spec['name']}"
+                    for collection_name, specs in self.indexes.items() for spec in specs}
+        usage = self.usage()
+        existing = set(usage) if usage is not None else {
+            f"{collection_name}.{name}" for collection_name in self.indexes
+            for name in self.database[collection_name].index_information()
+        }
+        return {
+            "version": self.version,
+            "missing": self.missing(),
+            "unused": sorted(name for name, stat in (usage or {}).items()
+                             if stat["ops"] == 0 and not name.endswith("._id_")),
+            "undeclared": sorted(name for name in existing - declared if not name.endswith("._id_")),
+            "usage": usage
+        }
+
+def ensure_indexes(database) -> Optional[Dict]:
+    """Apply the declared indexes at startup; failures are printed, never raised"""
+    try:
+        return IndexManager(database).apply()
+    except Exception as e:
+        print(f"⚠️ Index bootstrap failed: {e}")
+        return None
+
+if __name__ == "__main__":
+    # python -m config.indexes: apply, then print which indexes are missing or unused
+    from config.database import db
+    if db is not None:
+        manager = IndexManager(db.db)
+        manager.apply()
+        report = manager.report()
+        print(f"🗂️ Missing: {report['missing'] or 'none'}")
+        print(f"🗂️ Unused since mongod start: {report['unused'] or 'none'}")
+        print(f"🗂️ Not declared here: {report['undeclared'] or 'none'}")
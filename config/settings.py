@@ -9,6 +9,11 @@ class Settings:
     MONGO_URI = os.getenv("MONGO_URI")
     if not MONGO_URI:
         raise ValueError("MONGO_URI environment variable is required")
+    MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "restaurant_db")
+    # Connections the pool keeps open (and warm-up opens at startup)
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "4"))
+    # Create the indexes declared in config/indexes.py when main.py starts
+    INDEX_BOOTSTRAP_ENABLED = os.getenv("INDEX_BOOTSTRAP_ENABLED", "true").lower() == "true"
     
     # Gemini Configuration
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -26,12 +31,46 @@ class Settings:
     if not WHATSAPP_TOKEN:
         raise ValueError("WHATSAPP_TOKEN environment variable is required")
     
+    GREEN_API_HOST = os.getenv("GREEN_API_HOST", "https://api.green-api.com")
+    
+    # Inbound Settings: "polling" (receiveNotification) or "webhook" (GreenAPI pushes to us)
+    WHATSAPP_RECEIVE_MODE = os.getenv("WHATSAPP_RECEIVE_MODE", "polling").lower()
+    WHATSAPP_WEBHOOK_HOST = os.getenv("WHATSAPP_WEBHOOK_HOST", "0.0.0.0")
+    WHATSAPP_WEBHOOK_PORT = int(os.getenv("WHATSAPP_WEBHOOK_PORT", "8081"))
+    WHATSAPP_WEBHOOK_PATH = os.getenv("WHATSAPP_WEBHOOK_PATH", "/webhook/greenapi")
+    WHATSAPP_WEBHOOK_TOKEN = os.getenv("WHATSAPP_WEBHOOK_TOKEN", "")
+    WHATSAPP_WEBHOOK_PUBLIC_URL = os.getenv("WHATSAPP_WEBHOOK_PUBLIC_URL", "")
+    
     # Model Configuration
     MODEL_NAME = os.getenv("MODEL_NAME")
     
+    # Model Routing: simple turns use the fast model, escalating to the strong one when needed
+    # (same model for both disables routing); prices are "input,output" USD per 1M tokens
+    FAST_MODEL_NAME = os.getenv("FAST_MODEL_NAME", MODEL_NAME)
+    STRONG_MODEL_NAME = os.getenv("STRONG_MODEL_NAME", MODEL_NAME)
+    FAST_MODEL_PRICE = os.getenv("FAST_MODEL_PRICE", "0.10,0.40")
+    STRONG_MODEL_PRICE = os.getenv("STRONG_MODEL_PRICE", "0.30,2.50")
+    MODEL_ESCALATION_STICKY_SECONDS = float(os.getenv("MODEL_ESCALATION_STICKY_SECONDS", "600"))
+    
+    # LLM Connection Pool (HTTP/2 needs the optional 'h2' package)
+    LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", "120"))
+    LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+    
     # Conversation History Settings
     CONVERSATION_HISTORY_LIMIT = int(os.getenv("CONVERSATION_HISTORY_LIMIT"))
     CONVERSATION_HISTORY_HOURS = int(os.getenv("CONVERSATION_HISTORY_HOURS"))
+    # In-memory history per customer (read from Mongo only on a miss)
+    CONVERSATION_CACHE_MESSAGES = int(os.getenv("CONVERSATION_CACHE_MESSAGES", "25"))
+    CONVERSATION_CACHE_MAX_CUSTOMERS = int(os.getenv("CONVERSATION_CACHE_MAX_CUSTOMERS", "5000"))
+    CONVERSATION_CACHE_MAX_MB = int(os.getenv("CONVERSATION_CACHE_MAX_MB", "32"))
+    # Write-behind: conversation messages are inserted in batches off the critical path
+    CONVERSATION_WRITE_BEHIND = os.getenv("CONVERSATION_WRITE_BEHIND", "true").lower() == "true"
+    CONVERSATION_WRITE_BATCH_SIZE = int(os.getenv("CONVERSATION_WRITE_BATCH_SIZE", "50"))
+    CONVERSATION_WRITE_FLUSH_MS = int(os.getenv("CONVERSATION_WRITE_FLUSH_MS", "200"))
+    CONVERSATION_WRITE_MAX_PENDING = int(os.getenv("CONVERSATION_WRITE_MAX_PENDING", "10000"))
     
     # API Server Configuration
     API_HOST = os.getenv("API_HOST")
@@ -39,5 +78,84 @@ class Settings:
     
     # Other Settings
     OLD_CONVERSATION_CLEANUP_DAYS = int(os.getenv("OLD_CONVERSATION_CLEANUP_DAYS"))
+    # Conversations expire through a TTL index; the sweep catches rows the index can't (0 disables it)
+    RETENTION_SWEEP_INTERVAL_SECONDS = int(os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", "3600"))
+    RETENTION_SWEEP_BATCH_SIZE = int(os.getenv("RETENTION_SWEEP_BATCH_SIZE", "500"))
+    RETENTION_SWEEP_PAUSE_MS = int(os.getenv("RETENTION_SWEEP_PAUSE_MS", "200"))
+    
+    # Bot Concurrency Settings
+    MAX_CONCURRENT_CONVERSATIONS = int(os.getenv("MAX_CONCURRENT_CONVERSATIONS", "200"))
+    BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", "32"))
+    AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "15"))
+    MESSAGE_DEADLINE_SECONDS = float(os.getenv("MESSAGE_DEADLINE_SECONDS", "30"))
+    BOT_WORKER_LANES = int(os.getenv("BOT_WORKER_LANES", "64"))
+    METRICS_REPORT_INTERVAL_SECONDS = int(os.getenv("METRICS_REPORT_INTERVAL_SECONDS", "60"))
+    
+    # Agent Prompt Budget
+    CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "1500"))
+    CONTEXT_MENU_TOP_K = int(os.getenv("CONTEXT_MENU_TOP_K", "8"))
+    CONTEXT_HISTORY_MESSAGES = int(os.getenv("CONTEXT_HISTORY_MESSAGES", "6"))
+    
+    # Agent Run Tracing (last N turns kept per bot process; JSONL path appends every turn, empty disables)
+    AGENT_TRACE_BUFFER_SIZE = int(os.getenv("AGENT_TRACE_BUFFER_SIZE", "500"))
+    AGENT_TRACE_JSONL = os.getenv("AGENT_TRACE_JSONL", "")
+    
+    # Startup Warm-up (Mongo pool, menu cache, speech models and a one-token LLM ping before taking messages)
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+    WARMUP_LLM_PING = os.getenv("WARMUP_LLM_PING", "true").lower() == "true"
+    WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "20"))
+    
+    # LLM Scheduler: concurrent agent runs, provider token budget and queue deadline
+    LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+    LLM_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("LLM_MAX_QUEUE_WAIT_SECONDS", "8"))
+    LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "400"))
+    
+    # Multi-worker Settings: customers are partitioned across bot workers by consistent hashing
+    BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+    BOT_CLUSTER_ENABLED = os.getenv("BOT_CLUSTER_ENABLED", str(BOT_WORKERS > 1)).lower() == "true"
+    BOT_RECEIVER = os.getenv("BOT_RECEIVER", "true").lower() == "true"
+    BOT_PARTITIONS = int(os.getenv("BOT_PARTITIONS", "256"))
+    WORKER_HEARTBEAT_SECONDS = float(os.getenv("WORKER_HEARTBEAT_SECONDS", "5"))
+    WORKER_TTL_SECONDS = float(os.getenv("WORKER_TTL_SECONDS", "15"))
+    
+    # Durable Inbound Queue (always on when clustered)
+    INBOUND_QUEUE_ENABLED = os.getenv("INBOUND_QUEUE_ENABLED", "true").lower() == "true"
+    INBOUND_POLL_INTERVAL_MS = int(os.getenv("INBOUND_POLL_INTERVAL_MS", "200"))
+    INBOUND_LEASE_SECONDS = float(os.getenv("INBOUND_LEASE_SECONDS", "60"))
+    INBOUND_MAX_ATTEMPTS = int(os.getenv("INBOUND_MAX_ATTEMPTS", "5"))
+    INBOUND_RETRY_DELAY_SECONDS = float(os.getenv("INBOUND_RETRY_DELAY_SECONDS", "5"))
+    CART_CACHE_TTL_SECONDS = int(os.getenv("CART_CACHE_TTL_SECONDS", "300"))
+    
+    # Burst coalescing: messages within the quiet period become one agent turn (0 disables)
+    MESSAGE_COALESCE_WINDOW_MS = int(os.getenv("MESSAGE_COALESCE_WINDOW_MS", "1500"))
+    MESSAGE_COALESCE_MAX_WAIT_MS = int(os.getenv("MESSAGE_COALESCE_MAX_WAIT_MS", "5000"))
+    
+    # Idempotency Settings ("memory" or "mongo" for multiple bot processes)
+    IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+    IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "50000"))
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
+    
+    # Fast Path Settings
+    FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    TOOL_PLANNER_ENABLED = os.getenv("TOOL_PLANNER_ENABLED", "true").lower() == "true"
+    MENU_CACHE_TTL_SECONDS = int(os.getenv("MENU_CACHE_TTL_SECONDS", "60"))
+    
+    # Agent Response Cache ("memory" or "mongo" to share cached replies between bot processes)
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600"))
+    RESPONSE_CACHE_MAX_WORDS = int(os.getenv("RESPONSE_CACHE_MAX_WORDS", "8"))
+    
+    # Outbound Send Settings (GreenAPI rate limit, retry and spill-to-Mongo queue)
+    OUTBOUND_RATE_PER_SECOND = float(os.getenv("OUTBOUND_RATE_PER_SECOND", "10"))
+    OUTBOUND_BURST = int(os.getenv("OUTBOUND_BURST", "20"))
+    OUTBOUND_MAX_IN_FLIGHT = int(os.getenv("OUTBOUND_MAX_IN_FLIGHT", "16"))
+    OUTBOUND_MAX_QUEUE = int(os.getenv("OUTBOUND_MAX_QUEUE", "5000"))
+    OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "5"))
+    OUTBOUND_BASE_BACKOFF_SECONDS = float(os.getenv("OUTBOUND_BASE_BACKOFF_SECONDS", "0.5"))
+    # A spilled message claimed by a process that stops renewing it is taken over after this long
+    OUTBOUND_SPILL_LEASE_SECONDS = float(os.getenv("OUTBOUND_SPILL_LEASE_SECONDS", "600"))
 
 settings = Settings()
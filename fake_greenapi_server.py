@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Local fake GreenAPI server for exercising the outbound sender.
+
+Run it, then point the bot or API at it with GREEN_API_HOST=http://127.0.0.1:8099
+
+    python fake_greenapi_server.py --port 8099 --rate-limit 5 --error-rate 0.1
+
+It rate-limits sendMessage like the real service (HTTP 429), injects random 5xx errors,
+and checks that each chat receives its messages in the order they were sent.
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import deque
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+import uvicorn
+
+app = FastAPI(title="Fake GreenAPI")
+
+config = {"rate_limit": 5.0, "error_rate": 0.0, "latency_ms": 50}
+state = {
+    "accepted": 0,
+    "throttled": 0,
+    "errors": 0,
+    "out_of_order": 0,
+    "recent_sends": deque(),
+    "chats": {},
+}
+
+def _sequence(message: str):
+    """Messages like 'msg 12' carry a sequence number used for the ordering check"""
+    last = message.rsplit(" ", 1)[-1]
+    return int(last) if last.isdigit() else None
+
+@app.post("/waInstance{instance_id}/sendMessage/{token}")
+async def send_message(instance_id: str, token: str, request: Request):
+    body = await request.json()
+    await asyncio.sleep(config["latency_ms"] / 1000)
+
+    now = time.monotonic()
+    recent = state["recent_sends"]
+    while recent and now - recent[0] > 1:
+        recent.popleft()
+    if len(recent) >= config["rate_limit"]:
+        state["throttled"] += 1
+        return JSONResponse({"message": "Too Many Requests"}, status_code=429)
+    if random.random() < config["error_rate"]:
+        state["errors"] += 1
+        return JSONResponse({"message": "Internal Server Error"}, status_code=500)
+
+    recent.append(now)
+    state["accepted"] += 1
+
+    chat_id, message = body.get("chatId"), body.get("message", "")
+    sequence = _sequence(message)
+    last = state["chats"].get(chat_id)
+    if sequence is not None and last is not None and sequence <= last:
+        state["out_of_order"] += 1
+        print(f"⚠️ Out of order for {chat_id}: {sequence} after {last}")
+    if sequence is not None:
+        state["chats"][chat_id] = sequence
+
+    return {"idMessage": uuid.uuid4().hex.upper()}
+
+@app.get("/waInstance{instance_id}/receiveNotification/{token}")
+async def receive_notification(instance_id: str, token: str):
+    # No inbound traffic: the real API returns null when the queue is empty
+    return Response(content="null", media_type="application/json")
+
+@app.delete("/waInstance{instance_id}/deleteNotification/{token}/{receipt_id}")
+async def delete_notification(instance_id: str, token: str, receipt_id: str):
+    return {"result": True}
+
+@app.get("/waInstance{instance_id}/getStateInstance/{token}")
+async def get_state_instance(instance_id: str, token: str):
+    return {"stateInstance": "authorized"}
+
+@app.get("/waInstance{instance_id}/getSettings/{token}")
+async def get_settings(instance_id: str, token: str):
+    return {"wid": f"{instance_id}@c.us", "incomingWebhook": "yes",
+            "outgoingMessageWebhook": "no", "outgoingAPIMessageWebhook": "no"}
+
+@app.post("/waInstance{instance_id}/setSettings/{token}")
+async def set_settings(instance_id: str, token: str):
+    return {"saveSettings": True}
+
+@app.get("/stats")
+async def stats():
+    return {
+        "accepted": state["accepted"],
+        "throttled": state["throttled"],
+        "errors": state["errors"],
+        "out_of_order": state["out_of_order"],
+        "chats": len(state["chats"]),
+        "config": config
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake GreenAPI server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--rate-limit", type=float, default=5.0, help="accepted sends per second before 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of sends that return 500")
+    parser.add_argument("--latency-ms", type=int, default=50)
+    args = parser.parse_args()
+
+    config.update(rate_limit=args.rate_limit, error_rate=args.error_rate, latency_ms=args.latency_ms)
+    print(f"🚀 Fake GreenAPI on http://127.0.0.1:{args.port} (rate {args.rate_limit}/s, errors {args.error_rate:.0%})")
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,99 @@
+from fastapi import FastAPI, Header, HTTPException, Request
+from config.settings import settings
+from typing import Dict, Optional
+import asyncio
+import hmac
+import json
+import threading
+import time
+
+class WebhookReceiver:
+    """Accepts GreenAPI push notifications and hands them to the bot router.
+
+    The route only validates the payload and queues it; message handling happens on the
+    bot's lanes, so GreenAPI gets its 200 within a few milliseconds. A notification that
+    could not be handed over gets a 503, so GreenAPI redelivers it. The library's router
+    keeps the event being routed on a shared observer, so events are routed one at a time.
+    """
+
+    def __init__(self, router, instance_id: str, token: str = "", path: str = "/webhook/greenapi"):
+        self.router = router
+        self.instance_id = str(instance_id)
+        self.token = token
+        self.path = path
+        self.stats = {"received": 0, "accepted": 0, "rejected": 0, "errors": 0}
+        self._route_lock = threading.Lock()
+        self._ack_ms_total = 0.0
+        self.app = self._create_app()
+
+    def _create_app(self) -> FastAPI:
+        app = FastAPI(title="EZ Order WhatsApp Webhook", docs_url=None, redoc_url=None)
+
+        @app.post(self.path)
+        async def receive_notification(request: Request, authorization: Optional[str] = Header(None)):
+            started = time.perf_counter()
+            self.stats["received"] += 1
+            event = await self._validate(request, authorization)
+            try:
+                # route_event may touch the idempotency store, so keep it off the loop
+                await asyncio.to_thread(self._route, event)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Error routing webhook {event.get('typeWebhook')}: {e}")
+                # Not a 200, so GreenAPI delivers the notification again later
+                raise HTTPException(status_code=503, detail="Notification not accepted, retry later")
+            self.stats["accepted"] += 1
+            self._ack_ms_total += (time.perf_counter() - started) * 1000
+            return {"status": "ok"}
+
+        @app.get("/health")
+        async def health():
+            return {"status": "healthy", "mode": "webhook"}
+
+        return app
+
+    def _route(self, event: Dict):
+        """Route one event; concurrent calls would overwrite each other's observer.event"""
+        with self._route_lock:
+            self.router.route_event(event)
+
+    async def _validate(self, request: Request, authorization: Optional[str]) -> Dict:
+        """Check the shared token, the payload shape and the instance id"""
+        if self.token:
+            expected = f"Bearer {self.token}"
+            if not authorization or not hmac.compare_digest(authorization, expected):
+                self.stats["rejected"] += 1
+                raise HTTPException(status_code=401, detail="Invalid webhook token")
+
+        try:
+            event = await request.json()
+        except json.JSONDecodeError:
+            event = None
+        if not isinstance(event, dict) or not isinstance(event.get("typeWebhook"), str):
+            self.stats["rejected"] += 1
+            raise HTTPException(status_code=400, detail="Invalid notification payload")
+
+        instance_id = (event.get("instanceData") or {}).get("idInstance")
+        if instance_id is not None and str(instance_id) != self.instance_id:
+            self.stats["rejected"] += 1
+            raise HTTPException(status_code=403, detail="Unknown instance")
+        return event
+
+    def get_stats(self) -> Dict:
+        accepted = self.stats["accepted"]
+        return {
+            **self.stats,
+            "avg_ack_ms": round(self._ack_ms_total / accepted, 2) if accepted else 0.0
+        }
+
+def greenapi_webhook_settings() -> Optional[Dict]:
+    """Instance settings that point GreenAPI at our webhook (None keeps the current ones)"""
+    if not settings.WHATSAPP_WEBHOOK_PUBLIC_URL:
+        return None
+    return {
+        "webhookUrl": settings.WHATSAPP_WEBHOOK_PUBLIC_URL,
+        "webhookUrlToken": settings.WHATSAPP_WEBHOOK_TOKEN,
+        "incomingWebhook": "yes",
+        "outgoingMessageWebhook": "no",
+        "outgoingAPIMessageWebhook": "no"
+    }
@@ -1,102 +1,625 @@
 from whatsapp_chatbot_python import GreenAPIBot, Notification
-from agents import Runner
 from config.database import db
-from services.conversation_service import ConversationService
+from services.conversation_service import ConversationService, history_cache
+from services.conversation_writer import conversation_writer
+from services.retention_service import retention_service
 from services.state_manager import StateManager
 from agents_folder.restaurant_agent import AgentFactory
-from agents_folder.registration_agent import RegistrationAgentFactory
+from agents_folder.llm_client import llm_client_manager
+from agents_folder.context_builder import context_builder
+from agents_folder.llm_scheduler import LLMOverloadedError, LLMScheduler, llm_scheduler
+from agents_folder.model_router import ModelRouter, model_router
+from agents_folder.tool_planner import tool_planner
 from utils.phone_utils import clean_phone_number
+from utils.deadline import deadline_scope, remaining_time, run_tool_with_deadline
+from utils.run_trace import run_tracer
 from services.free_speech_service import HybridSpeechToTextService
-from typing import Optional
+from services.metrics_service import metrics_registry
+from services.warmup import WarmUp, warm_llm, warm_mongo
+from services.command_parser import command_parser, ParsedCommand
+from services.intent_matcher import intent_matcher
+from services.idempotency_service import IdempotencyStore
+from services.outbound_sender import outbound_sender
+from handlers.webhook_receiver import WebhookReceiver, greenapi_webhook_settings
+from services.worker_registry import WorkerRegistry
+from services.inbound_queue import InboundQueue
+from services.cart_store import cart_store
+from services.response_cache import response_cache
+from tools.menu_tools import menu_cache, show_menu_base
+from tools.order_tools import add_to_order_base, view_current_order_base, confirm_order_base
+from config.settings import settings
+from typing import Awaitable, Callable, Dict, List, Optional
 import asyncio
 import concurrent.futures
+import os
+import socket
 import threading
-import nest_asyncio
 import time
+import zlib
 
-# Apply nest_asyncio to allow nested event loops
-nest_asyncio.apply()
+class MessageCoalescer:
+    """Debounces bursts from one customer: messages within the quiet period become one turn"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, quiet_seconds: float, max_wait_seconds: float,
+                 flush: Callable[[str, List[Notification]], None]):
+        self.loop = loop
+        self.quiet_seconds = quiet_seconds
+        self.max_wait_seconds = max(max_wait_seconds, quiet_seconds)
+        self._flush_callback = flush
+        self._pending: Dict[str, List[Notification]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._started_at: Dict[str, float] = {}
+        self.messages_received = 0
+        self.turns_dispatched = 0
+    
+    def add(self, phone_number: str, notification: Notification):
+        """Buffer a message and (re)start the customer's quiet-period timer (loop thread only)"""
+        self.messages_received += 1
+        if self.quiet_seconds <= 0:
+            self._emit(phone_number, [notification])
+            return
+        
+        now = self.loop.time()
+        self._pending.setdefault(phone_number, []).append(notification)
+        self._started_at.setdefault(phone_number, now)
+        
+        timer = self._timers.pop(phone_number, None)
+        if timer:
+            timer.cancel()
+        
+        # Never hold a burst longer than max_wait, even if the customer keeps typing
+        deadline = self._started_at[phone_number] + self.max_wait_seconds
+        delay = min(self.quiet_seconds, max(0.0, deadline - now))
+        self._timers[phone_number] = self.loop.call_later(delay, self.flush, phone_number)
+    
+    def flush(self, phone_number: str):
+        """Dispatch whatever is buffered for a customer"""
+        timer = self._timers.pop(phone_number, None)
+        if timer:
+            timer.cancel()
+        self._started_at.pop(phone_number, None)
+        batch = self._pending.pop(phone_number, None)
+        if batch:
+            self._emit(phone_number, batch)
+    
+    def flush_all(self):
+        for phone_number in list(self._pending):
+            self.flush(phone_number)
+    
+    def _emit(self, phone_number: str, batch: List[Notification]):
+        self.turns_dispatched += 1
+        self._flush_callback(phone_number, batch)
+    
+    def get_stats(self) -> Dict:
+        return {
+            "window_ms": int(self.quiet_seconds * 1000),
+            "messages": self.messages_received,
+            "turns": self.turns_dispatched,
+            "agent_turns_saved": self.messages_received - self.turns_dispatched - self.pending_count(),
+            "pending_customers": len(self._pending)
+        }
+    
+    def pending_count(self) -> int:
+        return sum(len(batch) for batch in self._pending.values())
+
+class MessageDispatcher:
+    """Routes messages to per-customer lanes: ordered per phone, parallel across phones"""
+    
+    def __init__(self, lane_count: int, process: Callable[[List[Notification]], Awaitable[None]]):
+        self.lane_count = max(1, lane_count)
+        self._process = process
+        self.lanes: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self.processed = [0] * self.lane_count
+        self.peak_depths = [0] * self.lane_count
+    
+    @staticmethod
+    def lane_for(phone_number: str, lane_count: int) -> int:
+        """Stable lane index for a cleaned phone number (same across restarts)"""
+        return zlib.crc32(phone_number.encode("utf-8")) % lane_count
+    
+    def start(self):
+        """Create lane queues and workers (must be called inside the running loop)"""
+        if self._workers:
+            return
+        self.lanes = [asyncio.Queue() for _ in range(self.lane_count)]
+        self._workers = [
+            asyncio.ensure_future(self._lane_worker(index))
+            for index in range(self.lane_count)
+        ]
+    
+    def dispatch(self, phone_number: str, notifications: List[Notification]) -> int:
+        """Queue a customer's messages on their lane and return the lane index"""
+        index = self.lane_for(phone_number, self.lane_count)
+        lane = self.lanes[index]
+        lane.put_nowait(notifications)
+        self.peak_depths[index] = max(self.peak_depths[index], lane.qsize())
+        return index
+    
+    async def _lane_worker(self, index: int):
+        """Process one lane strictly in arrival order"""
+        lane = self.lanes[index]
+        while True:
+            notifications = await lane.get()
+            try:
+                await self._process(notifications)
+            except Exception as e:
+                print(f"❌ Error in lane {index}: {e}")
+            finally:
+                self.processed[index] += 1
+                lane.task_done()
+    
+    def get_stats(self) -> Dict:
+        """Per-lane queue depth so the lane count can be sized"""
+        depths = [lane.qsize() for lane in self.lanes]
+        return {
+            "lanes": self.lane_count,
+            "depths": depths,
+            "queued": sum(depths),
+            "max_depth": max(depths) if depths else 0,
+            "peak_depths": list(self.peak_depths),
+            "processed": sum(self.processed)
+        }
+
+class AgentRunFailed(Exception):
+    """An agent run that timed out or errored; `reply` is what the customer is told.
+
+    Not retryable once the run started a tool with side effects (cart, order, registration).
+    """
+
+    def __init__(self, reply: str, error: str, retryable: bool = True):
+        super().__init__(error)
+        self.reply = reply
+        self.retryable = retryable
+
+class TurnFailed(Exception):
+    """A failed turn the customer has already been told about"""
+
+class DeliveryFailed(Exception):
+    """A turn that ran but whose reply wasn't delivered; the retry only resends `reply`"""
+
+    def __init__(self, reply: str):
+        super().__init__("Reply could not be delivered")
+        self.reply = reply
 
 class WhatsAppHandler:
-    def __init__(self, instance_id: str, token: str):
-        self.bot = GreenAPIBot(instance_id, token)
+    def __init__(self, instance_id: str, token: str, worker_id: Optional[str] = None, receiver: bool = True):
+        self.webhook_mode = settings.WHATSAPP_RECEIVE_MODE == "webhook"
+        # Only the receiving worker talks to GreenAPI's notification queue/webhook
+        self.receiver = receiver
+        self.bot = GreenAPIBot(
+            instance_id,
+            token,
+            host=settings.GREEN_API_HOST,
+            settings=greenapi_webhook_settings() if self.webhook_mode and receiver else None,
+            # Queued notifications only exist in polling mode; with the inbound queue they are
+            # kept and redelivered, and the idempotency store drops the ones already handled
+            delete_notifications_at_startup=receiver and not self.webhook_mode and not (
+                settings.INBOUND_QUEUE_ENABLED or settings.BOT_CLUSTER_ENABLED
+            )
+        )
         self.conversation_service = ConversationService()
         self.state_manager = StateManager
-        self.speech_service = HybridSpeechToTextService()
+        # Built during warm-up (Vosk model loading is slow), or on the first voice note
+        self.speech_service: Optional[HybridSpeechToTextService] = None
+        self._speech_lock = threading.Lock()
+        
+        # Create both agents once from the shared, pooled LLM client
+        agents = AgentFactory.create_agents()
+        self.registration_agent = agents["registration"]
+        self.restaurant_agent = agents["restaurant"]
+        self.registration_config = self.restaurant_config = agents["config"]
+        metrics_registry.register("llm_client", llm_client_manager.get_stats)
+        
+        # Single long-lived event loop that runs every conversation as a coroutine.
+        # Blocking Mongo/GreenAPI/speech calls are offloaded to a bounded I/O pool
+        # so they never stall the loop.
+        self.loop = asyncio.new_event_loop()
+        self.io_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=settings.BLOCKING_IO_WORKERS,
+            thread_name_prefix="bot-io"
+        )
+        self.loop.set_default_executor(self.io_executor)
+        self.loop_thread = threading.Thread(target=self._run_loop, name="WhatsApp-Bot-Loop", daemon=True)
+        self.conversation_slots: Optional[asyncio.Semaphore] = None
+        
+        # Per-customer lanes keep each phone's messages in order
+        self.dispatcher = MessageDispatcher(settings.BOT_WORKER_LANES, self._handle_message_wrapper)
+        metrics_registry.register("lanes", self.dispatcher.get_stats)
+        metrics_registry.register("fast_path", command_parser.get_stats)
+        
+        # Merge rapid consecutive messages from one customer into a single turn
+        self.coalescer = MessageCoalescer(
+            self.loop,
+            quiet_seconds=settings.MESSAGE_COALESCE_WINDOW_MS / 1000,
+            max_wait_seconds=settings.MESSAGE_COALESCE_MAX_WAIT_MS / 1000,
+            flush=self._dispatch_batch
+        )
+        metrics_registry.register("coalescing", self.coalescer.get_stats)
+        
+        # Drop GreenAPI redeliveries before they reach a lane
+        self.idempotency = IdempotencyStore(
+            max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+            ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+            collection=db.processed_messages if settings.IDEMPOTENCY_BACKEND == "mongo" else None
+        )
+        metrics_registry.register("idempotency", self.idempotency.get_stats)
+        metrics_registry.register("outbound", outbound_sender.get_stats)
+        
+        # Push-based receiving: GreenAPI posts notifications to this app instead of being polled
+        self.webhook_receiver: Optional[WebhookReceiver] = None
+        self.webhook_server = None
+        if self.webhook_mode:
+            self.webhook_receiver = WebhookReceiver(
+                self.bot.router,
+                instance_id,
+                token=settings.WHATSAPP_WEBHOOK_TOKEN,
+                path=settings.WHATSAPP_WEBHOOK_PATH
+            )
+            metrics_registry.register("webhook", self.webhook_receiver.get_stats)
+        
+        # Multi-worker mode: customers are partitioned across bot workers by consistent
+        # hashing; messages for partitions owned elsewhere wait in the inbound queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.registry: Optional[WorkerRegistry] = None
+        if settings.BOT_CLUSTER_ENABLED:
+            self.registry = WorkerRegistry(
+                db.bot_workers,
+                worker_id=self.worker_id,
+                partitions=settings.BOT_PARTITIONS,
+                heartbeat_seconds=settings.WORKER_HEARTBEAT_SECONDS,
+                ttl_seconds=settings.WORKER_TTL_SECONDS
+            )
+            self.registry.add_listener(lambda members: cart_store.invalidate())
+            self.registry.add_listener(lambda members: history_cache.invalidate())
+            metrics_registry.register("cluster", self.registry.get_stats)
         
-        # Create both agents
-        self.registration_agent, self.registration_config = RegistrationAgentFactory.create_registration_agent()
-        self.restaurant_agent, self.restaurant_config = AgentFactory.create_restaurant_agent()
+        # Durable inbound queue: messages are persisted before GreenAPI drops them and
+        # acknowledged only after the reply is sent (required when clustered)
+        self.inbound_queue: Optional[InboundQueue] = None
+        self.inflight_queue_ids = set()
+        if settings.INBOUND_QUEUE_ENABLED or self.registry:
+            self.inbound_queue = InboundQueue(
+                db.inbound_messages,
+                db.inbound_dead_letters,
+                lease_seconds=settings.INBOUND_LEASE_SECONDS,
+                max_attempts=settings.INBOUND_MAX_ATTEMPTS,
+                retry_delay_seconds=settings.INBOUND_RETRY_DELAY_SECONDS
+            )
+            metrics_registry.register("inbound_queue", lambda: {
+                **self.inbound_queue.get_stats(), "in_flight": len(self.inflight_queue_ids)
+            })
+        metrics_registry.register("carts", cart_store.get_stats)
+        metrics_registry.register("history_cache", history_cache.get_stats)
+        metrics_registry.register("retention", retention_service.get_stats)
+        if conversation_writer is not None:
+            metrics_registry.register("conversation_writes", conversation_writer.get_stats)
+        metrics_registry.register("response_cache", response_cache.get_stats)
+        metrics_registry.register("context", context_builder.get_stats)
+        metrics_registry.register("llm_scheduler", llm_scheduler.get_stats)
+        metrics_registry.register("model_router", model_router.get_stats)
+        metrics_registry.register("tool_planner", tool_planner.get_stats)
+        metrics_registry.register("agent_runs", run_tracer.get_stats)
         
-        # Thread pool for running agents with more workers for better concurrency
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        # Connections, caches and models primed before this worker takes messages
+        self.warmup = WarmUp(timeout_seconds=settings.WARMUP_TIMEOUT_SECONDS)
+        if settings.WARMUP_ENABLED:
+            self.warmup.add("mongo", lambda: warm_mongo(db, settings.MONGO_MIN_POOL_SIZE))
+            self.warmup.add_blocking("menu_cache", menu_cache.get_items)
+            self.warmup.add_blocking("speech", self._get_speech_service)
+            if settings.WARMUP_LLM_PING:
+                self.warmup.add("llm", lambda: warm_llm(llm_client_manager.get_client(), settings.FAST_MODEL_NAME))
+        metrics_registry.register("warmup", self.warmup.get_stats)
         
         self._setup_handlers()
 
+    def _run_loop(self):
+        """Run the bot event loop forever (executed in the loop thread)"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _setup_loop_state(self):
+        """Create loop-bound primitives inside the running loop"""
+        # Warm up before joining the cluster or receiving, so no message waits on a cold start
+        await self.warmup.run()
+        self.conversation_slots = asyncio.Semaphore(settings.MAX_CONCURRENT_CONVERSATIONS)
+        self.dispatcher.start()
+        if self.registry:
+            await asyncio.to_thread(self.registry.heartbeat)
+            asyncio.ensure_future(self._heartbeat_loop())
+        if self.inbound_queue:
+            # Anything this worker leased before a restart is ours to redo now
+            released = await asyncio.to_thread(self.inbound_queue.release_worker, self.worker_id)
+            if released:
+                print(f"♻️ Re-queued {released} message(s) leased before restart")
+            asyncio.ensure_future(self._consume_inbound())
+            asyncio.ensure_future(self._renew_leases())
+        if settings.METRICS_REPORT_INTERVAL_SECONDS > 0:
+            asyncio.ensure_future(self._report_metrics())
+        if self.receiver:
+            # One worker owns retention; expiry itself is done by Mongo's TTL monitor
+            asyncio.ensure_future(self._retention_loop())
+
+    async def _report_metrics(self):
+        """Periodically log pipeline stats (lane depths etc.)"""
+        while True:
+            await asyncio.sleep(settings.METRICS_REPORT_INTERVAL_SECONDS)
+            snapshot = metrics_registry.snapshot()
+            for name, stats in snapshot.items():
+                if name != "timestamp":
+                    print(f"📊 {name}: {stats}")
+            try:
+                # Read by the admin API, which runs in its own process
+                await asyncio.to_thread(run_tracer.publish, db.agent_run_stats, self.worker_id)
+            except Exception as e:
+                print(f"⚠️ Could not publish agent run stats: {e}")
+
+    async def _retention_loop(self):
+        """Keep the conversations TTL index in line with the settings and sweep what it misses"""
+        try:
+            await asyncio.to_thread(retention_service.ensure_ttl_index)
+        except Exception as e:
+            print(f"⚠️ Could not set up the conversations TTL index: {e}")
+        while settings.RETENTION_SWEEP_INTERVAL_SECONDS > 0:
+            try:
+                await asyncio.to_thread(retention_service.sweep)
+            except Exception as e:
+                print(f"⚠️ Retention sweep failed: {e}")
+            await asyncio.sleep(settings.RETENTION_SWEEP_INTERVAL_SECONDS)
+
+    def _start_loop(self):
+        """Start the event loop thread once and wait until it is ready"""
+        if self.loop_thread.is_alive():
+            return
+        self.loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup_loop_state(), self.loop).result()
+
     def _setup_handlers(self):
         @self.bot.router.message()
         def message_handler(notification: Notification) -> None:
-            # Handle message in a separate thread to avoid blocking
-            self.executor.submit(self._handle_message_wrapper, notification)
+            message_id = notification.event.get("idMessage")
+            if not self.idempotency.check_and_mark(message_id):
+                print(f"♻️ Skipping duplicate delivery of message {message_id}")
+                return
+            try:
+                if self.inbound_queue is not None and not self._persist_inbound(notification):
+                    return
+                # Hand the message to the event loop and return to polling immediately
+                self.loop.call_soon_threadsafe(self._dispatch, notification)
+            except Exception:
+                # Not handed over: let the redelivery through (the webhook answers 503)
+                self.idempotency.forget(message_id)
+                raise
 
-    def _handle_message_wrapper(self, notification: Notification):
-        """Wrapper to handle exceptions in threaded execution"""
+    def _persist_inbound(self, notification: Notification) -> bool:
+        """Write a notification to the durable queue before GreenAPI forgets it.
+
+        Returns True if this worker should process it now; messages for customers owned
+        by another worker stay queued for that worker to claim.
+        """
+        phone_number = clean_phone_number(notification.sender)
+        owned = self.registry is None or self.registry.owns(phone_number)
+        partition = self.registry.partition_for(phone_number) if self.registry else 0
         try:
-            self._handle_message(notification)
+            queue_id = self.inbound_queue.enqueue(
+                notification.event,
+                phone_number,
+                partition,
+                lease_owner=self.worker_id if owned else None
+            )
+        except Exception as e:
+            # Fail open: handle it without durability rather than drop it
+            print(f"⚠️ Could not persist message from {phone_number}, processing directly: {e}")
+            return True
+        if queue_id is None:
+            print(f"♻️ Message {notification.event.get('idMessage')} is already queued")
+            return False
+        if not owned:
+            return False
+        notification.queue_id = queue_id
+        notification.attempts = 1
+        return True
+
+    async def _heartbeat_loop(self):
+        """Keep this worker registered and follow membership changes"""
+        while True:
+            await asyncio.sleep(self.registry.heartbeat_seconds)
+            try:
+                await asyncio.to_thread(self.registry.heartbeat)
+            except Exception as e:
+                print(f"⚠️ Worker heartbeat failed: {e}")
+
+    async def _consume_inbound(self):
+        """Lease queued messages for our customers: forwarded, retried or left by a dead worker"""
+        interval = settings.INBOUND_POLL_INTERVAL_MS / 1000
+        while True:
+            partitions = self.registry.owned_partitions() if self.registry else None
+            try:
+                docs = await asyncio.to_thread(self.inbound_queue.claim, self.worker_id, partitions)
+            except Exception as e:
+                print(f"⚠️ Could not claim queued messages: {e}")
+                docs = []
+            for doc in docs:
+                notification = Notification(doc["event"], self.bot.api, self.bot.router.message.state_manager)
+                notification.queue_id = doc["_id"]
+                notification.attempts = doc["attempts"]
+                notification.pending_reply = doc.get("reply")
+                if doc["attempts"] > 1:
+                    print(f"🔁 Redelivering message {doc['_id']} (attempt {doc['attempts']})")
+                self._dispatch(notification)
+            if not docs:
+                await asyncio.sleep(interval)
+
+    async def _renew_leases(self):
+        """Keep leases alive for messages still waiting in a lane or being processed"""
+        while True:
+            await asyncio.sleep(self.inbound_queue.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.inbound_queue.renew, self.worker_id, list(self.inflight_queue_ids))
+            except Exception as e:
+                print(f"⚠️ Could not renew message leases: {e}")
+
+    async def _settle(self, notifications: List[Notification], error: Optional[str] = None,
+                      reply: Optional[str] = None):
+        """Ack queued messages once handled, or hand them back for a retry"""
+        queue_ids = [n.queue_id for n in notifications if getattr(n, "queue_id", None)]
+        if not queue_ids:
+            return
+        try:
+            if error is None:
+                await asyncio.to_thread(self.inbound_queue.ack, queue_ids)
+            else:
+                for queue_id in queue_ids:
+                    await asyncio.to_thread(self.inbound_queue.nack, queue_id, error, reply)
+        except Exception as e:
+            print(f"⚠️ Could not settle queued messages {queue_ids}: {e}")
+        finally:
+            self.inflight_queue_ids.difference_update(queue_ids)
+
+    def _will_retry(self, notifications: List[Notification]) -> bool:
+        """A failed turn is retried silently while its messages have attempts left"""
+        if self.inbound_queue is None:
+            return False
+        return all(
+            getattr(n, "queue_id", None) and n.attempts < self.inbound_queue.max_attempts
+            for n in notifications
+        )
+
+    def _dispatch(self, notification: Notification):
+        """Collect a notification into its customer's burst (runs in the event loop)"""
+        phone_number = clean_phone_number(notification.sender)
+        notification.received_at = time.monotonic()
+        if getattr(notification, "queue_id", None):
+            self.inflight_queue_ids.add(notification.queue_id)
+        self.coalescer.add(phone_number, notification)
+
+    def _dispatch_batch(self, phone_number: str, notifications: List[Notification]):
+        """Route a finished burst to its customer's lane"""
+        lane = self.dispatcher.dispatch(phone_number, notifications)
+        depth = self.dispatcher.lanes[lane].qsize()
+        if depth > 1:
+            print(f"📥 Queued message from {phone_number} on lane {lane} (depth {depth})")
+
+    async def _handle_message_wrapper(self, notifications: List[Notification]):
+        """Wrapper to bound concurrency and handle exceptions in the event loop"""
+        error = reply = None
+        # The turn's time budget starts when its first message arrived
+        received_at = min(getattr(n, "received_at", time.monotonic()) for n in notifications)
+        try:
+            with deadline_scope(settings.MESSAGE_DEADLINE_SECONDS, started_at=received_at):
+                async with self.conversation_slots:
+                    await self._handle_message(notifications)
         except Exception as e:
             print(f"❌ Error in message handler wrapper: {e}")
+            error = str(e) or type(e).__name__
+            if isinstance(e, DeliveryFailed):
+                reply = e.reply
+            elif not isinstance(e, TurnFailed) and not self._will_retry(notifications):
+                try:
+                    await self._answer(notifications[-1], "Sorry, I encountered an error. Please try again.")
+                except:
+                    pass
+        await self._settle(notifications, error, reply)
+
+    async def _answer(self, notification: Notification, message: str):
+        """Send a reply through the rate-limited outbound sender, in order per chat"""
+        return await outbound_sender.send(notification.chat, message)
+
+    async def _deliver_reply(self, notification: Notification, message: str):
+        """Send a turn's reply; raises DeliveryFailed so its messages are only acked once it is out"""
+        if not await self._answer(notification, message):
+            raise DeliveryFailed(message)
+
+    async def _run_agent_safely(self, agent, context, agent_type="Agent", run_info: Optional[Dict] = None,
+                                phone_number: str = "", priority: int = LLMScheduler.CHAT,
+                                tier: str = ModelRouter.STRONG, intents: frozenset = frozenset()):
+        """Run agent as a coroutine on the shared event loop with a timeout, once the LLM scheduler admits it.
+
+        The model router runs it on the given tier and may escalate to the strong model.
+        If run_info is given it is filled with whether the run succeeded and which tools it called.
+        A timeout or error raises AgentRunFailed so the turn fails (and is retried when queued,
+        unless the run already changed the cart, placed an order or saved the user).
+        """
+        prompt_tokens = context_builder.estimate_tokens(f"{agent.instructions}{context}")
+        with run_tracer.turn(agent_type, phone_number, tier) as trace:
+            trace.prompt_tokens = prompt_tokens
             try:
-                notification.answer("Sorry, I encountered an error. Please try again.")
-            except:
-                pass
-
-    def _run_agent_safely(self, agent, context, config, agent_type="Agent"):
-        """Run agent with proper event loop handling and improved timeout"""
-        start_time = time.time()
-        print(f"🤖 Starting {agent_type}...")
-        
-        def run_with_new_loop():
-            """Run agent in a new event loop"""
-            # Create new event loop for this execution
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+                ticket = await llm_scheduler.acquire(
+                    phone_number, priority, prompt_tokens + settings.LLM_OUTPUT_TOKEN_ESTIMATE,
+                    max_wait=remaining_time(settings.LLM_MAX_QUEUE_WAIT_SECONDS)
+                )
+            except LLMOverloadedError as e:
+                trace.outcome = "shed"
+                print(f"🚦 {agent_type} shed for {phone_number}: {e}")
+                return ("🤖 We're getting a lot of messages right now! You can still send *menu*, *add 1*, "
+                        "*view order* or *confirm* and I'll handle it instantly, or try again in a moment.")
+            
+            start_time = time.time()
+            actual_tokens = None
+            trace.queue_wait = ticket.queue_wait
+            print(f"🤖 Starting {agent_type} (queued {ticket.queue_wait:.2f}s)...")
             
+            # The run gets its own deadline, inherited by its tool calls; on timeout the model request
+            # is cancelled with the run and the deadline is cancelled so tools still in a thread stop
+            timeout = remaining_time(settings.AGENT_TIMEOUT_SECONDS)
+            run_deadline = None
             try:
-                # Run the agent
-                result = Runner.run_sync(
-                    starting_agent=agent,
-                    input=context,
-                    run_config=config
-                )
+                with deadline_scope(timeout) as run_deadline:
+                    result, tool_calls, used_tokens = await asyncio.wait_for(
+                        model_router.run(agent, context, tier, phone_number, intents),
+                        timeout=timeout
+                    )
+                
+                elapsed_time = time.time() - start_time
+                actual_tokens = used_tokens or None
+                context_builder.observe_run(prompt_tokens, elapsed_time)
+                print(f"✅ {agent_type} completed in {elapsed_time:.2f} seconds "
+                      f"(~{prompt_tokens} prompt tokens, queued {ticket.queue_wait:.2f}s, {trace.tier} model, "
+                      f"{len(trace.llm_calls)} model calls, {len(trace.tools)} tool calls, "
+                      f"Mongo {trace.mongo_ms:.0f}ms)")
+                if run_info is not None:
+                    run_info["ok"] = True
+                    run_info["tool_calls"] = tool_calls
                 return result.final_output
+                
+            except asyncio.TimeoutError:
+                trace.outcome = "timeout"
+                elapsed_time = time.time() - start_time
+                if run_deadline is not None:
+                    run_deadline.cancel()
+                print(f"⏱ {agent_type} timed out after {elapsed_time:.2f} seconds")
+                raise self._agent_run_failed(
+                    trace,
+                    "🤖 I'm taking a bit longer than expected. Please try again or type 'menu' to see our offerings!",
+                    f"{agent_type} timed out after {elapsed_time:.2f} seconds"
+                )
             except Exception as e:
-                print(f"❌ Error in {agent_type}: {e}")
+                trace.outcome = "error"
+                print(f"❌ {agent_type} execution error: {e}")
                 import traceback
                 traceback.print_exc()
-                raise e
+                raise self._agent_run_failed(
+                    trace,
+                    "🤖 I encountered an issue. Please try again or type 'menu' to see our offerings!",
+                    f"{agent_type} execution error: {e}"
+                )
             finally:
-                # Clean up the loop
-                loop.close()
-        
-        try:
-            # Execute in thread pool with reduced timeout
-            future = self.executor.submit(run_with_new_loop)
-            # Reduced timeout from 30 to 15 seconds
-            result = future.result(timeout=15)
-            
-            elapsed_time = time.time() - start_time
-            print(f"✅ {agent_type} completed in {elapsed_time:.2f} seconds")
-            return result
-            
-        except concurrent.futures.TimeoutError:
-            elapsed_time = time.time() - start_time
-            print(f"⏱ {agent_type} timed out after {elapsed_time:.2f} seconds")
-            return f"🤖 I'm taking a bit longer than expected. Please try again or type 'menu' to see our offerings!"
-        except Exception as e:
-            print(f"❌ {agent_type} execution error: {e}")
-            return f"🤖 I encountered an issue. Please try again or type 'menu' to see our offerings!"
+                llm_scheduler.release(ticket, actual_tokens)
+
+    @staticmethod
+    def _agent_run_failed(trace, reply: str, error: str) -> AgentRunFailed:
+        """A failed run is only retried if it hasn't started a tool with side effects"""
+        side_effects = set(trace.tools_started) & ModelRouter.SIDE_EFFECT_TOOLS
+        if not side_effects:
+            return AgentRunFailed(reply, error)
+        print(f"⚠️ Not retrying: the run already called {', '.join(sorted(side_effects))}")
+        return AgentRunFailed(
+            "🤖 I've saved your changes but couldn't finish my reply. Type *view order* to check your cart "
+            "or *menu* to keep ordering.",
+            error, retryable=False
+        )
 
-    def _send_quick_acknowledgment(self, notification: Notification, phone_number: str):
+    async def _send_quick_acknowledgment(self, notification: Notification, phone_number: str):
         """Send immediate acknowledgment to user"""
         try:
             quick_responses = [
@@ -107,80 +630,114 @@ class WhatsAppHandler:
             ]
             import random
             acknowledgment = random.choice(quick_responses)
-            notification.answer(acknowledgment)
+            await self._answer(notification, acknowledgment)
             return True
         except:
             return False
 
-    def _handle_message(self, notification: Notification):
+    def _get_speech_service(self) -> HybridSpeechToTextService:
+        """The speech service, created on first use (blocking)"""
+        with self._speech_lock:
+            if self.speech_service is None:
+                self.speech_service = HybridSpeechToTextService()
+            return self.speech_service
+
+    async def _extract_message(self, notification: Notification, phone_number: str):
+        """Get the text of one notification, transcribing voice notes; returns (message, is_voice)"""
+        # Get message data using the available method
+        message_data = None
+        if hasattr(notification, 'get_message_data'):
+            try:
+                message_data = notification.get_message_data()
+            except Exception as e:
+                print(f"❌ Error getting message data: {e}")
+        
+        # Check if it's a voice message
+        is_voice_message = False
+        if message_data and isinstance(message_data, dict):
+            msg_type = message_data.get('typeMessage', '')
+            is_voice_message = msg_type in ['audioMessage', 'voiceMessage', 'pttMessage']
+            
+            # Check fileMessageData for audio files
+            if not is_voice_message and 'fileMessageData' in message_data:
+                file_data = message_data['fileMessageData']
+                if isinstance(file_data, dict):
+                    mime_type = file_data.get('mimeType', '')
+                    if 'audio' in mime_type or 'voice' in mime_type:
+                        is_voice_message = True
+        
+        if is_voice_message:
+            print(f"🎤 Processing voice message from {phone_number}")
+            # Send quick acknowledgment for voice messages
+            await self._send_quick_acknowledgment(notification, phone_number)
+            # Handle voice message
+            message = await self._process_voice_message(notification, phone_number)
+            if not message:
+                print(f"❌ Voice processing failed for {phone_number}")
+                # Fallback message
+                message = "Hello"
+                # Notify user about the voice issue
+                await asyncio.to_thread(
+                    self.conversation_service.save_conversation,
+                    phone_number,
+                    "assistant", 
+                    "🎤 I received your voice message but couldn't process it clearly. How can I help you today?"
+                )
+            else:
+                print(f"✅ Voice message processed: {message}")
+        else:
+            # Regular text message
+            message = notification.message_text
+            print(f"💬 Text message: {message}")
+        
+        return message, is_voice_message
+
+    async def _handle_message(self, notifications: List[Notification]):
+        """Handle one coalesced burst of messages from a customer as a single turn"""
+        # Replies go to the chat of the latest message in the burst
+        notification = notifications[-1]
+        # Redelivered messages whose turn already ran only need its reply sent again
+        pending = [n for n in notifications if getattr(n, "pending_reply", None)]
+        if pending:
+            for reply in dict.fromkeys(n.pending_reply for n in pending):
+                print(f"📤 Resending an undelivered reply to {clean_phone_number(notification.sender)}")
+                await self._deliver_reply(notification, reply)
+            notifications = [n for n in notifications if n not in pending]
+            if not notifications:
+                return
+            notification = notifications[-1]
         try:
             # Extract and clean phone number
             raw_phone_number = notification.sender
             phone_number = clean_phone_number(raw_phone_number)
             
             # Debug: Print notification details
-            print(f"📨 Received message from {phone_number}")
-            
-            # Get message data using the available method
-            message_data = None
-            if hasattr(notification, 'get_message_data'):
-                try:
-                    message_data = notification.get_message_data()
-                except Exception as e:
-                    print(f"❌ Error getting message data: {e}")
+            print(f"📨 Received {len(notifications)} message(s) from {phone_number}")
             
-            # Check if it's a voice message
+            messages = []
             is_voice_message = False
-            if message_data and isinstance(message_data, dict):
-                msg_type = message_data.get('typeMessage', '')
-                is_voice_message = msg_type in ['audioMessage', 'voiceMessage', 'pttMessage']
-                
-                # Check fileMessageData for audio files
-                if not is_voice_message and 'fileMessageData' in message_data:
-                    file_data = message_data['fileMessageData']
-                    if isinstance(file_data, dict):
-                        mime_type = file_data.get('mimeType', '')
-                        if 'audio' in mime_type or 'voice' in mime_type:
-                            is_voice_message = True
-            
-            if is_voice_message:
-                print(f"🎤 Processing voice message from {phone_number}")
-                # Send quick acknowledgment for voice messages
-                self._send_quick_acknowledgment(notification, phone_number)
-                # Handle voice message
-                message = self._process_voice_message(notification, phone_number)
-                if not message:
-                    print(f"❌ Voice processing failed for {phone_number}")
-                    # Fallback message
-                    message = "Hello"
-                    # Notify user about the voice issue
-                    self.conversation_service.save_conversation(
-                        phone_number,
-                        "assistant", 
-                        "🎤 I received your voice message but couldn't process it clearly. How can I help you today?"
-                    )
-                else:
-                    print(f"✅ Voice message processed: {message}")
-            else:
-                # Regular text message
-                message = notification.message_text
-                print(f"💬 Text message: {message}")
+            for item in notifications:
+                item_message, item_is_voice = await self._extract_message(item, phone_number)
+                if item_message:
+                    messages.append(item_message)
+                    # Save each user message to conversation history (once, not on redelivery)
+                    if getattr(item, "attempts", 1) <= 1:
+                        await asyncio.to_thread(self.conversation_service.save_conversation, phone_number, "user", item_message)
+                is_voice_message = is_voice_message or item_is_voice
             
             # Ensure message is not None
-            if not message:
+            if not messages:
                 print(f"❌ Received empty message from {phone_number}")
-                notification.answer("Sorry, I didn't receive any message. Please try again.")
+                await self._deliver_reply(notification, "Sorry, I didn't receive any message. Please try again.")
                 return
             
-            # Save user message to conversation history
-            self.conversation_service.save_conversation(phone_number, "user", message)
-            
-            # Clear old conversations periodically
-            self.conversation_service.clear_old_conversations(phone_number)
+            message = "\n".join(messages)
+            if len(messages) > 1:
+                print(f"🧩 Coalesced {len(messages)} messages into one turn: {message!r}")
             
             # Get user state
             print(f"🔍 Checking user state for {phone_number}...")
-            user_state = self.state_manager.get_user_state(phone_number)
+            user_state = await asyncio.to_thread(self.state_manager.get_user_state, phone_number)
             user_exists = user_state['is_registered']
             user_data = user_state['user_data']
             
@@ -188,33 +745,17 @@ class WhatsAppHandler:
             if user_data:
                 print(f"👤 User name: {user_data.get('name', 'Not set')}")
             
-            # Get limited conversation history
-            conversation_history = self.conversation_service.get_conversation_history(phone_number, limit=25)
-            
-            # Quick responses for common queries (no agent needed)
-            lower_message = message.lower() if message else ""
-            
-            # Handle quick menu request
-            if lower_message in ['menu', 'show menu', 'mnu', 'm']:
-                from tools.menu_tools import show_menu_base  # Import base function
-                quick_menu = show_menu_base()  # Use base function
-                self.conversation_service.save_conversation(phone_number, "assistant", quick_menu)
-                notification.answer(quick_menu)
+            # Structured commands (menu, cart, add items, confirm) skip the LLM entirely
+            fast_response = await self._try_fast_path(message, phone_number, user_exists)
+            if fast_response:
+                await asyncio.to_thread(self.conversation_service.save_conversation, phone_number, "assistant", fast_response)
+                await self._deliver_reply(notification, fast_response)
                 return
-
-
-
-            # Handle quick order view
             
-            if lower_message in ['view order', 'show cart', 'cart', 'my order']:
-                    if user_exists:
-                        from tools.order_tools import view_current_order_base  # Import base function
-                        order_view = view_current_order_base(phone_number)  # Use base function
-                        self.conversation_service.save_conversation(phone_number, "assistant", order_view)
-                        notification.answer(order_view)
-                        return
-
-
+            # Get limited conversation history
+            conversation_history = await asyncio.to_thread(
+                self.conversation_service.get_conversation_history, phone_number, limit=25
+            )
             
             if user_exists:
                 # Existing user - use restaurant agent
@@ -227,19 +768,13 @@ class WhatsAppHandler:
                 user_message_count = sum(1 for msg in recent_messages if msg.get('role') == 'user')
                 is_new_session = user_message_count <= 1  # This is their first or second message
                 
-                # Determine user intent
-                is_greeting = any(word in lower_message for word in 
-                                ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 
-                                 'good evening', 'salam', 'assalam', 'aoa'])
-                
-                is_confirmation = any(word in lower_message for word in 
-                                    ['confirm', 'place order', 'yes confirm', 'checkout', 'proceed', "that's it", 'done'])
-                is_view_order = any(word in lower_message for word in 
-                                  ['view order', 'show cart', 'my order', 'current order'])
-                is_adding_items = any(word in lower_message for word in 
-                                    ['add', 'want', 'order']) and any(char.isdigit() for char in (message or ""))
-                is_menu_request = any(word in lower_message for word in 
-                                    ['menu', 'show menu', 'what do you have'])
+                # Determine user intent (all intents in one pass)
+                intents = intent_matcher.classify(message)
+                is_greeting = "greeting" in intents
+                is_confirmation = "confirmation" in intents
+                is_view_order = "view_order" in intents
+                is_adding_items = "adding_items" in intents and any(char.isdigit() for char in (message or ""))
+                is_menu_request = "menu_request" in intents
                 
                 print(f"📊 Intent Analysis:")
                 print(f"   - Greeting: {is_greeting}")
@@ -253,38 +788,78 @@ class WhatsAppHandler:
                 # Determine if we should show menu
                 should_show_menu = is_new_session or is_greeting or is_menu_request
                 
-                # Create optimized context
-                context = f"""
-                CUSTOMER: {user_data['name']} (Phone: {phone_number})
-                ADDRESS: {user_data['address']}, {user_data['city']}
-                
-                CURRENT MESSAGE: {message}
-                {"(Voice message)" if is_voice_message else ""}
+                # Checkout goes ahead of ordering, which goes ahead of chit-chat, when the LLM is busy
+                if is_confirmation or is_view_order:
+                    priority = LLMScheduler.CHECKOUT
+                elif is_adding_items:
+                    priority = LLMScheduler.ORDERING
+                else:
+                    priority = LLMScheduler.CHAT
                 
-                INTENT:
-                - Greeting: {is_greeting}
-                - Confirming order: {is_confirmation}
-                - Viewing order: {is_view_order}
-                - Adding items: {is_adding_items}
-                - Menu request: {is_menu_request}
-                - Should show menu: {should_show_menu}
+                # Obvious single-tool turns skip the agent entirely
+                menu_items = await asyncio.to_thread(menu_cache.get_items)
+                plan = None
+                if settings.TOOL_PLANNER_ENABLED:
+                    plan = tool_planner.plan_restaurant(phone_number, message, intents, menu_items)
                 
-                RECENT CONVERSATION (Last 3):
-                {self._get_recent_messages(conversation_history, limit=3)}
+                if plan:
+                    print(f"🧭 {plan} for {phone_number} without the agent")
+                    await asyncio.to_thread(self.state_manager.update_user_state, phone_number, 'ordering')
+                    response = await asyncio.to_thread(run_tool_with_deadline, tool_planner.execute, plan)
+                else:
+                    # Build the prompt against the token budget (stable sections first)
+                    cart = await asyncio.to_thread(cart_store.get, phone_number)
+                    context = context_builder.build_restaurant_context(
+                        user_data, phone_number, message, intents, cart.items, menu_items, conversation_history,
+                        is_voice=is_voice_message, is_new_session=is_new_session,
+                        show_menu=should_show_menu, instructions=self.restaurant_agent.instructions
+                    )
                 
-                INSTRUCTIONS: Respond immediately based on the detected intent. Be concise.
-                """
+                    # Update state
+                    await asyncio.to_thread(self.state_manager.update_user_state, phone_number, 'ordering')
                 
-                # Update state
-                self.state_manager.update_user_state(phone_number, 'ordering')
+                    # Short, PII-free turns (e.g. "show menu please") can reuse an earlier reply
+                    cache_key = None
+                    if settings.RESPONSE_CACHE_ENABLED:
+                        menu_version = await asyncio.to_thread(menu_cache.get_version)
+                        last_assistant_message = next(
+                            (msg.get('message', '') for msg in reversed(conversation_history.get('messages', []))
+                             if msg.get('role') == 'assistant'),
+                            ""
+                        )
+                        cache_key = response_cache.key_for(
+                            "restaurant", message, intents, cart.items, menu_version,
+                            last_reply=last_assistant_message,
+                            new_session=is_new_session, voice=is_voice_message
+                        )
+                    response = None
+                    if cache_key:
+                        response = await asyncio.to_thread(response_cache.get, cache_key, "restaurant")
+                        if response:
+                            print(f"♻️ Response cache hit for {phone_number}")
                 
-                # Run restaurant agent with proper event loop handling
-                response = self._run_agent_safely(
-                    self.restaurant_agent,
-                    context,
-                    self.restaurant_config,
-                    "Restaurant Agent"
-                )
+                    if not response:
+                        # Run restaurant agent on the shared event loop
+                        tool_planner.record_agent_turn()
+                        run_info = {"ok": False, "tool_calls": []}
+                        agent_started = time.time()
+                        route_intents = intents if is_adding_items else intents - {"adding_items"}
+                        response = await self._run_agent_safely(
+                            self.restaurant_agent,
+                            context,
+                            "Restaurant Agent",
+                            run_info=run_info,
+                            phone_number=phone_number,
+                            priority=priority,
+                            tier=model_router.choose("restaurant", route_intents, message, phone_number, is_voice_message),
+                            intents=route_intents
+                        )
+                        if settings.RESPONSE_CACHE_ENABLED and run_info["ok"]:
+                            await asyncio.to_thread(
+                                response_cache.put, cache_key, "restaurant", response, run_info["tool_calls"],
+                                time.time() - agent_started, user_data.get('name', ''),
+                                (phone_number, user_data.get('address'))
+                            )
                 
                 # Ensure we have a response
                 if not response or response.strip() == "":
@@ -292,8 +867,7 @@ class WhatsAppHandler:
                     if is_greeting or is_new_session:
                         response = f"Hello {user_data.get('name', 'there')}! 👋 Welcome back to our restaurant! Let me show you our menu..."
                         # Force show menu
-                        from tools.menu_tools import show_menu
-                        menu_text = show_menu()
+                        menu_text = await asyncio.to_thread(show_menu_base)
                         response = response + "\n\n" + menu_text
                     else:
                         response = "I'm here to help you with your order! You can:\n• Say 'menu' to see our offerings\n• Say 'view order' to check your cart\n• Tell me what you'd like to order!"
@@ -302,76 +876,118 @@ class WhatsAppHandler:
                 # New user - use registration agent
                 print(f"📝 Using Registration Agent for new user")
                 
-                # Send quick acknowledgment for new users
-                try:
-                    notification.answer("Welcome! I'll help you get registered. Just a moment... 🎯")
-                except:
-                    pass
-                
-                context = f"""
-                NEW USER REGISTRATION
-                Phone: {phone_number}
-                
-                RECENT CONVERSATION:
-                {self._get_recent_messages(conversation_history, limit=5)}
-                
-                CURRENT MESSAGE: {message}
-                {"(Voice message)" if is_voice_message else ""}
-                
-                Help this new user register by collecting their details.
-                """
-                
-                # Update state
-                self.state_manager.update_user_state(phone_number, 'registering')
+                # Details we can read straight from the message are saved without the agent
+                draft = user_state.get('registration_draft') or {}
+                plan = None
+                if settings.TOOL_PLANNER_ENABLED and not is_voice_message:
+                    plan = tool_planner.plan_registration(phone_number, message, draft)
                 
-                # Run registration agent with proper event loop handling
-                response = self._run_agent_safely(
-                    self.registration_agent,
-                    context,
-                    self.registration_config,
-                    "Registration Agent"
-                )
+                if plan:
+                    print(f"🧭 {plan} for {phone_number} without the agent")
+                    response = await asyncio.to_thread(run_tool_with_deadline, tool_planner.execute, plan)
+                    await asyncio.to_thread(
+                        self.state_manager.update_user_state, phone_number, 'registering',
+                        {"registration_draft": plan.draft}
+                    )
+                else:
+                    # Send quick acknowledgment for new users
+                    try:
+                        await self._answer(notification, "Welcome! I'll help you get registered. Just a moment... 🎯")
+                    except:
+                        pass
+                    
+                    context = context_builder.build_registration_context(
+                        phone_number, message, conversation_history,
+                        is_voice=is_voice_message, draft=draft,
+                        instructions=self.registration_agent.instructions
+                    )
+                    
+                    # Update state
+                    await asyncio.to_thread(self.state_manager.update_user_state, phone_number, 'registering')
+                    
+                    # Run registration agent on the shared event loop
+                    tool_planner.record_agent_turn()
+                    response = await self._run_agent_safely(
+                        self.registration_agent,
+                        context,
+                        "Registration Agent",
+                        phone_number=phone_number,
+                        priority=LLMScheduler.CHAT
+                    )
                 
                 # Check if registration was completed
-                new_state = self.state_manager.get_user_state(phone_number)
+                new_state = await asyncio.to_thread(self.state_manager.get_user_state, phone_number)
                 if new_state['is_registered'] and not user_exists:
                     # User just registered
                     print(f"✅ User registration completed! Showing menu...")
                     # Add menu immediately without running another agent
-                    from tools.menu_tools import show_menu_base  # Import base function
-                    menu_text = show_menu_base()  # Use base function
+                    menu_text = await asyncio.to_thread(show_menu_base)
                     response = response + "\n\n" + menu_text
             
             # Save assistant response
-            self.conversation_service.save_conversation(phone_number, "assistant", response)
+            await asyncio.to_thread(self.conversation_service.save_conversation, phone_number, "assistant", response)
             
             # Send response back to WhatsApp
             print(f"📤 Sending response to WhatsApp...")
-            notification.answer(response)
+            await self._deliver_reply(notification, response)
             print(f"✅ Message handling completed successfully")
             
         except Exception as e:
-            error_msg = f"Sorry, an error occurred: {str(e)}"
+            if isinstance(e, DeliveryFailed):
+                # The turn itself is done; the wrapper keeps the reply for the retry
+                raise
             print(f"❌ Error in message handler: {e}")
-            import traceback
-            traceback.print_exc()
-            notification.answer(error_msg)
+            if not isinstance(e, AgentRunFailed):
+                import traceback
+                traceback.print_exc()
+            retryable = not isinstance(e, AgentRunFailed) or e.retryable
+            if retryable and self._will_retry(notifications):
+                # The wrapper nacks the queued messages and the turn runs again
+                raise
+            error_msg = e.reply if isinstance(e, AgentRunFailed) else f"Sorry, an error occurred: {str(e)}"
             if 'phone_number' in locals():
-                self.conversation_service.save_conversation(phone_number, "assistant", error_msg)
+                await asyncio.to_thread(self.conversation_service.save_conversation, phone_number, "assistant", error_msg)
+            if not retryable:
+                # Its tools already ran, so running it again would repeat them: the turn is done
+                await self._deliver_reply(notification, error_msg)
+                return
+            await self._answer(notification, error_msg)
+            # Still a failure: the last attempt of a queued message goes to the dead letters
+            raise TurnFailed(str(e)) from e
 
-    def _get_recent_messages(self, conversation_history, limit=3):
-        """Get only recent messages for context"""
-        messages = conversation_history.get('messages', [])
-        recent = messages[-limit:] if len(messages) > limit else messages
+    async def _try_fast_path(self, message: str, phone_number: str, user_exists: bool) -> Optional[str]:
+        """Execute unambiguous structured commands directly; None means use the agent"""
+        if not settings.FAST_PATH_ENABLED:
+            return None
+        
+        menu_items = await asyncio.to_thread(menu_cache.get_items)
+        commands = command_parser.parse(message, menu_items)
+        if not commands:
+            return None
+        
+        # Only the menu is available before registration
+        if not user_exists and any(c.action != ParsedCommand.MENU for c in commands):
+            return None
         
-        formatted = ""
-        for msg in recent:
-            role = "Customer" if msg["role"] == "user" else "Assistant"
-            formatted += f"{role}: {msg['message']}\n"
+        print(f"⚡ Fast path for {phone_number}: {commands}")
+        responses = []
+        for command in commands:
+            if command.action == ParsedCommand.MENU:
+                responses.append(await asyncio.to_thread(show_menu_base, command.category))
+            elif command.action == ParsedCommand.CART:
+                responses.append(await asyncio.to_thread(view_current_order_base, phone_number))
+            elif command.action == ParsedCommand.ADD:
+                responses.append(await asyncio.to_thread(
+                    add_to_order_base, phone_number, command.item_ids, command.quantities
+                ))
+            elif command.action == ParsedCommand.CONFIRM:
+                responses.append(await asyncio.to_thread(confirm_order_base, phone_number))
         
-        return formatted if formatted else "No recent messages"
+        if user_exists:
+            await asyncio.to_thread(self.state_manager.update_user_state, phone_number, 'ordering')
+        return "\n\n".join(responses)
 
-    def _process_voice_message(self, notification: Notification, phone_number: str) -> Optional[str]:
+    async def _process_voice_message(self, notification: Notification, phone_number: str) -> Optional[str]:
         """Process voice message and convert to text"""
         try:
             print(f"🎤 Processing voice message from {phone_number}")
@@ -405,18 +1021,20 @@ class WhatsAppHandler:
             print(f"🔗 Audio URL: {audio_url}")
             
             # Try to detect language from recent messages
-            language = self._detect_language(phone_number)
+            language = await asyncio.to_thread(self._detect_language, phone_number)
             print(f"🌐 Detected language: {language}")
             
             # Convert voice to text using hybrid service
             try:
-                text = self.speech_service.convert_voice_to_text(audio_url, language)
+                speech_service = await asyncio.to_thread(self._get_speech_service)
+                text = await asyncio.to_thread(speech_service.convert_voice_to_text, audio_url, language)
                 
                 if text and text.strip():
                     print(f"✅ Voice transcribed: {text}")
                     # Save with voice indicator
                     voice_indicator = "[🎤 Voice Message] " if language == "en" else "[🎤 صوتی پیغام] "
-                    self.conversation_service.save_conversation(
+                    await asyncio.to_thread(
+                        self.conversation_service.save_conversation,
                         phone_number,
                         "user",
                         f"{voice_indicator}{text}",
@@ -507,11 +1125,76 @@ class WhatsAppHandler:
         print("   • Automatic language detection (English/Urdu)")
         print("   • Multiple language fallbacks")
         print("   • Works without API keys")
-        print("\n✅ Event loop handling configured for multi-threaded execution")
+        print(f"\n✅ Async pipeline: up to {settings.MAX_CONCURRENT_CONVERSATIONS} concurrent conversations")
         
-        self.bot.run_forever()
+        self._start_loop()
+        print(f"✅ Worker {self.worker_id} ready (warm-up {self.warmup.total_seconds:.2f}s)")
+        try:
+            if not self.receiver:
+                print(f"🧩 Worker {self.worker_id} processing queued messages only")
+                self._wait_forever()
+            elif self.webhook_mode:
+                self._serve_webhook()
+            else:
+                print("📡 Receiving messages by polling GreenAPI")
+                self.bot.run_forever()
+        finally:
+            self.shutdown()
+
+    def _serve_webhook(self):
+        """Serve the webhook app on the bot event loop until interrupted"""
+        import uvicorn
+
+        config = uvicorn.Config(
+            self.webhook_receiver.app,
+            host=settings.WHATSAPP_WEBHOOK_HOST,
+            port=settings.WHATSAPP_WEBHOOK_PORT,
+            log_level="warning",
+            access_log=False
+        )
+        self.webhook_server = uvicorn.Server(config)
+        # The loop runs in its own thread, so uvicorn must not install signal handlers
+        self.webhook_server.install_signal_handlers = lambda: None
+        print(f"📡 Receiving messages by webhook on "
+              f"http://{settings.WHATSAPP_WEBHOOK_HOST}:{settings.WHATSAPP_WEBHOOK_PORT}{settings.WHATSAPP_WEBHOOK_PATH}")
+        if not settings.WHATSAPP_WEBHOOK_TOKEN:
+            print("⚠️ WHATSAPP_WEBHOOK_TOKEN is not set - webhook requests are not authenticated")
+
+        serving = asyncio.run_coroutine_threadsafe(self.webhook_server.serve(), self.loop)
+        try:
+            while not serving.done():
+                time.sleep(0.5)
+            serving.result()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.webhook_server.should_exit = True
+
+    def _wait_forever(self):
+        """Block the main thread while the event loop does the work"""
+        try:
+            while self.loop_thread.is_alive():
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+    def shutdown(self):
+        """Stop the event loop and the blocking I/O pool"""
+        if self.registry:
+            self.registry.leave()
+        if conversation_writer is not None:
+            conversation_writer.close()
+        if self.loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(llm_client_manager.aclose(), self.loop).result(timeout=5)
+            except Exception as e:
+                print(f"⚠️ Could not close LLM client: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.loop_thread.is_alive():
+            self.loop_thread.join(timeout=5)
+        self.io_executor.shutdown(wait=False)
 
     def __del__(self):
         """Cleanup thread pool on deletion"""
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=False)
+        if hasattr(self, 'io_executor'):
+            self.io_executor.shutdown(wait=False)
@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import menu, order, auth, webhooks
+from api.routers import menu, order, auth, webhooks, admin
 import multiprocessing
 import uvicorn
 import os
+import signal
+import socket
 import sys
 from dotenv import load_dotenv
 from config.database import db
@@ -45,6 +47,7 @@ app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(menu.router, prefix="/api/v1/menu", tags=["menu"])
 app.include_router(order.router, prefix="/api/v1/orders", tags=["orders"])
 app.include_router(webhooks.router, prefix="/api/v1/webhooks", tags=["webhooks"])
+app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 @app.get("/")
 async def root():
@@ -56,6 +59,7 @@ async def root():
             "menu": "/api/v1/menu",
             "orders": "/api/v1/orders",
             "webhooks": "/api/v1/webhooks",
+            "admin": "/api/v1/admin",
             "docs": "/docs",
             "redoc": "/redoc"
         }
@@ -107,25 +111,37 @@ def run_api_server():
         log_level="info"
     )
 
-def run_whatsapp_bot():
+def run_whatsapp_bot(worker_index: int = 0):
     """Run WhatsApp bot in a separate process"""
     # Set up the path
     sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
     
     try:
-        print("\n🤖 Starting WhatsApp Bot...")
+        print(f"\n🤖 Starting WhatsApp Bot worker {worker_index}...")
         
         # Initialize menu for WhatsApp bot process too (since it's a separate process)
-        initialize_menu()
+        if worker_index == 0:
+            initialize_menu()
         
         from handlers.whatsapp_handler import WhatsAppHandler
         from config.settings import settings
         
+        # Worker 0 receives from GreenAPI; the others only process their partitions
         handler = WhatsAppHandler(
             instance_id=settings.WHATSAPP_INSTANCE_ID,
-            token=settings.WHATSAPP_TOKEN
+            token=settings.WHATSAPP_TOKEN,
+            worker_id=f"{socket.gethostname()}-bot-{worker_index}",
+            receiver=worker_index == 0 and settings.BOT_RECEIVER
         )
         
+        # process.terminate() sends SIGTERM, which skips atexit; exit through handler.run()
+        # instead so its shutdown() flushes buffered conversation writes
+        def stop(signum, frame):
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            print(f"🛑 WhatsApp bot worker {worker_index} stopping...")
+            raise SystemExit(0)
+        signal.signal(signal.SIGTERM, stop)
+        
         # Run the bot
         handler.run()
         
@@ -140,41 +156,53 @@ if __name__ == "__main__":
     print("=" * 60)
     print("\nStarting both API server and WhatsApp bot...\n")
     
+    from config.settings import settings
+    
+    # Indexes are created once here, before the API and bot processes start querying
+    if settings.INDEX_BOOTSTRAP_ENABLED and db is not None:
+        from config.indexes import ensure_indexes
+        ensure_indexes(db.db)
+    
     # Create separate processes for each service
     api_process = multiprocessing.Process(target=run_api_server, name="API-Server")
-    bot_process = multiprocessing.Process(target=run_whatsapp_bot, name="WhatsApp-Bot")
+    bot_processes = [
+        multiprocessing.Process(target=run_whatsapp_bot, args=(i,), name=f"WhatsApp-Bot-{i}")
+        for i in range(settings.BOT_WORKERS)
+    ]
     
-    # Start both processes
+    # Start all processes
     api_process.start()
-    bot_process.start()
+    for bot_process in bot_processes:
+        bot_process.start()
     
     print("\n✅ Both services are starting...")
     print("\n📌 Services running:")
     print("    - API Server: http://localhost:8000")
     print("    - API Docs: http://localhost:8000/docs")
-    print("    - WhatsApp Bot: Active and listening for messages")
+    print(f"    - WhatsApp Bot: {settings.BOT_WORKERS} worker(s), active and listening for messages")
     print("\n⚠  Press Ctrl+C to stop both services\n")
     
     try:
-        # Wait for both processes
+        # Wait for all processes
         api_process.join()
-        bot_process.join()
+        for bot_process in bot_processes:
+            bot_process.join()
     except KeyboardInterrupt:
         print("\n\n🛑 Shutting down services...")
         
         # Terminate processes gracefully
-        api_process.terminate()
-        bot_process.terminate()
+        processes = [api_process] + bot_processes
+        for process in processes:
+            process.terminate()
         
-        # Wait for processes to finish
-        api_process.join(timeout=5)
-        bot_process.join(timeout=5)
+        # Wait for processes to finish (bot workers flush buffered conversation writes first)
+        for process in processes:
+            process.join(timeout=20)
         
         # Force kill if still running
-        if api_process.is_alive():
-            api_process.kill()
-        if bot_process.is_alive():
-            bot_process.kill()
+        for process in processes:
+            if process.is_alive():
+                process.kill()
         
         print("👋 Goodbye!")
         sys.exit(0)
@@ -28,8 +28,19 @@ class Order:
         self.items.append(item)
         self.total += item.subtotal
 
+    def clear(self):
+        self.items = []
+        self.total = 0.0
+
     def to_dict(self) -> Dict:
         return {
             'items': [item.to_dict() for item in self.items],
             'total': self.total
         }
+
+    @classmethod
+    def from_dict(cls, phone_number: str, data: Optional[Dict]) -> "Order":
+        order = cls(phone_number)
+        for item in (data or {}).get('items', []):
+            order.add_item(OrderItem(item['id'], item['name'], item['price'], item['quantity']))
+        return order
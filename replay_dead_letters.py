@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Inspect and replay dead-lettered WhatsApp messages
+
+    python replay_dead_letters.py                 # list dead letters
+    python replay_dead_letters.py --replay        # put all of them back on the inbound queue
+    python replay_dead_letters.py --replay --phone 923001234567 --limit 10
+"""
+import argparse
+from config.database import db
+from config.settings import settings
+from services.inbound_queue import InboundQueue
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay dead-lettered WhatsApp messages")
+    parser.add_argument("--replay", action="store_true", help="move matching dead letters back to the queue")
+    parser.add_argument("--phone", help="only messages from this phone number")
+    parser.add_argument("--id", dest="message_id", help="only this message id")
+    parser.add_argument("--limit", type=int, default=0, help="maximum number of messages (0 = all)")
+    args = parser.parse_args()
+
+    if db is None:
+        print("❌ No database connection")
+        return 1
+
+    queue = InboundQueue(
+        db.inbound_messages,
+        db.inbound_dead_letters,
+        lease_seconds=settings.INBOUND_LEASE_SECONDS,
+        max_attempts=settings.INBOUND_MAX_ATTEMPTS
+    )
+
+    query = {}
+    if args.phone:
+        query["phone_number"] = args.phone
+    if args.message_id:
+        query["_id"] = args.message_id
+
+    if args.replay:
+        count = queue.replay_dead_letters(query, args.limit)
+        print(f"✅ Replayed {count} message(s); running bot workers will pick them up")
+        return 0
+
+    dead_letters = list(db.inbound_dead_letters.find(query).sort("dead_at", -1).limit(args.limit))
+    print(f"☠️ {len(dead_letters)} dead-lettered message(s)")
+    for dead in dead_letters:
+        text = (dead.get("event", {}).get("messageData", {})
+                .get("textMessageData", {}).get("textMessage", "<non-text message>"))
+        print(f"  • {dead['_id']} from {dead.get('phone_number')} at {dead.get('created_at')} "
+              f"({dead.get('attempts')} attempts): {dead.get('error')}")
+        print(f"    {text[:80]!r}")
+    print(f"\nQueue depth: {queue.depth()}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+from config.database import db
+from config.settings import settings
+from models.order import Order
+from pymongo.errors import DuplicateKeyError
+import threading
+import time
+
+class CartConflictError(Exception):
+    """Raised when a cart keeps changing underneath us (e.g. two workers own one customer)"""
+
+class CartStore:
+    """Carts kept in the shared user_states collection with a small local read cache.
+
+    Every write is a compare-and-set on `cart_version`, so two bot workers can never
+    silently overwrite each other's cart; the loser reloads and reapplies its change.
+    Partition ownership means one worker normally owns each customer, which keeps the
+    cache warm; it is cleared whenever partitions move.
+    """
+
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, collection, cache_ttl_seconds: float = 300, max_cached: int = 10000):
+        self.collection = collection
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.max_cached = max_cached
+        self._cache: Dict[str, Tuple[Order, int, float]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "conflicts": 0}
+
+        if self.collection is not None:
+            try:
+                # One state (and cart) per customer, even when concurrent writes create it
+                self.collection.create_index("phone_number", name="phone_number_unique", unique=True)
+            except Exception as e:
+                print(f"⚠️ Could not create unique phone index for carts: {e}")
+
+    def get(self, phone_number: str) -> Order:
+        """Current cart for a customer (empty if none)"""
+        return self._load(phone_number)[0]
+
+    def update(self, phone_number: str, mutate: Callable[[Order], None]) -> Order:
+        """Apply a change to the cart and persist it atomically"""
+        for _ in range(self.MAX_ATTEMPTS):
+            order, version = self._load(phone_number)
+            # Work on a copy so a failed write never leaves a half-applied cart in the cache
+            order = Order.from_dict(phone_number, order.to_dict())
+            mutate(order)
+            if self._write(phone_number, order, version):
+                return order
+            self.invalidate(phone_number)
+        raise CartConflictError(f"Cart for {phone_number} changed concurrently {self.MAX_ATTEMPTS} times")
+
+    def clear(self, phone_number: str):
+        """Empty the cart (after an order is placed)"""
+        self.update(phone_number, lambda order: order.clear())
+
+    def invalidate(self, phone_number: Optional[str] = None):
+        """Drop one cached cart, or all of them (on partition rebalance)"""
+        with self._lock:
+            if phone_number is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(phone_number, None)
+
+    def _load(self, phone_number: str) -> Tuple[Order, int]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(phone_number)
+            if cached and cached[2] > now:
+                self.stats["hits"] += 1
+                return cached[0], cached[1]
+
+        self.stats["misses"] += 1
+        doc = self.collection.find_one(
+            {"phone_number": phone_number},
+            {"current_order": 1, "cart_version": 1}
+        ) or {}
+        order = Order.from_dict(phone_number, doc.get("current_order"))
+        version = doc.get("cart_version", 0)
+        self._remember(phone_number, order, version)
+        return order, version
+
+    def _write(self, phone_number: str, order: Order, version: int) -> bool:
+        changes = {
+            "current_order": order.to_dict(),
+            "cart_version": version + 1,
+            "cart_updated_at": datetime.utcnow()
+        }
+        try:
+            result = self.collection.update_one(
+                {"phone_number": phone_number, "cart_version": version if version else {"$in": [0, None]}},
+                {"$set": changes}
+            )
+            written = result.matched_count == 1
+            if not written and version == 0:
+                # No state yet: create it, unless one appeared since we loaded (a stale load
+                # must not insert a second state document for the customer)
+                result = self.collection.update_one(
+                    {"phone_number": phone_number},
+                    {"$setOnInsert": changes},
+                    upsert=True
+                )
+                written = result.upserted_id is not None
+        except DuplicateKeyError:
+            # A concurrent insert for a brand-new customer lost on the unique phone index
+            written = False
+
+        if not written:
+            self.stats["conflicts"] += 1
+            return False
+
+        self.stats["writes"] += 1
+        self._remember(phone_number, order, version + 1)
+        return True
+
+    def _remember(self, phone_number: str, order: Order, version: int):
+        with self._lock:
+            if len(self._cache) >= self.max_cached and phone_number not in self._cache:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[phone_number] = (order, version, time.monotonic() + self.cache_ttl_seconds)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            cached = len(self._cache)
+        return {**self.stats, "cached": cached}
+
+# Global instance shared by the order tools and the fast path
+cart_store = CartStore(
+    db.user_states if db else None,
+    cache_ttl_seconds=settings.CART_CACHE_TTL_SECONDS
+)
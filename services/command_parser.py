@@ -0,0 +1,297 @@
+from typing import Dict, List, Optional, Set, Tuple
+import re
+import threading
+
+class ParsedCommand:
+    """A single structured command recognised without the LLM"""
+
+    MENU = "menu"
+    CART = "cart"
+    CONFIRM = "confirm"
+    ADD = "add"
+
+    def __init__(self, action: str, item_ids: List[int] = None, quantities: List[int] = None,
+                 category: str = "all"):
+        self.action = action
+        self.item_ids = item_ids or []
+        self.quantities = quantities or []
+        self.category = category
+
+    def __repr__(self) -> str:
+        if self.action == self.ADD:
+            return f"ParsedCommand(add, items={self.item_ids}, qty={self.quantities})"
+        if self.action == self.MENU:
+            return f"ParsedCommand(menu, category={self.category})"
+        return f"ParsedCommand({self.action})"
+
+class CommandParser:
+    """Grammar-based parser for the structured messages that make up most ordering traffic.
+
+    Returns None whenever the message is ambiguous so the caller can fall back to the agent.
+    """
+
+    MAX_QUANTITY = 50
+
+    MENU_PHRASES = {"menu", "show menu", "mnu", "m", "the menu", "full menu", "show me the menu",
+                    "send menu", "menu please", "what do you have", "menu dikhao", "menu bhejo"}
+    # "done" / "that's it" only show the cart (which asks for an explicit confirm) rather than ordering
+    CART_PHRASES = {"cart", "view order", "show cart", "view cart", "my order", "my cart",
+                    "current order", "show order", "show my order", "order dikhao",
+                    "done", "thats it", "proceed"}
+    CONFIRM_PHRASES = {"confirm", "confirm order", "confirm my order", "place order", "place my order",
+                       "yes confirm", "checkout", "check out", "order confirm", "order confirm karo", "confirm karo"}
+
+    # Leading phrases that mark an add request (longest first)
+    ADD_PREFIXES = [
+        ["i", "would", "like"], ["id", "like"], ["can", "i", "have"], ["can", "i", "get"],
+        ["i", "will", "have"], ["ill", "have"], ["give", "me"], ["get", "me"], ["i", "want"],
+        ["mujhe"], ["mujhay"], ["add"], ["want"], ["order"],
+    ]
+    ADD_SUFFIXES = [["de", "do"], ["dedo"], ["chahiye"], ["chahye"], ["please"]]
+
+    FILLER_WORDS = {"please", "pls", "plz", "the", "of", "item", "items", "number", "also", "more",
+                    "bhi", "to", "my", "order", "cart", "in"}
+    SEPARATORS = {"and", "aur", "n", "plus", "&"}
+
+    NUMBER_WORDS = {
+        # English
+        "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+        "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+        "single": 1, "couple": 2, "dozen": 12,
+        # Roman Urdu
+        "aik": 1, "ek": 1, "do": 2, "dou": 2, "teen": 3, "tin": 3, "char": 4, "chaar": 4,
+        "panch": 5, "paanch": 5, "chay": 6, "chhe": 6, "che": 6, "cheh": 6, "saat": 7, "sat": 7,
+        "aath": 8, "ath": 8, "nau": 9, "das": 10, "dus": 10,
+        # Urdu script
+        "ایک": 1, "دو": 2, "تین": 3, "چار": 4, "پانچ": 5, "چھ": 6, "سات": 7, "آٹھ": 8, "نو": 9, "دس": 10,
+    }
+
+    # Spellings and abbreviations only; they go through the same menu lookup and ambiguity check
+    ITEM_ALIASES = {
+        "coke": "coca cola", "cocacola": "coca cola", "oj": "orange juice",
+        "margarita": "margherita", "peperoni": "pepperoni",
+    }
+
+    URDU_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+    def __init__(self):
+        self._index_lock = threading.Lock()
+        self._index_key: Optional[Tuple] = None
+        self._menu_ids: Set[int] = set()
+        self._token_index: Dict[str, Set[int]] = {}
+        self._name_index: Dict[str, int] = {}
+        self._categories: List[str] = []
+        self.parsed_count = 0
+        self.ambiguous_count = 0
+
+    def parse(self, message: str, menu_items: List[Dict]) -> Optional[List[ParsedCommand]]:
+        """Parse a message (one command per line) or return None if any part is ambiguous"""
+        self._build_index(menu_items)
+        lines = [line for line in re.split(r"[\n;]+", message or "") if line.strip()]
+        if not lines:
+            return None
+
+        commands = []
+        for line in lines:
+            command = self._parse_line(line)
+            if command is None:
+                self.ambiguous_count += 1
+                return None
+            commands.append(command)
+
+        self.parsed_count += 1
+        return commands
+
+    def get_stats(self) -> Dict:
+        """Fast-path hit counts"""
+        total = self.parsed_count + self.ambiguous_count
+        return {
+            "parsed": self.parsed_count,
+            "fallbacks": self.ambiguous_count,
+            "hit_rate": round(self.parsed_count / total, 3) if total else 0.0
+        }
+
+    def _normalize(self, text: str) -> List[str]:
+        """Lowercase, unify digits and punctuation, and split into tokens"""
+        text = text.lower().translate(self.URDU_DIGITS)
+        text = re.sub(r"\[[^\]]*\]", " ", text)  # voice tags like [Auto-detected: Urdu]
+        text = text.replace("'", "").replace("’", "")
+        text = re.sub(r"[,،+&/]", " and ", text)
+        text = re.sub(r"(\d+)\s*x\b", r"\1 x", text)   # 2x -> 2 x
+        text = re.sub(r"\bx\s*(\d+)", r"x \1", text)   # x2 -> x 2
+        text = re.sub(r"#\s*(\d+)", r"\1", text)
+        text = re.sub(r"[^\w\s؀-ۿ]", " ", text)
+        return text.split()
+
+    def _parse_line(self, line: str) -> Optional[ParsedCommand]:
+        tokens = self._normalize(line)
+        if not tokens:
+            return None
+        phrase = " ".join(t for t in tokens if t not in {"please", "pls", "plz"})
+
+        if phrase in self.CONFIRM_PHRASES:
+            return ParsedCommand(ParsedCommand.CONFIRM)
+        if phrase in self.CART_PHRASES:
+            return ParsedCommand(ParsedCommand.CART)
+        if phrase in self.MENU_PHRASES:
+            return ParsedCommand(ParsedCommand.MENU)
+
+        menu_command = self._parse_menu_category(phrase.split())
+        if menu_command:
+            return menu_command
+
+        return self._parse_add(tokens)
+
+    def _parse_menu_category(self, tokens: List[str]) -> Optional[ParsedCommand]:
+        """'menu 2', 'menu pizza', 'pizza menu', 'show desserts'"""
+        if len(tokens) != 2:
+            return None
+        if tokens[0] == "menu":
+            ref = tokens[1]
+        elif tokens[1] == "menu" or tokens[0] == "show":
+            ref = tokens[0] if tokens[1] == "menu" else tokens[1]
+        else:
+            return None
+
+        if ref.isdigit():
+            position = int(ref)
+            if 1 <= position <= len(self._categories):
+                return ParsedCommand(ParsedCommand.MENU, category=self._categories[position - 1])
+            return None
+
+        for category in self._categories:
+            lowered = category.lower()
+            if ref in (lowered, lowered + "s", lowered + "es") or self._singular(ref) == lowered:
+                return ParsedCommand(ParsedCommand.MENU, category=category)
+        return None
+
+    def _parse_add(self, tokens: List[str]) -> Optional[ParsedCommand]:
+        has_verb = False
+        for prefix in self.ADD_PREFIXES:
+            if tokens[:len(prefix)] == prefix:
+                tokens = tokens[len(prefix):]
+                has_verb = True
+                break
+        for suffix in self.ADD_SUFFIXES:
+            if len(tokens) > len(suffix) and tokens[-len(suffix):] == suffix:
+                tokens = tokens[:-len(suffix)]
+                has_verb = has_verb or suffix != ["please"]
+                break
+        if not tokens:
+            return None
+
+        clauses: List[List[str]] = [[]]
+        for token in tokens:
+            if token in self.SEPARATORS:
+                clauses.append([])
+            else:
+                clauses[-1].append(token)
+
+        item_ids: List[int] = []
+        quantities: List[int] = []
+        for clause in clauses:
+            clause = [t for t in clause if t not in self.FILLER_WORDS]
+            if not clause:
+                continue
+            parsed = self._parse_clause(clause, has_verb)
+            if parsed is None:
+                return None
+            item_id, quantity = parsed
+            if item_id in item_ids:
+                quantities[item_ids.index(item_id)] += quantity
+            else:
+                item_ids.append(item_id)
+                quantities.append(quantity)
+
+        if not item_ids or any(q > self.MAX_QUANTITY for q in quantities):
+            return None
+        return ParsedCommand(ParsedCommand.ADD, item_ids=item_ids, quantities=quantities)
+
+    def _parse_clause(self, clause: List[str], has_verb: bool) -> Optional[Tuple[int, int]]:
+        """Resolve one 'quantity + item reference' clause to (item_id, quantity)"""
+        # "3" after an explicit verb is an item number
+        if len(clause) == 1 and clause[0].isdigit():
+            item_id = int(clause[0])
+            return (item_id, 1) if has_verb and item_id in self._menu_ids else None
+
+        # "2 x 3" could be two of item 3 or three of item 2
+        if len(clause) == 3 and clause[1] == "x" and clause[0].isdigit() and clause[2].isdigit():
+            return None
+
+        quantity = None
+        if clause[0].isdigit() or clause[0] in self.NUMBER_WORDS:
+            quantity = self._quantity(clause[0])
+            clause = clause[1:]
+            if clause and clause[0] == "x":
+                clause = clause[1:]
+        if len(clause) >= 2 and clause[-2] == "x" and clause[-1].isdigit():
+            if quantity is not None:
+                return None
+            quantity = int(clause[-1])
+            clause = clause[:-2]
+        if not clause or quantity == 0:
+            return None
+        # A bare "coke" or "pizza?" is a mention or a question, not an order
+        if quantity is None and not has_verb:
+            return None
+
+        item_id = self._resolve_item(clause)
+        if item_id is None:
+            return None
+        return item_id, quantity or 1
+
+    def _quantity(self, token: str) -> int:
+        return int(token) if token.isdigit() else self.NUMBER_WORDS[token]
+
+    def _resolve_item(self, words: List[str]) -> Optional[int]:
+        """Map item words to exactly one menu id, or None if unknown/ambiguous"""
+        name = " ".join(words)
+        if name in self._name_index:
+            return self._name_index[name]
+
+        candidates: Optional[Set[int]] = None
+        for word in " ".join(self.ITEM_ALIASES.get(word, word) for word in words).split():
+            matches = self._token_index.get(word) or self._token_index.get(self._singular(word))
+            if not matches:
+                return None
+            candidates = matches if candidates is None else candidates & matches
+
+        if candidates and len(candidates) == 1:
+            return next(iter(candidates))
+        return None
+
+    @staticmethod
+    def _singular(word: str) -> str:
+        if word.endswith("es") and len(word) > 4:
+            return word[:-2]
+        if word.endswith("s") and len(word) > 3:
+            return word[:-1]
+        return word
+
+    def _build_index(self, menu_items: List[Dict]):
+        """Rebuild name/token lookups only when the menu changes"""
+        key = tuple((item.get("id"), item.get("name"), item.get("category")) for item in menu_items)
+        with self._index_lock:
+            if key == self._index_key:
+                return
+            menu_ids, token_index, name_index, categories = set(), {}, {}, []
+            for item in menu_items:
+                item_id, name = item.get("id"), (item.get("name") or "").lower()
+                if item_id is None:
+                    continue
+                menu_ids.add(item_id)
+                name_index[" ".join(re.sub(r"[^\w\s]", " ", name).split())] = item_id
+                for token in re.sub(r"[^\w\s]", " ", name).split():
+                    token_index.setdefault(token, set()).add(item_id)
+                category = item.get("category")
+                if category and category not in categories:
+                    categories.append(category)
+
+            self._menu_ids = menu_ids
+            self._token_index = token_index
+            self._name_index = name_index
+            self._categories = sorted(categories, key=str.lower)
+            self._index_key = key
+
+# Global instance
+command_parser = CommandParser()
@@ -1,8 +1,150 @@
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Deque, List, Dict, Optional, Tuple
 from config.database import db
 from config.settings import settings
 from utils.phone_utils import clean_phone_number
+from services.intent_matcher import intent_matcher
+from services.conversation_writer import conversation_writer
+import threading
+
+class HistoryCache:
+    """Recent conversation messages per customer, kept in memory (write-through).
+
+    A customer's buffer is filled from Mongo on first access and then appended to on
+    every save, so reads only hit Mongo on a miss. Buffers hold the latest
+    `max_messages` messages with their timestamps already formatted; the least recently
+    used customers are evicted past `max_customers` or the memory cap. A load that
+    races with a save for the same customer is returned but not cached.
+    """
+
+    ENTRY_OVERHEAD_BYTES = 400
+
+    def __init__(self, max_messages: int = 25, max_customers: int = 5000, max_bytes: int = 32 * 1024 * 1024):
+        self.max_messages = max_messages
+        self.max_customers = max_customers
+        self.max_bytes = max_bytes
+        # phone -> {"messages", "since" (the buffer is complete from then on), "bytes"}
+        self._buffers: "OrderedDict[str, Dict]" = OrderedDict()
+        self._bytes = 0
+        self._write_seq = 0
+        # Last save per phone, to spot saves that land while a load is in flight
+        self._last_write: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "appends": 0, "evictions": 0, "raced_loads": 0}
+
+    @staticmethod
+    def make_entry(role: str, message: str, timestamp: datetime) -> Tuple[datetime, Dict]:
+        """(timestamp, message as returned in histories)"""
+        return timestamp, {
+            "role": role,
+            "message": message,
+            # Use ISO 8601 format for international standard
+            "timestamp": timestamp.isoformat() + "Z",
+            # Also include human-readable format
+            "timestamp_readable": timestamp.strftime("%Y-%m-%d %H:%M:%S UTC")
+        }
+
+    def get(self, phone_number: str, limit: int, since: datetime) -> Optional[List[Dict]]:
+        """Up to `limit` messages newer than `since`, or None when Mongo must be asked"""
+        with self._lock:
+            buffer = self._buffers.get(phone_number)
+            covered = buffer is not None and limit <= self.max_messages and (
+                since >= buffer["since"] or len(buffer["messages"]) == self.max_messages)
+            if not covered:
+                self.stats["misses"] += 1
+                return None
+            self._buffers.move_to_end(phone_number)
+            self.stats["hits"] += 1
+            messages = [message for at, message in buffer["messages"] if at >= since]
+        return messages[-limit:]
+
+    def write_marker(self) -> int:
+        """Call before loading from Mongo; pass the result to store()"""
+        with self._lock:
+            return self._write_seq
+
+    def store(self, phone_number: str, entries: List[Tuple[datetime, Dict]], since: datetime, marker: int):
+        """Cache what was loaded from Mongo (oldest first, at most max_messages)"""
+        with self._lock:
+            if self._last_write.get(phone_number, -1) > marker:
+                # A save landed while we were reading; the next access reloads instead
+                self.stats["raced_loads"] += 1
+                return
+            self.stats["loads"] += 1
+            self._drop(phone_number)
+            messages: Deque[Tuple[datetime, Dict]] = deque(entries[-self.max_messages:], maxlen=self.max_messages)
+            size = sum(self._size(entry) for entry in messages)
+            self._buffers[phone_number] = {"messages": messages, "since": since, "bytes": size}
+            self._bytes += size
+            self._evict()
+
+    def append(self, phone_number: str, entry: Tuple[datetime, Dict]):
+        """Add a just-saved message to the customer's buffer, if cached"""
+        with self._lock:
+            self._write_seq += 1
+            self._last_write[phone_number] = self._write_seq
+            self._last_write.move_to_end(phone_number)
+            while len(self._last_write) > self.max_customers:
+                self._last_write.popitem(last=False)
+
+            buffer = self._buffers.get(phone_number)
+            if buffer is None:
+                return
+            self.stats["appends"] += 1
+            messages = buffer["messages"]
+            if len(messages) == messages.maxlen:
+                removed = self._size(messages[0])
+                buffer["bytes"] -= removed
+                self._bytes -= removed
+            messages.append(entry)
+            added = self._size(entry)
+            buffer["bytes"] += added
+            self._bytes += added
+            self._buffers.move_to_end(phone_number)
+            self._evict()
+
+    def invalidate(self, phone_number: Optional[str] = None):
+        """Drop one customer's buffer, or all of them (e.g. on partition rebalance)"""
+        with self._lock:
+            if phone_number is None:
+                self._buffers.clear()
+                self._bytes = 0
+            else:
+                self._drop(phone_number)
+
+    def _drop(self, phone_number: str):
+        buffer = self._buffers.pop(phone_number, None)
+        if buffer is not None:
+            self._bytes -= buffer["bytes"]
+
+    def _evict(self):
+        while self._buffers and (len(self._buffers) > self.max_customers or self._bytes > self.max_bytes):
+            _, buffer = self._buffers.popitem(last=False)
+            self._bytes -= buffer["bytes"]
+            self.stats["evictions"] += 1
+
+    def _size(self, entry: Tuple[datetime, Dict]) -> int:
+        return len(entry[1]["message"] or "") * 2 + self.ENTRY_OVERHEAD_BYTES
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "customers": len(self._buffers),
+                "messages": sum(len(buffer["messages"]) for buffer in self._buffers.values()),
+                "memory_mb": round(self._bytes / (1024 * 1024), 2),
+                "memory_cap_mb": round(self.max_bytes / (1024 * 1024), 2)
+            }
+
+# Global instance
+history_cache = HistoryCache(
+    max_messages=max(settings.CONVERSATION_HISTORY_LIMIT, settings.CONVERSATION_CACHE_MESSAGES),
+    max_customers=settings.CONVERSATION_CACHE_MAX_CUSTOMERS,
+    max_bytes=settings.CONVERSATION_CACHE_MAX_MB * 1024 * 1024
+)
 
 class ConversationService:
     @staticmethod
@@ -19,7 +161,12 @@ class ConversationService:
                 "metadata": metadata or {}
             }
             
-            db.conversations.insert_one(doc)
+            if conversation_writer is not None:
+                # Written in the background in batches; the history cache already has it
+                conversation_writer.save(doc)
+            else:
+                db.conversations.insert_one(doc)
+            history_cache.append(cleaned_phone, HistoryCache.make_entry(role, message, doc["timestamp"]))
         except Exception as e:
             print(f"Error saving conversation: {e}")
 
@@ -38,12 +185,28 @@ class ConversationService:
             # Get messages from last N hours to maintain relevance
             time_threshold = datetime.utcnow() - timedelta(hours=hours)
             
-            conversations = list(db.conversations.find({
-                "phone_number": cleaned_phone,
-                "timestamp": {"$gte": time_threshold}
-            }).sort("timestamp", -1).limit(limit))
+            messages = history_cache.get(cleaned_phone, limit, time_threshold)
+            if messages is None:
+                marker = history_cache.write_marker()
+                # Saved but not yet flushed; taken before the query so nothing falls in between
+                unflushed = conversation_writer.pending_for(cleaned_phone) if conversation_writer else []
+                # Load a full buffer so later, larger limits are served from memory too
+                conversations = list(db.conversations.find({
+                    "phone_number": cleaned_phone,
+                    "timestamp": {"$gte": time_threshold}
+                }).sort([("timestamp", -1), ("_id", -1)]).limit(max(limit, history_cache.max_messages)))
+                if unflushed:
+                    loaded = {conv["_id"] for conv in conversations}
+                    conversations += [doc for doc in unflushed
+                                      if doc["_id"] not in loaded and doc["timestamp"] >= time_threshold]
+                    conversations.sort(key=lambda conv: (conv["timestamp"], conv["_id"]), reverse=True)
+                    conversations = conversations[:max(limit, history_cache.max_messages)]
+                entries = [HistoryCache.make_entry(conv["role"], conv["message"], conv["timestamp"])
+                           for conv in reversed(conversations)]
+                history_cache.store(cleaned_phone, entries, time_threshold, marker)
+                messages = [message for _, message in entries[-limit:]]
             
-            if not conversations:
+            if not messages:
                 return {
                     "summary": "No recent conversation history.",
                     "messages": [],
@@ -52,32 +215,21 @@ class ConversationService:
                 }
             
             # Build structured history
-            messages = []
             last_order_mentioned = None
             pending_items = []
             
-            for conv in reversed(conversations):
-                msg_data = {
-                    "role": conv["role"],
-                    "message": conv["message"],
-                    # Use ISO 8601 format for international standard
-                    "timestamp": conv["timestamp"].isoformat() + "Z",
-                    # Also include human-readable format
-                    "timestamp_readable": conv["timestamp"].strftime("%Y-%m-%d %H:%M:%S UTC")
-                }
-                messages.append(msg_data)
-                
+            for msg_data in messages:
                 # Extract context from messages
-                if conv["role"] == "user" and conv.get("message"):
+                if msg_data["role"] == "user" and msg_data.get("message"):
                     # Check for order-related keywords
-                    message_text = conv["message"]
+                    message_text = msg_data["message"]
                     if message_text:  # Ensure message is not None
-                        lower_msg = message_text.lower()
-                        if any(word in lower_msg for word in ["add", "order", "want", "pizza", "burger"]):
+                        intents = intent_matcher.classify(message_text)
+                        if "order_mention" in intents:
                             last_order_mentioned = message_text
 
                         # Check for pending actions
-                        if "yes" in lower_msg or "confirm" in lower_msg:
+                        if "confirmation_mention" in intents:
                             pending_items.append("user_confirmed_something")
             
             # Create conversation summary
@@ -137,24 +289,3 @@ class ConversationService:
             formatted += f"\nLAST ORDER INTENT: {history_data['last_order_mentioned']}\n"
         
         return formatted
-    
-    
-    @staticmethod
-    def clear_old_conversations(phone_number: str, days: int = None):
-        """Clear conversations older than N days"""
-        if days is None:
-            days = settings.OLD_CONVERSATION_CLEANUP_DAYS
-        try:
-            cleaned_phone = clean_phone_number(phone_number)
-            threshold = datetime.utcnow() - timedelta(days=days)
-            
-            result = db.conversations.delete_many({
-                "phone_number": cleaned_phone,
-                "timestamp": {"$lt": threshold}
-            })
-            
-            if result.deleted_count > 0:
-                print(f"Cleared {result.deleted_count} old conversations for {cleaned_phone}")
-                
-        except Exception as e:
-            print(f"Error clearing old conversations: {e}")
\ No newline at end of file
@@ -0,0 +1,194 @@
+from bson import ObjectId
+from collections import deque
+from pymongo.errors import BulkWriteError
+from typing import Deque, Dict, List, Optional
+from config.settings import settings
+from config.database import db
+import atexit
+import threading
+import time
+
+class ConversationWriter:
+    """Write-behind buffer for conversation messages.
+
+    Saves only append to an in-memory batch; a background thread writes batches with
+    insert_many once `batch_size` documents are waiting or the oldest has waited
+    `flush_interval` seconds. Every document gets its `_id` when it is saved, so a batch
+    that failed part-way is simply written again (duplicates are ignored): delivery is
+    at-least-once and a message is never stored twice. Failed batches are retried with
+    backoff and stay visible to readers through pending_for() until they are written.
+    If Mongo stays down and the buffer fills up, saves fall back to a direct insert.
+    """
+
+    DUPLICATE_KEY = 11000
+
+    def __init__(self, collection, batch_size: int = 50, flush_interval: float = 0.2,
+                 max_pending: int = 10000, max_backoff_seconds: float = 5.0):
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_backoff_seconds = max_backoff_seconds
+        self._pending: List[Dict] = []
+        # Taken from _pending but not yet confirmed written
+        self._in_flight: List[Dict] = []
+        self._enqueued_at: Dict[ObjectId, float] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._lags: Deque[float] = deque(maxlen=1000)
+        self._flush_sizes: Deque[int] = deque(maxlen=1000)
+        self.stats = {"saved": 0, "written": 0, "flushes": 0, "failed_flushes": 0,
+                      "duplicates_skipped": 0, "direct_writes": 0, "max_flush_size": 0}
+
+    def save(self, doc: Dict):
+        """Queue a conversation document (assigns its _id)"""
+        doc.setdefault("_id", ObjectId())
+        with self._condition:
+            if self._closed or len(self._pending) + len(self._in_flight) >= self.max_pending:
+                direct = True
+            else:
+                direct = False
+                self._pending.append(doc)
+                self._enqueued_at[doc["_id"]] = time.monotonic()
+                self.stats["saved"] += 1
+                self._start()
+                if len(self._pending) >= self.batch_size:
+                    self._condition.notify()
+        if direct:
+            # Backpressure: the caller waits for its own write instead of growing the buffer
+            self.stats["direct_writes"] += 1
+            self.collection.insert_one(doc)
+
+    def pending_for(self, phone_number: str) -> List[Dict]:
+        """Documents for a customer that may not be in Mongo yet (read before querying Mongo)"""
+        with self._condition:
+            return [doc for doc in self._in_flight + self._pending if doc.get("phone_number") == phone_number]
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Write everything queued so far; returns False if it could not be written in time"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._condition.notify()
+            while self._pending or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._thread is None:
+                    return False
+                self._condition.wait(min(remaining, 0.1))
+        return True
+
+    def close(self, timeout: float = 10.0):
+        """Flush and stop the writer (on shutdown); later saves are written directly"""
+        written = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if not written:
+            print(f"⚠️ {len(self._pending) + len(self._in_flight)} conversation message(s) "
+                  f"could not be written before shutdown")
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        backoff = 0.0
+        retry_at = 0.0
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._pending:
+                        oldest = self._enqueued_at.get(self._pending[0]["_id"], time.monotonic())
+                        due = oldest + self.flush_interval
+                        if len(self._pending) >= self.batch_size:
+                            due = 0.0
+                        wait = max(due, retry_at) - time.monotonic()
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                if self._closed and not self._pending:
+                    self._thread = None
+                    self._condition.notify_all()
+                    return
+                batch = self._pending[:self.batch_size]
+                del self._pending[:len(batch)]
+                self._in_flight = batch
+
+            if self._write(batch):
+                backoff = retry_at = 0.0
+                now = time.monotonic()
+                with self._condition:
+                    for doc in batch:
+                        enqueued_at = self._enqueued_at.pop(doc["_id"], None)
+                        if enqueued_at is not None:
+                            self._lags.append(now - enqueued_at)
+                    self._in_flight = []
+                    self._condition.notify_all()
+            else:
+                backoff = min(self.max_backoff_seconds, max(0.5, backoff * 2))
+                retry_at = time.monotonic() + backoff
+                with self._condition:
+                    # Back to the front so messages are retried before newer ones
+                    self._pending[:0] = batch
+                    self._in_flight = []
+                    if self._closed:
+                        # Shutting down: give up rather than retry forever
+                        self._thread = None
+                        self._condition.notify_all()
+                        return
+
+    def _write(self, batch: List[Dict]) -> bool:
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            duplicates = [error for error in errors if error.get("code") == self.DUPLICATE_KEY]
+            if len(duplicates) != len(errors):
+                return self._failed(batch, e)
+            # Already written by an earlier attempt that looked like it failed
+            self.stats["duplicates_skipped"] += len(duplicates)
+        except Exception as e:
+            return self._failed(batch, e)
+        self.stats["flushes"] += 1
+        self.stats["written"] += len(batch)
+        self.stats["max_flush_size"] = max(self.stats["max_flush_size"], len(batch))
+        self._flush_sizes.append(len(batch))
+        return True
+
+    def _failed(self, batch: List[Dict], error: Exception) -> bool:
+        self.stats["failed_flushes"] += 1
+        print(f"⚠️ Could not write {len(batch)} conversation message(s), will retry: {error}")
+        return False
+
+    def get_stats(self) -> Dict:
+        def percentile(values: List[float], p: float) -> float:
+            if not values:
+                return 0.0
+            return round(values[min(len(values) - 1, int(p * len(values)))], 3)
+
+        with self._condition:
+            lags = sorted(self._lags)
+            sizes = list(self._flush_sizes)
+            pending = len(self._pending) + len(self._in_flight)
+        return {
+            **self.stats,
+            "pending": pending,
+            "avg_flush_size": round(sum(sizes) / len(sizes), 1) if sizes else 0.0,
+            "lag_p50_s": percentile(lags, 0.50),
+            "lag_p95_s": percentile(lags, 0.95),
+            "lag_max_s": round(lags[-1], 3) if lags else 0.0
+        }
+
+# Global instance (None when write-behind is disabled)
+conversation_writer: Optional[ConversationWriter] = None
+if settings.CONVERSATION_WRITE_BEHIND and db is not None:
+    conversation_writer = ConversationWriter(
+        db.conversations,
+        batch_size=settings.CONVERSATION_WRITE_BATCH_SIZE,
+        flush_interval=settings.CONVERSATION_WRITE_FLUSH_MS / 1000,
+        max_pending=settings.CONVERSATION_WRITE_MAX_PENDING
+    )
+    atexit.register(conversation_writer.close)
@@ -0,0 +1,99 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+from pymongo.errors import DuplicateKeyError
+import threading
+import time
+
+class IdempotencyStore:
+    """Bounded, TTL-evicted record of processed message ids.
+
+    Memory mode keeps an insertion-ordered dict (oldest first), so the duplicate check,
+    insert and eviction are all O(1). Mongo mode additionally records ids in a shared
+    collection with a unique _id and a TTL index, so several bot processes agree.
+    """
+
+    def __init__(self, max_entries: int = 50000, ttl_seconds: int = 3600, collection=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.collection = collection
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.backend_errors = 0
+
+        if self.collection is not None:
+            try:
+                self.collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+            except Exception as e:
+                print(f"⚠️ Could not create TTL index for processed messages: {e}")
+
+    def check_and_mark(self, message_id: Optional[str]) -> bool:
+        """Record a message id; returns False if it was already processed"""
+        if not message_id:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            if message_id in self._seen:
+                self.hits += 1
+                return False
+            self._seen[message_id] = now + self.ttl_seconds
+
+        if self.collection is not None and not self._mark_shared(message_id):
+            with self._lock:
+                self.hits += 1
+            return False
+
+        with self._lock:
+            self.misses += 1
+        return True
+
+    def forget(self, message_id: Optional[str]):
+        """Undo check_and_mark for a message that could not be handed over, so a redelivery is processed"""
+        if not message_id:
+            return
+        with self._lock:
+            self._seen.pop(message_id, None)
+        if self.collection is not None:
+            try:
+                self.collection.delete_one({"_id": message_id})
+            except Exception as e:
+                self.backend_errors += 1
+                print(f"⚠️ Could not forget processed message {message_id}: {e}")
+
+    def _mark_shared(self, message_id: str) -> bool:
+        """Insert into the shared collection; a duplicate key means another process saw it"""
+        try:
+            self.collection.insert_one({"_id": message_id, "created_at": datetime.utcnow()})
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            # Fail open: better to risk a duplicate than to drop a customer message
+            self.backend_errors += 1
+            print(f"⚠️ Idempotency store error, processing message anyway: {e}")
+            return True
+
+    def _evict(self, now: float):
+        """Drop expired ids from the front and enforce the size bound"""
+        while self._seen:
+            oldest_id, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) < self.max_entries:
+                break
+            del self._seen[oldest_id]
+            self.evictions += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "mongo" if self.collection is not None else "memory",
+                "size": len(self._seen),
+                "duplicates_dropped": self.hits,
+                "unique_messages": self.misses,
+                "evictions": self.evictions,
+                "backend_errors": self.backend_errors
+            }
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from pymongo.errors import DuplicateKeyError
+import uuid
+
+class InboundQueue:
+    """Durable queue of incoming WhatsApp notifications with lease/ack semantics.
+
+    A notification is written here before GreenAPI is told we have it, and is only deleted
+    once its reply has been sent. Workers lease items while processing them; if a worker
+    dies, the lease expires and the item is delivered again. Items that have been leased
+    `max_attempts` times without an ack are moved to the dead-letter collection.
+    """
+
+    PENDING = "pending"
+    LEASED = "leased"
+
+    def __init__(self, collection, dead_letters, lease_seconds: float = 120, max_attempts: int = 5,
+                 retry_delay_seconds: float = 5):
+        self.collection = collection
+        self.dead_letters = dead_letters
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.stats = {"enqueued": 0, "duplicates": 0, "claimed": 0, "acked": 0,
+                      "retried": 0, "dead_lettered": 0}
+
+    def enqueue(self, event: Dict, phone_number: str, partition: int = 0,
+                lease_owner: Optional[str] = None) -> Optional[str]:
+        """Persist a notification; returns its queue id, or None if it is already queued.
+
+        With lease_owner set the item is leased to that worker straight away, so a worker
+        that owns the customer can process it without a claim round trip.
+        """
+        now = datetime.utcnow()
+        doc = {
+            "_id": event.get("idMessage") or uuid.uuid4().hex,
+            "event": event,
+            "phone_number": phone_number,
+            "partition": partition,
+            "status": self.PENDING,
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now
+        }
+        if lease_owner:
+            doc.update(status=self.LEASED, attempts=1, lease_owner=lease_owner,
+                       lease_until=now + timedelta(seconds=self.lease_seconds))
+        try:
+            self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            self.stats["duplicates"] += 1
+            return None
+        self.stats["enqueued"] += 1
+        return doc["_id"]
+
+    def claim(self, worker_id: str, partitions: Optional[Iterable[int]] = None, limit: int = 100) -> List[Dict]:
+        """Lease available items (pending, or with an expired lease) in arrival order"""
+        now = datetime.utcnow()
+        query = {"$or": [
+            {"status": self.PENDING, "available_at": {"$lte": now}},
+            {"status": self.LEASED, "lease_until": {"$lt": now}}
+        ]}
+        if partitions is not None:
+            query["partition"] = {"$in": list(partitions)}
+
+        candidates = [doc["_id"] for doc in
+                      self.collection.find(query, {"_id": 1}).sort("created_at", 1).limit(limit)]
+        if not candidates:
+            return []
+
+        # Re-check the condition per document so two workers can never lease the same item
+        claim_id = uuid.uuid4().hex
+        self.collection.update_many(
+            {"_id": {"$in": candidates}, **query},
+            {"$set": {"status": self.LEASED, "lease_owner": worker_id, "claim_id": claim_id,
+                      "lease_until": now + timedelta(seconds=self.lease_seconds)},
+             "$inc": {"attempts": 1}}
+        )
+        docs = list(self.collection.find({"claim_id": claim_id}).sort("created_at", 1))
+
+        deliverable = []
+        for doc in docs:
+            if doc["attempts"] > self.max_attempts:
+                self.dead_letter(doc, "lease expired too many times")
+            else:
+                deliverable.append(doc)
+        self.stats["claimed"] += len(deliverable)
+        return deliverable
+
+    def ack(self, queue_ids: Iterable[str]):
+        """Remove items whose reply has been sent"""
+        queue_ids = list(queue_ids)
+        if queue_ids:
+            result = self.collection.delete_many({"_id": {"$in": queue_ids}})
+            self.stats["acked"] += result.deleted_count
+
+    def nack(self, queue_id: str, error: str, reply: Optional[str] = None):
+        """Give an item back for a later retry, or dead-letter it when out of attempts.
+
+        `reply` is a reply that was produced but not delivered; the retry only resends it.
+        """
+        doc = self.collection.find_one({"_id": queue_id})
+        if not doc:
+            return
+        if reply:
+            doc["reply"] = reply
+        if doc.get("attempts", 0) >= self.max_attempts:
+            self.dead_letter(doc, error)
+            return
+        update = {"status": self.PENDING, "last_error": error,
+                  "available_at": datetime.utcnow() + timedelta(seconds=self.retry_delay_seconds)}
+        if reply:
+            update["reply"] = reply
+        self.collection.update_one(
+            {"_id": queue_id},
+            {"$set": update,
+             "$unset": {"lease_owner": "", "lease_until": "", "claim_id": ""}}
+        )
+        self.stats["retried"] += 1
+
+    def renew(self, worker_id: str, queue_ids: Iterable[str]):
+        """Extend the leases a live worker still holds (e.g. items waiting in a busy lane)"""
+        queue_ids = list(queue_ids)
+        if queue_ids:
+            self.collection.update_many(
+                {"_id": {"$in": queue_ids}, "status": self.LEASED, "lease_owner": worker_id},
+                {"$set": {"lease_until": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+            )
+
+    def release_worker(self, worker_id: str) -> int:
+        """Make a (restarted) worker's leases available again immediately"""
+        result = self.collection.update_many(
+            {"status": self.LEASED, "lease_owner": worker_id},
+            {"$set": {"status": self.PENDING, "available_at": datetime.utcnow()},
+             "$unset": {"lease_owner": "", "lease_until": "", "claim_id": ""}}
+        )
+        return result.modified_count
+
+    def dead_letter(self, doc: Dict, error: str):
+        """Move an item to the dead-letter collection"""
+        dead = {key: value for key, value in doc.items()
+                if key not in ("status", "lease_owner", "lease_until", "claim_id", "available_at")}
+        dead.update(error=error, dead_at=datetime.utcnow())
+        try:
+            self.dead_letters.insert_one(dead)
+        except DuplicateKeyError:
+            self.dead_letters.replace_one({"_id": dead["_id"]}, dead)
+        self.collection.delete_one({"_id": doc["_id"]})
+        self.stats["dead_lettered"] += 1
+        print(f"☠️ Message {doc['_id']} from {doc.get('phone_number')} moved to dead letters: {error}")
+
+    def replay_dead_letters(self, query: Optional[Dict] = None, limit: int = 0) -> int:
+        """Put dead-lettered items back on the queue with a fresh attempt budget"""
+        replayed = 0
+        for dead in self.dead_letters.find(query or {}).sort("created_at", 1).limit(limit):
+            now = datetime.utcnow()
+            item = {key: value for key, value in dead.items() if key not in ("error", "dead_at", "last_error")}
+            item.update(status=self.PENDING, attempts=0, available_at=now, replayed_at=now)
+            self.collection.replace_one({"_id": item["_id"]}, item, upsert=True)
+            self.dead_letters.delete_one({"_id": dead["_id"]})
+            replayed += 1
+        return replayed
+
+    def depth(self) -> Dict:
+        return {
+            "pending": self.collection.count_documents({"status": self.PENDING}),
+            "leased": self.collection.count_documents({"status": self.LEASED}),
+            "dead_letters": self.dead_letters.estimated_document_count()
+        }
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
@@ -0,0 +1,119 @@
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Set
+import re
+
+# Keywords per intent. Keywords match whole words only; a trailing '*' also matches
+# longer words that start with the stem (e.g. 'pizza*' matches 'pizzas').
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "greeting": ["hi", "hii", "hello", "hey", "good morning", "good afternoon", "good evening",
+                 "salam", "salaam", "assalam*", "aoa"],
+    "confirmation": ["confirm", "place order", "yes confirm", "checkout", "proceed", "that's it",
+                     "thats it", "done"],
+    "view_order": ["view order", "show cart", "my order", "current order"],
+    "adding_items": ["add", "want*", "order*"],
+    "menu_request": ["menu", "show menu", "what do you have"],
+    # Used when summarising conversation history
+    "order_mention": ["add", "order*", "want*", "pizza*", "burger*"],
+    "confirmation_mention": ["yes", "confirm*"],
+}
+
+class IntentMatcher:
+    """Classifies a message into every matching intent in one scan.
+
+    All keywords are compiled once into a single regular expression whose alternation is
+    factored as a character trie (the prefix sharing of an Aho-Corasick automaton), so the
+    scan runs inside the regex engine instead of one Python substring search per keyword.
+    Matches must start and end on word boundaries, which stops 'hi' matching inside 'this'
+    and 'add' matching inside 'address'.
+    """
+
+    def __init__(self, intent_keywords: Dict[str, Iterable[str]], cache_size: int = 4096):
+        keyword_intents: Dict[str, Set[str]] = {}
+        stem_intents: Dict[str, Set[str]] = {}
+        for intent, keywords in intent_keywords.items():
+            for keyword in keywords:
+                keyword = " ".join(keyword.lower().split())
+                if keyword.endswith("*"):
+                    stem_intents.setdefault(keyword[:-1], set()).add(intent)
+                else:
+                    keyword_intents.setdefault(keyword, set()).add(intent)
+
+        self.intents: FrozenSet[str] = frozenset(intent_keywords)
+        self._stems = sorted(stem_intents, key=len, reverse=True)
+        self._stem_intents = {stem: frozenset(intents) for stem, intents in stem_intents.items()}
+
+        # Zero-width lookahead at every word start, so overlapping phrases are all seen
+        alternatives = [self._trie_pattern(list(keyword_intents))]
+        if self._stems:
+            alternatives.append("(?:" + "|".join(re.escape(stem) for stem in self._stems) + r")\w*")
+        self._pattern = re.compile(r"\b(?=(" + "|".join(alternatives) + r")\b)")
+
+        # A phrase match implies every shorter keyword inside it (e.g. 'yes confirm' -> 'yes')
+        self._keyword_closure: Dict[str, FrozenSet[str]] = {}
+        for keyword, intents in keyword_intents.items():
+            closure = set(intents)
+            for other, other_intents in keyword_intents.items():
+                if other != keyword and re.search(r"\b" + re.escape(other) + r"\b", keyword):
+                    closure |= other_intents
+            for word in keyword.split():
+                closure |= self._intents_for_stem_word(word)
+            self._keyword_closure[keyword] = frozenset(closure)
+
+        self._classify_cached = lru_cache(maxsize=cache_size)(self._classify_uncached)
+
+    def classify(self, text: str) -> FrozenSet[str]:
+        """Return the set of intents whose keywords appear in the text"""
+        if not text:
+            return frozenset()
+        return self._classify_cached(text.lower())
+
+    def matches(self, text: str, intent: str) -> bool:
+        """Check a single intent"""
+        return intent in self.classify(text)
+
+    def cache_info(self):
+        return self._classify_cached.cache_info()
+
+    def _classify_uncached(self, lowered: str) -> FrozenSet[str]:
+        found: Set[str] = set()
+        for matched in self._pattern.findall(lowered):
+            intents = self._keyword_closure.get(matched)
+            if intents is None:
+                normalized = " ".join(matched.split())
+                intents = self._keyword_closure.get(normalized) or self._intents_for_stem_word(normalized)
+            found |= intents
+        return frozenset(found)
+
+    def _intents_for_stem_word(self, word: str) -> FrozenSet[str]:
+        intents: Set[str] = set()
+        for stem in self._stems:
+            if word.startswith(stem):
+                intents |= self._stem_intents[stem]
+        return frozenset(intents)
+
+    @staticmethod
+    def _trie_pattern(keywords: List[str]) -> str:
+        """Build a prefix-factored alternation (a character trie) for the keywords"""
+        trie: Dict = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        def build(node: Dict) -> str:
+            branches = []
+            for char in sorted(key for key in node if key):
+                head = r"\s+" if char == " " else re.escape(char)
+                branches.append(head + build(node[char]))
+            if not branches:
+                return ""
+            pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            if "" in node:
+                pattern = "(?:" + pattern + ")?"
+            return pattern
+
+        return build(trie)
+
+# Global instance, compiled once at import
+intent_matcher = IntentMatcher(INTENT_KEYWORDS)
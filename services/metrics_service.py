@@ -0,0 +1,36 @@
+from typing import Callable, Dict
+from datetime import datetime
+import threading
+
+class MetricsRegistry:
+    """Collects stats from pipeline components so they can be reported in one place"""
+    
+    def __init__(self):
+        self._providers: Dict[str, Callable[[], Dict]] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, name: str, provider: Callable[[], Dict]):
+        """Register a callable that returns a stats dict for a component"""
+        with self._lock:
+            self._providers[name] = provider
+    
+    def unregister(self, name: str):
+        """Remove a component from reporting"""
+        with self._lock:
+            self._providers.pop(name, None)
+    
+    def snapshot(self) -> Dict:
+        """Collect current stats from every registered component"""
+        with self._lock:
+            providers = dict(self._providers)
+        
+        snapshot = {"timestamp": datetime.utcnow()}
+        for name, provider in providers.items():
+            try:
+                snapshot[name] = provider()
+            except Exception as e:
+                snapshot[name] = {"error": str(e)}
+        return snapshot
+
+# Global instance
+metrics_registry = MetricsRegistry()
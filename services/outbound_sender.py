@@ -0,0 +1,307 @@
+from collections import deque
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from typing import Deque, Dict, List, Optional
+from whatsapp_api_client_python import API
+from config.settings import settings
+from config.database import db
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+
+class TokenBucket:
+    """Token-bucket rate limiter for one GreenAPI instance"""
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        """Wait until a send is allowed"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class OutboundMessage:
+    def __init__(self, chat_id: str, message: str, spill_id=None):
+        self.chat_id = chat_id
+        self.message = message
+        self.spill_id = spill_id
+        self.enqueued_at = time.monotonic()
+        self.attempts = 0
+        self.future: Optional[asyncio.Future] = None
+
+class OutboundSender:
+    """Delivers WhatsApp replies through GreenAPI off the critical path.
+
+    - one token bucket per instance caps the send rate
+    - messages for the same chat are sent strictly in order, different chats in parallel
+    - throttling (429), 5xx and network errors are retried with exponential backoff
+    - the in-memory queue is bounded; overflow spills to Mongo and is drained back in order
+
+    The API process and every bot worker run their own sender against the same spill
+    collection, so spilled messages are claimed one at a time with an owner and a lease.
+    Only claims whose lease ran out (their process died) are taken over, and a sender
+    renews its claim right before sending, so no message is sent by two processes.
+    """
+
+    RETRYABLE_CODES = {None, 408, 429, 500, 502, 503, 504}
+
+    def __init__(self, green_api=None, spill_collection=None,
+                 rate_per_second: float = None, burst: int = None, max_queue: int = None,
+                 max_in_flight: int = None, max_retries: int = None, base_backoff_seconds: float = None,
+                 spill_lease_seconds: float = None):
+        self.green_api = green_api
+        self.spill_collection = spill_collection
+        self.owner_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.spill_lease = timedelta(seconds=spill_lease_seconds or settings.OUTBOUND_SPILL_LEASE_SECONDS)
+        self.bucket = TokenBucket(
+            rate_per_second or settings.OUTBOUND_RATE_PER_SECOND,
+            burst or settings.OUTBOUND_BURST
+        )
+        self.max_queue = max_queue or settings.OUTBOUND_MAX_QUEUE
+        self.max_in_flight = max_in_flight or settings.OUTBOUND_MAX_IN_FLIGHT
+        self.max_retries = settings.OUTBOUND_MAX_RETRIES if max_retries is None else max_retries
+        self.base_backoff = base_backoff_seconds or settings.OUTBOUND_BASE_BACKOFF_SECONDS
+
+        self._chats: Dict[str, Deque[OutboundMessage]] = {}
+        self._active_chats = set()
+        self._queued = 0
+        self._spilled_pending = 0
+        self._spills_in_flight = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._spill_task: Optional[asyncio.Task] = None
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self.stats = {"sent": 0, "failed": 0, "retries": 0, "spilled": 0, "restored": 0, "claims_lost": 0}
+
+    def _get_green_api(self):
+        if self.green_api is None:
+            self.green_api = API.GreenAPI(
+                settings.WHATSAPP_INSTANCE_ID,
+                settings.WHATSAPP_TOKEN,
+                host=settings.GREEN_API_HOST
+            )
+        return self.green_api
+
+    def _ensure_started(self):
+        """Create loop-bound state on first use inside the running loop"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            if self.spill_collection is not None:
+                # Pick up anything a previous process spilled but never sent
+                asyncio.ensure_future(self._restore_spilled())
+
+    async def _restore_spilled(self):
+        try:
+            pending = await asyncio.to_thread(self.spill_collection.count_documents, self._claimable())
+        except Exception as e:
+            print(f"⚠️ Could not check spilled outbound messages: {e}")
+            return
+        if pending:
+            print(f"📤 Resuming {pending} spilled outbound message(s)")
+            self._spilled_pending += pending
+            self._start_spill_drain()
+
+    async def send(self, chat_id: str, message: str, wait: bool = True) -> bool:
+        """Queue a message; optionally wait until it is delivered (or given up on)"""
+        self._ensure_started()
+        if self.spill_collection is not None and self._must_spill():
+            # Once anything has spilled, keep spilling so per-chat order is preserved
+            self._spills_in_flight += 1
+            try:
+                await asyncio.to_thread(self._spill, chat_id, message)
+                self._spilled_pending += 1
+                self.stats["spilled"] += 1
+            except Exception as e:
+                print(f"❌ Could not spill outbound message for {chat_id}: {e}")
+                return False
+            finally:
+                self._spills_in_flight -= 1
+            self._start_spill_drain()
+            return True
+
+        item = OutboundMessage(chat_id, message)
+        item.future = asyncio.get_running_loop().create_future()
+        self._enqueue(item)
+        if not wait:
+            return True
+        return await asyncio.shield(item.future)
+
+    def _must_spill(self) -> bool:
+        return bool(self._spilled_pending or self._spills_in_flight or self._queued >= self.max_queue)
+
+    def _enqueue(self, item: OutboundMessage):
+        self._chats.setdefault(item.chat_id, deque()).append(item)
+        self._queued += 1
+        if item.chat_id not in self._active_chats:
+            self._active_chats.add(item.chat_id)
+            asyncio.ensure_future(self._drain_chat(item.chat_id))
+
+    async def _drain_chat(self, chat_id: str):
+        """Send one chat's queue in order"""
+        queue = self._chats[chat_id]
+        try:
+            while queue:
+                item = queue[0]
+                if item.spill_id is not None and not await self._still_claimed(item.spill_id):
+                    # Our lease ran out and another process took the message over
+                    queue.popleft()
+                    self._queued -= 1
+                    self.stats["claims_lost"] += 1
+                    continue
+                async with self._slots:
+                    delivered = await self._deliver(item)
+                queue.popleft()
+                self._queued -= 1
+                if item.spill_id is not None:
+                    try:
+                        await asyncio.to_thread(self._mark_spilled_done, item.spill_id, delivered)
+                    except Exception as e:
+                        print(f"⚠️ Could not update spilled outbound message: {e}")
+                if item.future is not None and not item.future.done():
+                    item.future.set_result(delivered)
+        finally:
+            self._active_chats.discard(chat_id)
+            if not queue:
+                self._chats.pop(chat_id, None)
+
+    async def _deliver(self, item: OutboundMessage) -> bool:
+        """Send with rate limiting and exponential-backoff retry"""
+        while True:
+            await self.bucket.acquire()
+            item.attempts += 1
+            code, error = await asyncio.to_thread(self._send_now, item.chat_id, item.message)
+            if code == 200:
+                self.stats["sent"] += 1
+                self._latencies.append(time.monotonic() - item.enqueued_at)
+                return True
+
+            if code not in self.RETRYABLE_CODES or item.attempts > self.max_retries:
+                self.stats["failed"] += 1
+                print(f"❌ Giving up on WhatsApp message to {item.chat_id} after {item.attempts} attempt(s): {code} {error}")
+                return False
+
+            self.stats["retries"] += 1
+            backoff = self.base_backoff * (2 ** (item.attempts - 1))
+            backoff = min(backoff, 60) * (0.5 + random.random() / 2)
+            print(f"⏳ GreenAPI send failed ({code}), retrying in {backoff:.1f}s")
+            await asyncio.sleep(backoff)
+
+    def _send_now(self, chat_id: str, message: str):
+        try:
+            response = self._get_green_api().sending.sendMessage(chat_id, message)
+            return response.code, response.error
+        except Exception as e:
+            return None, str(e)
+
+    def _spill(self, chat_id: str, message: str):
+        """Persist overflow to Mongo; the drainer feeds it back in order"""
+        self.spill_collection.insert_one({
+            "chat_id": chat_id,
+            "message": message,
+            "status": "pending",
+            "created_at": datetime.utcnow()
+        })
+
+    def _start_spill_drain(self):
+        if self._spill_task is None or self._spill_task.done():
+            self._spill_task = asyncio.ensure_future(self._drain_spill())
+
+    async def _drain_spill(self):
+        """Move spilled messages back into memory as space frees up"""
+        while self._spilled_pending > 0:
+            room = self.max_queue - self._queued
+            if room <= 0:
+                await asyncio.sleep(0.5)
+                continue
+            try:
+                docs = await asyncio.to_thread(self._claim_spilled, room)
+            except Exception as e:
+                print(f"⚠️ Could not read spilled outbound messages: {e}")
+                await asyncio.sleep(5)
+                continue
+            if not docs:
+                self._spilled_pending = 0
+                break
+            for doc in docs:
+                self._enqueue(OutboundMessage(doc["chat_id"], doc["message"], spill_id=doc["_id"]))
+                self._spilled_pending = max(0, self._spilled_pending - 1)
+                self.stats["restored"] += 1
+
+    def _claimable(self) -> Dict:
+        """Spilled messages nobody is sending: pending, or claimed by a process whose lease ran out"""
+        return {"$or": [
+            {"status": "pending"},
+            {"status": "sending", "claimed_at": {"$lt": datetime.utcnow() - self.spill_lease}}
+        ]}
+
+    def _claim_spilled(self, limit: int) -> List[Dict]:
+        """Claim up to `limit` spilled messages, oldest first, one atomic update each"""
+        docs = []
+        while len(docs) < limit:
+            doc = self.spill_collection.find_one_and_update(
+                self._claimable(),
+                {"$set": {"status": "sending", "owner": self.owner_id, "claimed_at": datetime.utcnow()}},
+                sort=[("created_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                break
+            docs.append(doc)
+        return docs
+
+    async def _still_claimed(self, spill_id) -> bool:
+        """Renew our claim on a spilled message just before sending it"""
+        try:
+            doc = await asyncio.to_thread(
+                self.spill_collection.find_one_and_update,
+                {"_id": spill_id, "status": "sending", "owner": self.owner_id},
+                {"$set": {"claimed_at": datetime.utcnow()}},
+                projection={"_id": 1}
+            )
+        except Exception as e:
+            # Mongo trouble shouldn't hold replies back; the claim is most likely still ours
+            print(f"⚠️ Could not renew spilled outbound message claim: {e}")
+            return True
+        return doc is not None
+
+    def _mark_spilled_done(self, spill_id, delivered: bool):
+        if delivered:
+            self.spill_collection.delete_one({"_id": spill_id})
+        else:
+            self.spill_collection.update_one({"_id": spill_id}, {"$set": {"status": "failed"}})
+
+    def get_stats(self) -> Dict:
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        return {
+            **self.stats,
+            "queue_depth": self._queued,
+            "active_chats": len(self._active_chats),
+            "spilled_pending": self._spilled_pending,
+            "latency_p50_s": percentile(0.50),
+            "latency_p95_s": percentile(0.95),
+            "latency_p99_s": percentile(0.99)
+        }
+
+# Global instance (one per process; binds to the event loop it is first used from)
+outbound_sender = OutboundSender(spill_collection=db.outbound_messages if db else None)
@@ -0,0 +1,186 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional
+from config.database import db
+from config.settings import settings
+from models.order import OrderItem
+from services.intent_matcher import INTENT_KEYWORDS
+import hashlib
+import re
+import threading
+import time
+
+class ResponseCache:
+    """LRU + TTL cache of agent replies for turns that don't depend on who is asking.
+
+    Only menu requests and greetings made entirely of known intent/filler words are
+    cacheable, so the key (agent, canonical message, intents, cart fingerprint, menu
+    version, last assistant message) never contains free text a customer typed about
+    themselves. Short answers like "yes" or "ok" depend on what was asked and always go
+    to the agent. Replies mentioning the customer's name or other personal details are
+    not stored.
+    """
+
+    # Turns that change state must always reach the agent
+    SIDE_EFFECT_TOOLS = {"add_to_order", "confirm_order", "validate_and_save_user"}
+    BYPASS_INTENTS = {"adding_items", "confirmation"}
+    # Turns whose reply doesn't depend on the conversation so far
+    CACHEABLE_INTENTS = {"menu_request", "greeting"}
+
+    FILLER_WORDS = {
+        "please", "pls", "plz", "the", "a", "me", "can", "you", "u", "i", "see", "show", "send",
+        "what", "whats", "do", "have", "today", "again", "there", "ok", "okay", "thanks", "thank",
+        "bro", "sir", "ji", "g", "dear", "is", "your", "let", "us", "options", "items", "food"
+    }
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: int = 600, max_words: int = 8, collection=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_words = max_words
+        self.collection = collection
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._agent_latency: Dict[str, float] = {}
+        self.vocabulary = self._build_vocabulary()
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "stored": 0, "not_stored": 0,
+                      "latency_saved_s": 0.0}
+
+        if self.collection is not None:
+            try:
+                self.collection.create_index("expires_at", expireAfterSeconds=0)
+            except Exception as e:
+                print(f"⚠️ Could not create TTL index for the response cache: {e}")
+
+    def _build_vocabulary(self) -> FrozenSet[str]:
+        words = set(self.FILLER_WORDS)
+        for keywords in INTENT_KEYWORDS.values():
+            for keyword in keywords:
+                words.update(re.findall(r"\w+", keyword.rstrip("*").lower()))
+        return frozenset(words)
+
+    def key_for(self, agent_name: str, message: str, intents: Iterable[str], cart_items: List[OrderItem],
+                menu_version: str, last_reply: str = "", **flags) -> Optional[str]:
+        """Cache key for a turn, or None when the turn must go to the agent.
+
+        `last_reply` is the previous assistant message; the same words can be an answer
+        to a different question, so it is part of the key.
+        """
+        intents = frozenset(intents)
+        tokens = re.findall(r"\w+", (message or "").lower())
+        if (not tokens or len(tokens) > self.max_words or intents & self.BYPASS_INTENTS
+                or not intents & self.CACHEABLE_INTENTS
+                or any(not token.isalpha() or token not in self.vocabulary for token in tokens)):
+            self.stats["bypassed"] += 1
+            return None
+
+        cart = sorted((item.id, item.quantity) for item in cart_items)
+        parts = [
+            agent_name,
+            " ".join(tokens),
+            ",".join(sorted(intents)),
+            repr(cart),
+            menu_version,
+            hashlib.sha256((last_reply or "").encode("utf-8")).hexdigest(),
+            repr(sorted(flags.items()))
+        ]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: Optional[str], agent_name: str) -> Optional[str]:
+        """Look up a reply (blocking when the Mongo backend is used)"""
+        if key is None:
+            return None
+        now = time.time()
+        response = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self._entries.move_to_end(key)
+                response = entry[0]
+            elif entry:
+                del self._entries[key]
+
+        if response is None and self.collection is not None:
+            try:
+                doc = self.collection.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+            except Exception as e:
+                print(f"⚠️ Response cache lookup failed: {e}")
+                doc = None
+            if doc:
+                response = doc["response"]
+                self._remember(key, response, now + self.ttl_seconds)
+
+        if response is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.stats["latency_saved_s"] += self._agent_latency.get(agent_name, 0.0)
+        return response
+
+    def put(self, key: Optional[str], agent_name: str, response: str, tool_calls: Iterable[str],
+            latency_seconds: float, customer_name: str = "", private_values: Iterable[str] = ()):
+        """Store an agent reply unless the turn had side effects or mentions personal details"""
+        if agent_name in self._agent_latency:
+            self._agent_latency[agent_name] = 0.8 * self._agent_latency[agent_name] + 0.2 * latency_seconds
+        else:
+            self._agent_latency[agent_name] = latency_seconds
+
+        if key is None or not response:
+            return
+        if set(tool_calls) & self.SIDE_EFFECT_TOOLS:
+            self.stats["not_stored"] += 1
+            return
+        if any(value and str(value) in response for value in private_values) or \
+                self._mentions_name(response, customer_name):
+            self.stats["not_stored"] += 1
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, response, expires_at)
+        self.stats["stored"] += 1
+
+        if self.collection is not None:
+            try:
+                self.collection.replace_one(
+                    {"_id": key},
+                    {"_id": key, "agent": agent_name, "response": response,
+                     "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"⚠️ Response cache write failed: {e}")
+
+    @staticmethod
+    def _mentions_name(response: str, customer_name: str) -> bool:
+        """Whether any part of the name appears in the reply ("Hi Ali!" for "Ali Khan")"""
+        tokens = [token for token in re.findall(r"\w+", (customer_name or "").lower()) if len(token) > 1]
+        return any(re.search(rf"\b{re.escape(token)}\b", response.lower()) for token in tokens)
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        with self._lock:
+            size = len(self._entries)
+        return {
+            **self.stats,
+            "latency_saved_s": round(self.stats["latency_saved_s"], 2),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "size": size
+        }
+
+# Global instance
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_words=settings.RESPONSE_CACHE_MAX_WORDS,
+    collection=db.response_cache if db and settings.RESPONSE_CACHE_BACKEND == "mongo" else None
+)
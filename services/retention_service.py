@@ -0,0 +1,97 @@
+from bson import ObjectId
+from datetime import datetime, timedelta
+from pymongo.errors import OperationFailure
+from typing import Dict, Optional
+from config.settings import settings
+from config.database import db
+import time
+
+class RetentionService:
+    """Keeps conversation history for OLD_CONVERSATION_CLEANUP_DAYS days.
+
+    Mongo removes expired messages itself through a TTL index on `timestamp`, so nothing
+    is deleted on the message path. The TTL monitor skips documents whose timestamp is
+    missing or not a date (e.g. rows written by old scripts); a periodic sweep removes
+    those by the creation time in their ObjectId, in small batches with a pause in
+    between so it never competes with live traffic.
+    """
+
+    TTL_INDEX_NAME = "timestamp_ttl"
+    # Mongo error codes when an index on the same key exists with other options
+    INDEX_CONFLICT_CODES = {85, 86}
+
+    def __init__(self, collection, days: int = 7, batch_size: int = 500, pause_seconds: float = 0.2):
+        self.collection = collection
+        self.days = days
+        self.batch_size = max(1, batch_size)
+        self.pause_seconds = pause_seconds
+        self.stats = {"sweeps": 0, "swept": 0, "last_sweep_removed": 0, "last_sweep_seconds": 0.0,
+                      "last_sweep_at": None, "ttl_index": None, "ttl_deleted_documents": None}
+
+    @property
+    def expire_after_seconds(self) -> int:
+        return self.days * 24 * 3600
+
+    def ensure_ttl_index(self):
+        """Create the TTL index, or change its expiry when the retention period changed (blocking)"""
+        try:
+            self.collection.create_index("timestamp", name=self.TTL_INDEX_NAME,
+                                         expireAfterSeconds=self.expire_after_seconds)
+            self.stats["ttl_index"] = "ok"
+        except OperationFailure as e:
+            if e.code not in self.INDEX_CONFLICT_CODES:
+                raise
+            # Same key, different expiry (or a plain index): update it in place
+            self.collection.database.command("collMod", self.collection.name, index={
+                "keyPattern": {"timestamp": 1},
+                "expireAfterSeconds": self.expire_after_seconds
+            })
+            self.stats["ttl_index"] = "updated"
+        print(f"🗓️ Conversations expire after {self.days} day(s) (TTL index on timestamp)")
+
+    def sweep(self) -> int:
+        """Delete expired messages the TTL monitor can't see; returns how many were removed (blocking)"""
+        started = time.monotonic()
+        threshold = datetime.utcnow() - timedelta(days=self.days)
+        query = {
+            "timestamp": {"$not": {"$type": "date"}},
+            "_id": {"$lt": ObjectId.from_datetime(threshold)}
+        }
+        removed = 0
+        while True:
+            ids = [doc["_id"] for doc in self.collection.find(query, {"_id": 1}).limit(self.batch_size)]
+            if not ids:
+                break
+            removed += self.collection.delete_many({"_id": {"$in": ids}}).deleted_count
+            if len(ids) < self.batch_size:
+                break
+            time.sleep(self.pause_seconds)
+
+        self.stats["sweeps"] += 1
+        self.stats["swept"] += removed
+        self.stats["last_sweep_removed"] = removed
+        self.stats["last_sweep_seconds"] = round(time.monotonic() - started, 3)
+        self.stats["last_sweep_at"] = datetime.utcnow().isoformat()
+        self.stats["ttl_deleted_documents"] = self.ttl_deleted_documents()
+        if removed:
+            print(f"🧹 Retention sweep removed {removed} expired conversation message(s)")
+        return removed
+
+    def ttl_deleted_documents(self) -> Optional[int]:
+        """Documents removed by TTL indexes since the server started (None if not permitted)"""
+        try:
+            status = self.collection.database.client.admin.command("serverStatus")
+            return status["metrics"]["ttl"]["deletedDocuments"]
+        except Exception:
+            return None
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "retention_days": self.days}
+
+# Global instance
+retention_service = RetentionService(
+    db.conversations if db else None,
+    days=settings.OLD_CONVERSATION_CLEANUP_DAYS,
+    batch_size=settings.RETENTION_SWEEP_BATCH_SIZE,
+    pause_seconds=settings.RETENTION_SWEEP_PAUSE_MS / 1000
+)
@@ -19,6 +19,7 @@ class StateManager:
             'is_registered': user is not None,
             'user_data': user,
             'last_state': state_doc.get('current_state', 'new') if state_doc else 'new',
+            'registration_draft': (state_doc.get('registration_draft') or {}) if state_doc else {},
             'last_interaction': datetime.utcnow()
         }
     
@@ -0,0 +1,74 @@
+from typing import Awaitable, Callable, Dict, List, Tuple
+import asyncio
+import time
+
+class WarmUp:
+    """Primes a bot process before it takes messages, so the first customer doesn't pay for it.
+
+    Steps (Mongo pool, LLM connection, menu cache, speech models, ...) run in parallel on
+    the bot event loop, blocking ones in threads. Each step is timed separately and a
+    failing or slow step is reported but never stops the bot from starting.
+    """
+
+    def __init__(self, timeout_seconds: float = 20):
+        self.timeout_seconds = timeout_seconds
+        self._steps: List[Tuple[str, Callable[[], Awaitable]]] = []
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.total_seconds = 0.0
+        self.ready = False
+
+    def add(self, name: str, step: Callable[[], Awaitable]):
+        """Register a coroutine function to run during warm-up"""
+        self._steps.append((name, step))
+
+    def add_blocking(self, name: str, func: Callable, *args):
+        """Register a blocking function to run in a thread during warm-up"""
+        self.add(name, lambda: asyncio.to_thread(func, *args))
+
+    async def run(self) -> Dict[str, float]:
+        """Run every step concurrently; returns seconds per step"""
+        started = time.monotonic()
+        await asyncio.gather(*(self._run_step(name, step) for name, step in self._steps))
+        self.total_seconds = time.monotonic() - started
+        self.ready = True
+        steps = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.timings.items())
+        print(f"🔥 Warm-up finished in {self.total_seconds:.2f}s ({steps})")
+        return dict(self.timings)
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable]):
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(step(), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.errors[name] = f"timed out after {self.timeout_seconds:.0f}s"
+        except Exception as e:
+            self.errors[name] = str(e) or type(e).__name__
+        self.timings[name] = round(time.monotonic() - started, 3)
+        if name in self.errors:
+            print(f"⚠️ Warm-up step '{name}' failed: {self.errors[name]}")
+
+    def get_stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "total_seconds": round(self.total_seconds, 3),
+            "steps": dict(self.timings),
+            "errors": dict(self.errors)
+        }
+
+async def warm_mongo(database, connections: int = 4):
+    """Open `connections` pooled Mongo connections and touch the collections every turn reads"""
+    # Concurrent pings make the pool open that many sockets (TCP, TLS and auth) now
+    await asyncio.gather(*(
+        asyncio.to_thread(database.client.admin.command, "ping") for _ in range(max(1, connections))
+    ))
+    for collection in (database.users, database.user_states, database.conversations, database.menu):
+        await asyncio.to_thread(collection.find_one, {}, {"_id": 1})
+
+async def warm_llm(client, model_name: str):
+    """Open the pooled connection to the model endpoint with a one-token completion"""
+    await client.chat.completions.create(
+        model=model_name,
+        messages=[{"role": "user", "content": "ping"}],
+        max_tokens=1
+    )
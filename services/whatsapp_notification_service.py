@@ -1,27 +1,23 @@
 from whatsapp_api_client_python import API
 from config.settings import settings
+from services.outbound_sender import outbound_sender
 from typing import Optional
-import asyncio
 
 class WhatsAppNotificationService:
     def __init__(self):
         self.greenAPI = API.GreenAPI(
             idInstance=settings.WHATSAPP_INSTANCE_ID,
-            apiTokenInstance=settings.WHATSAPP_TOKEN
+            apiTokenInstance=settings.WHATSAPP_TOKEN,
+            host=settings.GREEN_API_HOST
         )
     
-    def send_order_status_notification(self, phone_number: str, order_number: str, 
-                                     status: str, customer_name: str, 
-                                     estimated_time: Optional[int] = None,
-                                     notes: Optional[str] = None) -> bool:
-        """Send order status update to customer via WhatsApp"""
-        try:
-            # Format phone number for WhatsApp
-            whatsapp_number = f"{phone_number}@c.us"
-            
-            # Create status-specific messages
-            status_messages = {
-                "preparing": f"""🍳 *Order Update*
+    def build_order_status_message(self, order_number: str, status: str, customer_name: str,
+                                   estimated_time: Optional[int] = None,
+                                   notes: Optional[str] = None) -> str:
+        """Format the customer-facing message for an order status"""
+        # Create status-specific messages
+        status_messages = {
+            "preparing": f"""🍳 *Order Update*
 
 Hi {customer_name}! 
 
@@ -32,7 +28,7 @@ Your order *#{order_number}* is now being *PREPARED* by our chef! 👨‍🍳
 
 We'll notify you when it's ready!""",
 
-                "ready": f"""✅ *Order Ready!*
+            "ready": f"""✅ *Order Ready!*
 
 Hi {customer_name}! 
 
@@ -43,7 +39,7 @@ Great news! Your order *#{order_number}* is *READY* and will be out for delivery
 
 Our delivery partner will be on their way shortly!""",
 
-                "out_for_delivery": f"""🚗 *Out for Delivery!*
+            "out_for_delivery": f"""🚗 *Out for Delivery!*
 
 Hi {customer_name}! 
 
@@ -54,7 +50,7 @@ Your order *#{order_number}* is *ON THE WAY* to you! 🛵
 
 Our delivery partner will call you upon arrival.""",
 
-                "delivered": f"""✅ *Order Delivered!*
+            "delivered": f"""✅ *Order Delivered!*
 
 Hi {customer_name}! 
 
@@ -66,7 +62,7 @@ Thank you for choosing us! We hope you enjoy your meal! 🍽️
 
 _Rate your experience by replying with 1-5 stars ⭐_""",
 
-                "cancelled": f"""❌ *Order Cancelled*
+            "cancelled": f"""❌ *Order Cancelled*
 
 Hi {customer_name}, 
 
@@ -77,19 +73,30 @@ Your order *#{order_number}* has been *CANCELLED*.
 If you have any questions, please feel free to message us.
 
 We hope to serve you again soon! 🙏"""
-            }
-            
-            # Get the appropriate message
-            message = status_messages.get(status)
-            
-            if not message:
-                message = f"""📋 *Order Update*
+        }
+        
+        # Get the appropriate message
+        message = status_messages.get(status)
+        
+        if not message:
+            message = f"""📋 *Order Update*
 
 Hi {customer_name}!
 
 Your order *#{order_number}* status: *{status.upper()}*
 
 {f"📝 Note: {notes}" if notes else ""}"""
+        return message
+
+    def send_order_status_notification(self, phone_number: str, order_number: str, 
+                                     status: str, customer_name: str, 
+                                     estimated_time: Optional[int] = None,
+                                     notes: Optional[str] = None) -> bool:
+        """Send order status update to customer via WhatsApp"""
+        try:
+            # Format phone number for WhatsApp
+            whatsapp_number = f"{phone_number}@c.us"
+            message = self.build_order_status_message(order_number, status, customer_name, estimated_time, notes)
             
             # Send the message
             response = self.greenAPI.sending.sendMessage(whatsapp_number, message)
@@ -105,7 +112,13 @@ Your order *#{order_number}* status: *{status.upper()}*
             print(f"❌ Error sending WhatsApp notification: {str(e)}")
             return False
     
-    async def send_order_status_notification_async(self, *args, **kwargs):
-        """Async wrapper for sending notifications"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self.send_order_status_notification, *args, **kwargs)
+    async def send_order_status_notification_async(self, phone_number: str, order_number: str,
+                                                   status: str, customer_name: str,
+                                                   estimated_time: Optional[int] = None,
+                                                   notes: Optional[str] = None) -> bool:
+        """Queue an order status update on the rate-limited outbound sender"""
+        message = self.build_order_status_message(order_number, status, customer_name, estimated_time, notes)
+        queued = await outbound_sender.send(f"{phone_number}@c.us", message, wait=False)
+        if queued:
+            print(f"📤 WhatsApp notification queued for order {order_number} - Status: {status}")
+        return queued
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import bisect
+import hashlib
+import os
+import socket
+import threading
+import zlib
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes, so a join or leave only moves ~1/N of the keys"""
+
+    def __init__(self, nodes: List[str], vnodes: int = 64):
+        self._ring = sorted(
+            (self._hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(vnodes)
+        )
+        self._hashes = [h for h, _ in self._ring]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+class WorkerRegistry:
+    """Tracks live bot workers through Mongo heartbeats and assigns customer partitions.
+
+    Phones map to a fixed number of partitions (crc32), and partitions map to workers
+    on a consistent-hash ring. When a worker joins, stops heartbeating or leaves, every
+    worker rebuilds the same ring and listeners are told so they can drop stale caches.
+    """
+
+    def __init__(self, collection, worker_id: Optional[str] = None, partitions: int = 256,
+                 heartbeat_seconds: float = 5, ttl_seconds: float = 15, vnodes: int = 160):
+        self.collection = collection
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.partitions = partitions
+        self.heartbeat_seconds = heartbeat_seconds
+        self.ttl_seconds = ttl_seconds
+        self.vnodes = vnodes
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[List[str]], None]] = []
+        self.members: List[str] = []
+        self._assignment: List[str] = []
+        self.rebalances = 0
+        self._set_members([self.worker_id])
+
+    @staticmethod
+    def partition_of(phone_number: str, partitions: int) -> int:
+        return zlib.crc32(phone_number.encode("utf-8")) % partitions
+
+    def partition_for(self, phone_number: str) -> int:
+        return self.partition_of(phone_number, self.partitions)
+
+    def owner_of(self, phone_number: str) -> str:
+        with self._lock:
+            return self._assignment[self.partition_for(phone_number)]
+
+    def owns(self, phone_number: str) -> bool:
+        return self.owner_of(phone_number) == self.worker_id
+
+    def owned_partitions(self) -> List[int]:
+        with self._lock:
+            return [p for p, owner in enumerate(self._assignment) if owner == self.worker_id]
+
+    def add_listener(self, listener: Callable[[List[str]], None]):
+        """Call listener(members) whenever partition ownership changes"""
+        self._listeners.append(listener)
+
+    def heartbeat(self):
+        """Record that this worker is alive and pick up membership changes (blocking)"""
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"_id": self.worker_id},
+            {"$set": {"last_seen": now, "host": socket.gethostname(), "pid": os.getpid()},
+             "$setOnInsert": {"started_at": now}},
+            upsert=True
+        )
+        cutoff = now - timedelta(seconds=self.ttl_seconds)
+        live = [doc["_id"] for doc in self.collection.find({"last_seen": {"$gte": cutoff}}, {"_id": 1})]
+        if self.worker_id not in live:
+            live.append(self.worker_id)
+
+        if sorted(live) != self.members:
+            previous = self.members
+            self._set_members(live)
+            self.rebalances += 1
+            print(f"🔀 Worker membership changed: {previous} -> {self.members} "
+                  f"({len(self.owned_partitions())}/{self.partitions} partitions owned by {self.worker_id})")
+            for listener in self._listeners:
+                try:
+                    listener(self.members)
+                except Exception as e:
+                    print(f"⚠️ Rebalance listener failed: {e}")
+
+    def leave(self):
+        """Deregister so other workers take over our partitions immediately"""
+        try:
+            self.collection.delete_one({"_id": self.worker_id})
+        except Exception as e:
+            print(f"⚠️ Could not deregister worker {self.worker_id}: {e}")
+
+    def _set_members(self, members: List[str]):
+        members = sorted(set(members))
+        ring = HashRing(members, self.vnodes)
+        assignment = [ring.owner(f"partition-{p}") for p in range(self.partitions)]
+        with self._lock:
+            self.members = members
+            self._assignment = assignment
+
+    def get_stats(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "members": len(self.members),
+            "owned_partitions": len(self.owned_partitions()),
+            "partitions": self.partitions,
+            "rebalances": self.rebalances
+        }
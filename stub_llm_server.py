@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub LLM for load-testing the bot without a paid model.
+
+Run it, then point the bot at it with GEMINI_BASE_URL=http://127.0.0.1:8098/
+
+    python stub_llm_server.py --port 8098 --latency lognormal:1.2,0.4 --error-rate 0.02
+
+It answers /chat/completions the way the agents expect: a scripted tool call for the
+customer's message (add_to_order, confirm_order, show_menu, validate_and_save_user, ...),
+then a final reply built from the tool result. Latency per call is drawn from the chosen
+distribution, and rate limits (429) and server errors (500) can be injected.
+
+A JSON script adds rules checked before the built-in ones; {phone} and {message} are filled in:
+
+    {"rules": [{"when": "deal|offer", "reply": "Today's deal: 2 pizzas for PKR 1500!"},
+               {"when": "pepperoni", "tool": "add_to_order",
+                "arguments": {"phone_number": "{phone}", "item_ids": [2], "quantities": [1]}}]}
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import uvicorn
+
+app = FastAPI(title="Stub LLM")
+
+config = {"latency": "fixed:0.5", "error_rate": 0.0, "rate_limit_rpm": 0, "rules": []}
+state = {
+    "requests": 0,
+    "tool_calls": {},
+    "replies": 0,
+    "throttled": 0,
+    "errors": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+    "recent_requests": deque(),
+}
+
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+                "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "ek": 1, "do": 2, "teen": 3}
+
+def sample_latency(spec: str) -> float:
+    """Seconds for one call: fixed:S, uniform:A,B, normal:MEAN,SD or lognormal:MEDIAN,SIGMA"""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed":
+        return values[0]
+    if kind == "uniform":
+        return random.uniform(values[0], values[1])
+    if kind == "normal":
+        return max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return random.lognormvariate(0, values[1]) * values[0]
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+def _text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+def _customer_message(context: str) -> str:
+    match = re.search(r"^MESSAGE(?: \(voice\))?: (.*)$", context, re.M | re.S)
+    return (match.group(1) if match else context).strip()
+
+def _phone(context: str) -> str:
+    match = re.search(r"Phone: (\d+)", context)
+    return match.group(1) if match else ""
+
+def _menu_items(context: str) -> List[Dict]:
+    return [{"id": int(item_id), "name": name.strip()}
+            for item_id, name in re.findall(r"^#(\d+) (.+?) - PKR", context, re.M)]
+
+def _order_arguments(phone: str, message: str, menu: List[Dict]) -> Optional[Dict]:
+    """Items named (or numbered) in the message, with the quantity written before each"""
+    lowered = message.lower()
+    words = re.findall(r"\w+", lowered)
+    item_ids, quantities = [], []
+    for item in menu:
+        name_words = re.findall(r"\w+", item["name"].lower())
+        for position in range(len(words)):
+            if words[position].rstrip("s") == name_words[0].rstrip("s"):
+                previous = words[position - 1] if position else ""
+                quantity = int(previous) if previous.isdigit() else NUMBER_WORDS.get(previous, 1)
+                item_ids.append(item["id"])
+                quantities.append(quantity)
+                break
+    if not item_ids:
+        # "add 1 and 3", "2x 4": bare numbers are item ids
+        numbers = [int(number) for number in re.findall(r"\b(\d{1,3})\b", lowered)]
+        item_ids = numbers
+        quantities = [1] * len(numbers)
+    if not item_ids:
+        return None
+    return {"phone_number": phone, "item_ids": item_ids, "quantities": quantities}
+
+def _registration_arguments(phone: str, message: str) -> Optional[Dict]:
+    fields = {}
+    for field, pattern in (("name", r"name"), ("address", r"address"), ("city", r"city"),
+                           ("postal_code", r"postal\s*code|zip")):
+        match = re.search(rf"\b(?:{pattern})\s*[:=]\s*([^,;\n]+)", message, re.I)
+        if match:
+            fields[field] = match.group(1).strip()
+    if not all(fields.get(field) for field in ("name", "address", "city")):
+        return None
+    return {"phone_number": phone, "postal_code": "", **fields}
+
+def plan_reply(messages: List[Dict], tools: List[str]) -> Dict:
+    """The scripted assistant turn: {'tool': name, 'arguments': {...}} or {'reply': text}"""
+    last = messages[-1] if messages else {}
+    if last.get("role") == "tool":
+        # Second round trip: present what the tool returned
+        return {"reply": _text(last.get("content")).strip() or "Done! ✅"}
+
+    context = next((_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+    message = _customer_message(context)
+    phone = _phone(context)
+
+    for rule in config["rules"]:
+        if not re.search(rule["when"], message, re.I):
+            continue
+        if "reply" in rule:
+            return {"reply": rule["reply"].format(phone=phone, message=message)}
+        if rule.get("tool") in tools:
+            arguments = json.loads(json.dumps(rule.get("arguments", {})).replace("{phone}", phone)
+                                   .replace("{message}", message))
+            return {"tool": rule["tool"], "arguments": arguments}
+
+    lowered = message.lower()
+    if "validate_and_save_user" in tools:
+        arguments = _registration_arguments(phone, message)
+        if arguments:
+            return {"tool": "validate_and_save_user", "arguments": arguments}
+        return {"reply": "Welcome! 😊 Please send your *name*, *address* and *city* "
+                         "(e.g. Name: Ali, Address: House 5 Street 2, City: Lahore)."}
+    if "confirm_order" in tools and re.search(r"\b(confirm|checkout|place (?:the |my )?order|that's it)\b", lowered):
+        return {"tool": "confirm_order", "arguments": {"phone_number": phone, "delivery_notes": ""}}
+    if "view_current_order" in tools and re.search(r"\b(cart|my order|view)\b", lowered):
+        return {"tool": "view_current_order", "arguments": {"phone_number": phone}}
+    if "show_menu" in tools and re.search(r"\b(menu|what do you have)\b", lowered):
+        return {"tool": "show_menu", "arguments": {"category": "all"}}
+    if "add_to_order" in tools:
+        arguments = _order_arguments(phone, message, _menu_items(context))
+        if arguments:
+            return {"tool": "add_to_order", "arguments": arguments}
+    return {"reply": "Sure! 😊 What would you like to order? Type *menu* to see everything."}
+
+@app.post("/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    state["requests"] += 1
+    await asyncio.sleep(sample_latency(config["latency"]))
+
+    if config["rate_limit_rpm"]:
+        now = time.monotonic()
+        recent = state["recent_requests"]
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        if len(recent) >= config["rate_limit_rpm"]:
+            state["throttled"] += 1
+            return JSONResponse({"error": {"message": "Resource exhausted", "code": 429}}, status_code=429)
+        recent.append(now)
+    if random.random() < config["error_rate"]:
+        state["errors"] += 1
+        return JSONResponse({"error": {"message": "Internal error", "code": 500}}, status_code=500)
+
+    messages = body.get("messages", [])
+    tools = [tool["function"]["name"] for tool in body.get("tools") or [] if tool.get("type") == "function"]
+    plan = plan_reply(messages, tools)
+
+    message = {"role": "assistant", "content": None}
+    if "tool" in plan:
+        arguments = json.dumps(plan["arguments"], ensure_ascii=False)
+        message["tool_calls"] = [{"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                                  "function": {"name": plan["tool"], "arguments": arguments}}]
+        state["tool_calls"][plan["tool"]] = state["tool_calls"].get(plan["tool"], 0) + 1
+        finish_reason, output = "tool_calls", arguments
+    else:
+        message["content"] = plan["reply"]
+        state["replies"] += 1
+        finish_reason, output = "stop", plan["reply"]
+
+    prompt_tokens = sum(estimate_tokens(_text(m.get("content"))) for m in messages)
+    completion_tokens = estimate_tokens(output)
+    state["prompt_tokens"] += prompt_tokens
+    state["completion_tokens"] += completion_tokens
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+@app.get("/models")
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "local"}]}
+
+@app.get("/stats")
+async def stats():
+    return {
+        "requests": state["requests"],
+        "tool_calls": state["tool_calls"],
+        "replies": state["replies"],
+        "throttled": state["throttled"],
+        "errors": state["errors"],
+        "prompt_tokens": state["prompt_tokens"],
+        "completion_tokens": state["completion_tokens"],
+        "config": {key: value for key, value in config.items() if key != "rules"},
+        "rules": len(config["rules"])
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible LLM server")
+    parser.add_argument("--port", type=int, default=8098)
+    parser.add_argument("--latency", default="fixed:0.5",
+                        help="per-call latency: fixed:S, uniform:A,B, normal:MEAN,SD or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that return 500")
+    parser.add_argument("--rate-limit-rpm", type=int, default=0, help="requests per minute before 429 (0 = none)")
+    parser.add_argument("--script", help="JSON file with extra {'rules': [...]} checked before the built-in ones")
+    args = parser.parse_args()
+
+    sample_latency(args.latency)  # Fail fast on a bad spec
+    config.update(latency=args.latency, error_rate=args.error_rate, rate_limit_rpm=args.rate_limit_rpm)
+    if args.script:
+        with open(args.script, encoding="utf-8") as f:
+            config["rules"] = json.load(f).get("rules", [])
+    print(f"🚀 Stub LLM on http://127.0.0.1:{args.port}/ (latency {args.latency}, errors {args.error_rate:.0%}, "
+          f"{len(config['rules'])} scripted rule(s))")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Order-number check: confirm many carts at the same moment and fail on a clash.
+
+Needs a local mongod (nothing is read from or written to the real database):
+
+    python test_order_numbers.py --mongo-uri mongodb://localhost:27017 --customers 50
+
+It seeds a throwaway database with orders numbered by the old count-based scheme
+(most of them deleted, so the count lags well behind the highest number), registers
+customers with a cart each, then releases every confirm_order_base call at once from
+its own thread.
+Exits with 1 unless every confirm placed an order and all order numbers are distinct.
+"""
+import argparse
+import os
+import sys
+import threading
+from datetime import datetime
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent order confirmations and check the order numbers")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="ez_order_order_numbers", help="throwaway database (dropped)")
+    parser.add_argument("--customers", type=int, default=50, help="confirms released at the same time")
+    parser.add_argument("--existing-orders", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.db_name == "restaurant_db":
+        print("❌ Refusing to seed and drop the application database; pick another --db-name")
+        sys.exit(2)
+
+    # Point the application modules at the test database before they connect
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    from config.database import db
+    from config.indexes import IndexManager
+    from models.menu import MenuService
+    from tools.order_tools import add_to_order_base, confirm_order_base
+    if db is None:
+        sys.exit(2)
+
+    db.client.drop_database(args.db_name)
+    try:
+        IndexManager(db.db).apply(force=True)
+        MenuService.initialize_menu(db.menu)
+        db.orders.insert_many([
+            {"order_number": f"ORD{index + 1:05d}", "phone_number": "920000000000", "status": "delivered",
+             "created_at": datetime.utcnow()}
+            for index in range(args.existing_orders)
+        ])
+        # Deleted orders leave gaps below the highest number
+        db.orders.delete_many({"order_number": {"$lt": f"ORD{args.existing_orders:05d}"}})
+
+        phones = [f"92300{index:07d}" for index in range(args.customers)]
+        for phone in phones:
+            db.users.insert_one({"phone_number": phone, "name": "Test Customer", "address": "House 1",
+                                 "city": "Lahore", "created_at": datetime.utcnow()})
+            add_to_order_base(phone, [1], [1])
+
+        print(f"🧾 Confirming {len(phones)} orders at once...")
+        barrier = threading.Barrier(len(phones))
+        replies = {}
+
+        def confirm(phone):
+            barrier.wait()
+            replies[phone] = confirm_order_base(phone)
+
+        threads = [threading.Thread(target=confirm, args=(phone,)) for phone in phones]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        failed = [phone for phone, reply in replies.items() if "ORDER CONFIRMED" not in reply]
+        numbers = [order["order_number"] for order in db.orders.find({"phone_number": {"$in": phones}})]
+        duplicates = len(numbers) - len(set(numbers))
+        for phone in failed:
+            print(f"❌ {phone}: {replies[phone].splitlines()[0]}")
+        print(f"📋 {len(numbers)} orders placed, {len(set(numbers))} distinct numbers "
+              f"({min(numbers, default='-')} .. {max(numbers, default='-')})")
+    finally:
+        db.client.drop_database(args.db_name)
+
+    if failed or duplicates or len(numbers) != len(phones):
+        print(f"\n❌ {len(failed)} confirm(s) failed, {duplicates} duplicate order number(s)")
+        sys.exit(1)
+    print("\n✅ Every concurrent confirm got its own order number")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Query-plan check: fail when a hot Mongo query stops using an index.
+
+Needs a local mongod (nothing is read from or written to the real database):
+
+    python test_query_plans.py --mongo-uri mongodb://localhost:27017 --customers 2000
+
+It seeds a throwaway database with synthetic customers, conversations, orders, menu
+items and notifications, creates the indexes declared in config/indexes.py, then calls
+the real service, API and tool functions. Every query they send is captured and run
+through explain(); a query fails when its winning plan has a COLLSCAN or when it examines
+more than --max-ratio documents per document returned. Exits with 1 if any query fails.
+The other settings come from .env as usual.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from bson import SON
+from pymongo import monitoring
+
+EXPLAINED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Session and transport fields the driver adds; explain() rejects some of them
+DRIVER_FIELDS = {"lsid", "txnNumber", "writeConcern", "readConcern", "apiVersion", "apiStrict"}
+
+class QueryRecorder(monitoring.CommandListener):
+    """Keeps the read and write commands sent to the test database while recording"""
+
+    def __init__(self, database_name: str):
+        self.database_name = database_name
+        self.commands = None
+
+    def started(self, event):
+        if self.commands is not None and event.database_name == self.database_name \
+                and event.command_name in EXPLAINED_COMMANDS:
+            self.commands.append(SON((key, value) for key, value in event.command.items()
+                                     if not key.startswith("$") and key not in DRIVER_FIELDS))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def record(self, func):
+        """Run func and return the commands it sent (and its error, if any)"""
+        self.commands = []
+        error = None
+        try:
+            result = func()
+            if asyncio.iscoroutine(result):
+                asyncio.run(result)
+        except Exception as e:
+            error = e
+        commands, self.commands = self.commands, None
+        return commands, error
+
+def as_explainable(command: SON) -> SON:
+    """count_documents() runs {$match, ($skip/$limit), $group}; explain the equivalent find"""
+    pipeline = command.get("pipeline") if "aggregate" in command else None
+    if pipeline and "$group" in pipeline[-1] and all(len(stage) == 1 for stage in pipeline):
+        find = SON([("find", command["aggregate"]), ("filter", {})])
+        for stage in pipeline[:-1]:
+            name, value = next(iter(stage.items()))
+            if name == "$match":
+                find["filter"] = value
+            elif name in ("$skip", "$limit"):
+                find[name[1:]] = value
+        return find
+    return command
+
+def filter_of(command: SON) -> dict:
+    if "filter" in command:
+        return command["filter"] or {}
+    if "query" in command:
+        return command["query"] or {}
+    for field in ("updates", "deletes"):
+        if command.get(field):
+            return command[field][0].get("q") or {}
+    return {}
+
+def winning_stages(explain, found=None, in_plan=False) -> list:
+    """Stage names in every winning plan of an explain() result (any server version or shape)"""
+    found = [] if found is None else found
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "rejectedPlans":
+                continue
+            if key == "stage" and in_plan:
+                found.append(value)
+            winning_stages(value, found, in_plan or key == "winningPlan")
+    elif isinstance(explain, list):
+        for value in explain:
+            winning_stages(value, found, in_plan)
+    return found
+
+def find_key(document, key):
+    """First value stored under key, searching depth-first"""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        values = document.values()
+    elif isinstance(document, list):
+        values = document
+    else:
+        return None
+    for value in values:
+        found = find_key(value, key)
+        if found is not None:
+            return found
+    return None
+
+def evaluate(database, command: SON, scan_ok: str = None, max_ratio: float = 2.0) -> dict:
+    """Explain one captured command and check it against the thresholds"""
+    command = as_explainable(command)
+    name = next(iter(command))
+    explain = database.command("explain", command, verbosity="executionStats")
+    stages = winning_stages(explain)
+    stats = find_key(explain, "executionStats") or {}
+    examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+    if name in ("update", "delete", "findAndModify"):
+        returned = max(returned, find_key(stats, "nMatched") or 0, find_key(stats, "nWouldDelete") or 0)
+    ratio = examined / max(returned, 1)
+
+    problems = []
+    # A query with no filter and no limit reads the whole collection whatever the plan
+    whole_collection = not filter_of(command) and "limit" not in command
+    if "COLLSCAN" in stages and not scan_ok and not whole_collection:
+        problems.append("COLLSCAN")
+    if max_ratio is not None and ratio > max_ratio and not whole_collection:
+        problems.append(f"examined/returned {ratio:.1f} > {max_ratio}")
+    return {
+        "command": name,
+        "collection": command[name],
+        "filter": filter_of(command),
+        "stages": stages,
+        "examined": examined,
+        "returned": returned,
+        "ratio": ratio,
+        "problems": problems
+    }
+
+def seed(database, customers: int, rng: random.Random) -> dict:
+    """Synthetic data shaped like production; returns the keys the checks look up"""
+    now = datetime.utcnow()
+    categories = ["Pizza", "Burgers", "Wraps", "Sides", "Drinks", "Desserts", "Deals", "Kids"]
+    menu = [{"id": index, "name": f"{categories[index % len(categories)]} Item {index}",
+             "price": float(rng.randint(150, 2500)), "category": categories[index % len(categories)],
+             "description": f"Synthetic menu item number {index}", "created_at": now, "updated_at": now}
+            for index in range(1, 121)]
+    database.menu.insert_many(menu)
+
+    phones = [f"92300{index:07d}" for index in range(customers)]
+    database.users.insert_many([{"phone_number": phone, "name": f"Customer {index}",
+                                 "address": f"House {index} Street 1", "city": "Lahore",
+                                 "postal_code": "54000", "created_at": now}
+                                for index, phone in enumerate(phones)])
+    staff = [{"email": f"staff{index}@example.com", "password_hash": "not-a-real-hash",
+              "name": f"Staff {index}", "phone_number": f"92311{index:07d}", "role": "staff",
+              "is_active": True, "created_at": now} for index in range(max(10, customers // 20))]
+    staff_ids = database.users.insert_many(staff).inserted_ids
+    database.user_states.insert_many([{"phone_number": phone, "current_state": "ordering",
+                                       "last_updated": now} for phone in phones])
+
+    conversations = []
+    for phone in phones:
+        for turn in range(20):
+            conversations.append({"phone_number": phone, "role": "user" if turn % 2 == 0 else "assistant",
+                                  "message": f"Synthetic message {turn}", "metadata": {},
+                                  "timestamp": now - timedelta(minutes=rng.randint(0, 7 * 24 * 60))})
+            if len(conversations) >= 10000:
+                database.conversations.insert_many(conversations)
+                conversations = []
+    if conversations:
+        database.conversations.insert_many(conversations)
+
+    statuses = ["delivered"] * 16 + ["cancelled"] * 2 + ["confirmed", "preparing", "ready", "out_for_delivery"]
+    orders = []
+    for index in range(customers * 3):
+        item = rng.choice(menu)
+        created_at = now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))
+        orders.append({
+            "order_number": f"ORD{index + 1:06d}", "phone_number": rng.choice(phones),
+            "user_name": "Customer", "items": [{"id": item["id"], "name": item["name"], "price": item["price"],
+                                               "quantity": 1, "subtotal": item["price"]}],
+            "total": item["price"], "delivery_address": "House 1 Street 1", "delivery_city": "Lahore",
+            "delivery_postal": "54000", "delivery_notes": "", "status": rng.choice(statuses),
+            "created_at": created_at, "updated_at": created_at, "status_history": []
+        })
+    database.orders.insert_many(orders)
+
+    notifications = [{"type": "order_confirmed", "data": {"order_number": f"ORD{index + 1:06d}"},
+                      "created_at": now - timedelta(minutes=rng.randint(0, 30 * 24 * 60)),
+                      "read": rng.random() > 0.05, "read_at": None} for index in range(customers)]
+    notification_ids = database.notifications.insert_many(notifications).inserted_ids
+
+    return {"phone": phones[len(phones) // 2], "order_number": orders[len(orders) // 2]["order_number"],
+            "staff_id": str(staff_ids[0]), "staff_email": staff[0]["email"],
+            "notification_ids": [str(notification_id) for notification_id in notification_ids[:5]]}
+
+def build_checks(keys: dict) -> list:
+    """(name, function, options) for every hot query path, calling the real code"""
+    from api.services.auth_service import AuthService
+    from api.services.menu_service import MenuAPIService
+    from api.services.order_service import OrderAPIService
+    from services.conversation_service import ConversationService
+    from services.state_manager import StateManager
+    from services.webhook_notification_service import webhook_notification_service
+    from tools.menu_tools import show_menu_base
+    from tools.order_tools import add_to_order_base, view_current_order_base
+
+    phone = keys["phone"]
+    orders = OrderAPIService()
+    menu = MenuAPIService()
+    auth = AuthService()
+    unknown_user = SimpleNamespace(email=keys["staff_email"], phone_number="920000000000")
+    phone_update = SimpleNamespace(name=None, phone_number="92399999999", address=None, city=None, postal_code=None)
+    # Free-text search on name/description can't use an index; the menu is small
+    regex_search = {"scan_ok": "unanchored regex search", "max_ratio": None}
+
+    return [
+        ("ConversationService.get_conversation_history", lambda: ConversationService.get_conversation_history(phone), {}),
+        ("StateManager.get_user_state", lambda: StateManager.get_user_state(phone), {}),
+        ("StateManager.update_user_state", lambda: StateManager.update_user_state(phone, "ordering"), {}),
+        ("OrderAPIService.get_all_orders", lambda: orders.get_all_orders(), {}),
+        ("OrderAPIService.get_all_orders(status)", lambda: orders.get_all_orders(status="confirmed"), {}),
+        ("OrderAPIService.count_orders(status)", lambda: orders.count_orders(status="preparing"), {}),
+        ("OrderAPIService.get_order_by_number", lambda: orders.get_order_by_number(keys["order_number"]), {}),
+        ("OrderAPIService.get_orders_by_phone", lambda: orders.get_orders_by_phone(phone), {}),
+        ("OrderAPIService.get_active_orders", lambda: orders.get_active_orders(), {}),
+        ("MenuAPIService.get_next_id", lambda: menu.get_next_id(), {}),
+        ("MenuAPIService.get_all_items", lambda: menu.get_all_items(), {}),
+        ("MenuAPIService.get_all_items(category)", lambda: menu.get_all_items(category="pizza"), {}),
+        ("MenuAPIService.count_items(category)", lambda: menu.count_items(category="pizza"), {}),
+        ("MenuAPIService.get_item_by_id", lambda: menu.get_item_by_id(42), {}),
+        ("MenuAPIService.get_categories", lambda: menu.get_categories(), {}),
+        ("MenuAPIService.search_items", lambda: menu.search_items("item 4"), regex_search),
+        ("AuthService.register_user (duplicate check)", lambda: auth.register_user(unknown_user), {}),
+        ("AuthService.get_user_by_email", lambda: auth.get_user_by_email(keys["staff_email"]), {}),
+        ("AuthService.get_user_by_id", lambda: auth.get_user_by_id(keys["staff_id"]), {}),
+        ("AuthService.update_user (phone check)", lambda: auth.update_user(keys["staff_id"], phone_update), {}),
+        ("tools.show_menu", lambda: show_menu_base("Pizza"), {}),
+        ("tools.view_current_order", lambda: view_current_order_base(phone), {}),
+        ("tools.add_to_order", lambda: add_to_order_base(phone, [3, 7], [1, 2]), {}),
+        ("WebhookNotificationService.get_unread_notifications",
+         lambda: webhook_notification_service.get_unread_notifications(), {}),
+        ("WebhookNotificationService.get_recent_count", lambda: webhook_notification_service.get_recent_count(), {}),
+        ("WebhookNotificationService.mark_as_read",
+         lambda: webhook_notification_service.mark_as_read(keys["notification_ids"]), {}),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain every hot Mongo query and fail on unindexed plans")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="ez_order_query_plans", help="throwaway database (dropped)")
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--max-ratio", type=float, default=2.0, help="max documents examined per document returned")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep-data", action="store_true", help="leave the test database in place")
+    parser.add_argument("--verbose", action="store_true", help="print the filter and plan of every query")
+    args = parser.parse_args()
+
+    if args.db_name == "restaurant_db":
+        print("❌ Refusing to seed and drop the application database; pick another --db-name")
+        sys.exit(2)
+
+    # Point the application modules at the test database before they connect
+    os.environ["MONGO_URI"] = args.mongo_uri
+    os.environ["MONGO_DB_NAME"] = args.db_name
+    os.environ["CONVERSATION_WRITE_BEHIND"] = "false"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    recorder = QueryRecorder(args.db_name)
+    monitoring.register(recorder)
+
+    from config.database import db
+    from config.indexes import IndexManager
+    if db is None:
+        sys.exit(2)
+
+    db.client.drop_database(args.db_name)
+    print(f"🌱 Seeding {args.db_name} with {args.customers} synthetic customers...")
+    keys = seed(db, args.customers, random.Random(args.seed))
+    report = IndexManager(db.db).apply(force=True)
+    if report["failed"]:
+        sys.exit(1)
+
+    failures = 0
+    try:
+        for name, func, options in build_checks(keys):
+            commands, error = recorder.record(func)
+            if error and (args.verbose or not commands):
+                # Some checks fail on purpose after their query (e.g. a duplicate registration)
+                print(f"⚠️ {name} raised {type(error).__name__}: {error}")
+            if not commands:
+                failures += 1
+                print(f"❌ {name}: sent no queries (is the check still calling the database?)")
+                continue
+            for command in commands:
+                result = evaluate(db.db, command, options.get("scan_ok"), options.get("max_ratio", args.max_ratio))
+                failures += bool(result["problems"])
+                status = "❌" if result["problems"] else "✅"
+                plan = "+".join(dict.fromkeys(result["stages"])) or "?"
+                print(f"{status} {name}: {result['command']} {result['collection']} {plan} "
+                      f"examined {result['examined']} / returned {result['returned']}"
+                      f"{' - ' + ', '.join(result['problems']) if result['problems'] else ''}"
+                      f"{' (allowed: ' + options['scan_ok'] + ')' if options.get('scan_ok') else ''}")
+                if args.verbose or result["problems"]:
+                    print(f"     filter: {result['filter']}")
+    finally:
+        if not args.keep_data:
+            db.client.drop_database(args.db_name)
+
+    if failures:
+        print(f"\n❌ {failures} query plan(s) failed")
+        sys.exit(1)
+    print("\n✅ Every captured query uses an index")
+
+if __name__ == "__main__":
+    main()
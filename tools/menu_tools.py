@@ -1,37 +1,63 @@
 from agents import function_tool
-from pymongo import MongoClient
-import os
+from config.settings import settings
+from utils.deadline import run_tool_with_deadline
+from typing import Dict, List
+import asyncio
+import hashlib
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+class MenuCache:
+    """Short-lived in-process copy of the menu for lookups that don't need a fresh query"""
+    
+    def __init__(self, ttl_seconds: int = 60):
+        self.ttl_seconds = ttl_seconds
+        self._items: List[Dict] = []
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.version = ""
+    
+    def get_items(self) -> List[Dict]:
+        """Return menu items sorted by category and id, reloading when stale"""
+        with self._lock:
+            if self._items and time.time() - self._loaded_at < self.ttl_seconds:
+                return self._items
+        
+        from config.database import db
+        items = list(db.menu.find({}, {"_id": 0}).sort([("category", 1), ("id", 1)]))
+        
+        # Content hash, so anything derived from the menu can tell when it changed
+        version = hashlib.sha1(repr(items).encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            self._items = items
+            self._loaded_at = time.time()
+            self.version = version
+        return items
+    
+    def get_version(self) -> str:
+        """Version of the current menu (reloads first if stale)"""
+        self.get_items()
+        return self.version
+    
+    def invalidate(self):
+        """Force the next lookup to reload the menu"""
+        with self._lock:
+            self._loaded_at = 0.0
+
+menu_cache = MenuCache(ttl_seconds=settings.MENU_CACHE_TTL_SECONDS)
+
 def get_db_connection():
-    """Get a fresh database connection"""
+    """Get the shared, pooled database connection"""
     try:
-        mongo_uri = os.getenv("MONGO_URI")
-        if not mongo_uri:
-            print("❌ MONGO_URI not found in environment variables")
-            from config.database import db
-            return db
-        
-        client = MongoClient(
-            mongo_uri,
-            serverSelectionTimeoutMS=5000,
-            connectTimeoutMS=5000,
-            socketTimeoutMS=5000
-        )
-        
-        client.admin.command('ping')
-        return client['restaurant_db']
-        
+        from config.database import db
+        return db
     except Exception as e:
-        print(f"❌ Error creating database connection: {e}")
-        try:
-            from config.database import db
-            return db
-        except:
-            return None
+        print(f"❌ Error getting database connection: {e}")
+        return None
 
 def show_menu_base(category: str = "all") -> str:
     """Base function that shows restaurant menu with proper WhatsApp formatting and spacing"""
@@ -129,13 +155,14 @@ def test_menu_connection_base() -> str:
     except Exception as e:
         return f"❌ Error testing menu: {str(e)}"
 
-# Decorated versions for agent use
+# Decorated versions for agent use (async so blocking Mongo calls run off the event loop,
+# bounded by the current turn's deadline)
 @function_tool
-def show_menu(category: str = "all") -> str:
+async def show_menu(category: str = "all") -> str:
     """Shows restaurant menu with proper WhatsApp formatting and spacing"""
-    return show_menu_base(category)
+    return await asyncio.to_thread(run_tool_with_deadline, show_menu_base, category)
 
 @function_tool
-def test_menu_connection() -> str:
+async def test_menu_connection() -> str:
     """Test if menu can be accessed properly"""
-    return test_menu_connection_base()
+    return await asyncio.to_thread(run_tool_with_deadline, test_menu_connection_base)
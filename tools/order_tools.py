@@ -1,34 +1,37 @@
 from typing import List, Dict
 from datetime import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from agents import function_tool
 from config.database import db
 from models.order import Order, OrderItem
+from services.cart_store import cart_store
 from utils.phone_utils import clean_phone_number
+from utils.deadline import DeadlineExceeded, check_deadline, run_tool_with_deadline
+import asyncio
 import json
 
 class OrderManager:
-    user_states: Dict[str, Dict] = {}
+    """Cart access for the order tools; carts live in the shared cart store"""
+    store = cart_store
     
     @classmethod
     def get_or_create_order(cls, phone_number: str) -> Order:
         """Get or create order with consistent phone handling"""
         cleaned_phone = clean_phone_number(phone_number)
-        
-        if cleaned_phone not in cls.user_states:
-            cls.user_states[cleaned_phone] = {}
-            
-        if 'current_order' not in cls.user_states[cleaned_phone]:
-            cls.user_states[cleaned_phone]['current_order'] = Order(cleaned_phone)
-            
-        return cls.user_states[cleaned_phone]['current_order']
+        return cls.store.get(cleaned_phone)
+    
+    @classmethod
+    def update_order(cls, phone_number: str, mutate) -> Order:
+        """Apply a change to a user's order and persist it"""
+        cleaned_phone = clean_phone_number(phone_number)
+        return cls.store.update(cleaned_phone, mutate)
     
     @classmethod
     def clear_order(cls, phone_number: str):
         """Clear order for a user"""
         cleaned_phone = clean_phone_number(phone_number)
-        
-        if cleaned_phone in cls.user_states:
-            cls.user_states[cleaned_phone]['current_order'] = Order(cleaned_phone)
+        cls.store.clear(cleaned_phone)
 
 # Base functions that can be called directly
 
@@ -45,9 +48,8 @@ def add_to_order_base(phone_number: str, item_ids: List[int], quantities: List[i
         if quantities is None:
             quantities = [1] * len(item_ids)
             
-        order = OrderManager.get_or_create_order(cleaned_phone)
         order_summary = "✅ *Added to your order:*\n\n"
-        items_added = 0
+        new_items = []
         
         for item_id, quantity in zip(item_ids, quantities):
             if quantity <= 0:
@@ -62,12 +64,19 @@ def add_to_order_base(phone_number: str, item_ids: List[int], quantities: List[i
                     price=item['price'],
                     quantity=quantity
                 )
-                order.add_item(order_item)
+                new_items.append(order_item)
                 
                 order_summary += f"• {quantity}x *{item['name']}* - *PKR{item['price'] * quantity:.2f}*\n"
-                items_added += 1
         
+        items_added = len(new_items)
         if items_added > 0:
+            def add_items(current: Order):
+                for order_item in new_items:
+                    current.add_item(order_item)
+            
+            # One atomic write to the shared cart for all items
+            check_deadline("updating the cart")
+            order = OrderManager.update_order(cleaned_phone, add_items)
             order_summary += f"\n💰 *Current Total: PKR{order.total:.2f}*\n\n"
             order_summary += "_Send *'view order'* to see cart_\n"
             order_summary += "_Send *'menu'* for more items_\n"
@@ -77,6 +86,9 @@ def add_to_order_base(phone_number: str, item_ids: List[int], quantities: List[i
             
         return order_summary
         
+    except DeadlineExceeded as e:
+        print(f"⏱ {e}")
+        return "⏱ That took too long, so nothing was added. Please send it again."
     except Exception as e:
         print(f"Error in add_to_order: {str(e)}")
         return f"❌ Error: Please try again."
@@ -107,6 +119,36 @@ def view_current_order_base(phone_number: str) -> str:
         print(f"Error in view_current_order: {str(e)}")
         return f"❌ Error viewing order: {str(e)}"
 
+def next_order_number() -> str:
+    """Allocate the next order number from an atomic counter (safe across workers)"""
+    if db.counters.find_one({"_id": "order_number"}) is None:
+        # First use: start after the highest number given out so far (deleted orders
+        # leave gaps, so the order count can be lower)
+        latest = db.orders.find_one({"order_number": {"$regex": r"^ORD\d+$"}},
+                                    {"order_number": 1}, sort=[("order_number", -1)])
+        highest = int(latest["order_number"][3:]) if latest else 0
+        try:
+            db.counters.update_one({"_id": "order_number"}, {"$max": {"seq": highest}}, upsert=True)
+        except DuplicateKeyError:
+            pass
+    counter = db.counters.find_one_and_update(
+        {"_id": "order_number"}, {"$inc": {"seq": 1}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return f"ORD{counter['seq']:05d}"
+
+def insert_order(order_doc: Dict, attempts: int = 5):
+    """Number and save an order, skipping a number that is already taken"""
+    for attempt in range(attempts):
+        order_doc["order_number"] = next_order_number()
+        try:
+            return db.orders.insert_one(order_doc)
+        except DuplicateKeyError:
+            order_doc.pop("_id", None)
+            if attempt == attempts - 1:
+                raise
+            print(f"⚠️ Order number {order_doc['order_number']} already taken, allocating another")
+
 def confirm_order_base(phone_number: str, delivery_notes: str = "") -> str:
     """Base function that confirms and saves the order with proper error handling and notifications"""
     try:
@@ -122,10 +164,6 @@ def confirm_order_base(phone_number: str, delivery_notes: str = "") -> str:
         if not order.items:
             return "⚠ Your cart is empty. Please add items before confirming!"
         
-        # Generate simple order number
-        order_count = db.orders.count_documents({})
-        order_number = f"ORD{order_count + 1:05d}"
-        
         # Create order document
         order_doc = {
             "phone_number": cleaned_phone,
@@ -143,19 +181,22 @@ def confirm_order_base(phone_number: str, delivery_notes: str = "") -> str:
             "delivery_postal": user.get('postal_code', ''),
             "delivery_notes": delivery_notes or "",
             "status": "confirmed",
-            "created_at": datetime.utcnow(),
-            "order_number": order_number
+            "created_at": datetime.utcnow()
         }
         
-        print(f"Attempting to save order: {order_number}")
+        print(f"Attempting to save order for {cleaned_phone}")
         print(f"Order document: {order_doc}")
         
+        # Never place an order for a turn that has already been abandoned
+        check_deadline("placing the order")
+        
         # Save to database
         try:
-            result = db.orders.insert_one(order_doc)
+            result = insert_order(order_doc)
+            order_number = order_doc["order_number"]
             
             if result.inserted_id:
-                print(f"✅ Order saved successfully! ID: {result.inserted_id}")
+                print(f"✅ Order {order_number} saved successfully! ID: {result.inserted_id}")
                 
                 # Create notification using the webhook notification service
                 from services.webhook_notification_service import webhook_notification_service
@@ -193,25 +234,29 @@ def confirm_order_base(phone_number: str, delivery_notes: str = "") -> str:
         
         return confirmation
         
+    except DeadlineExceeded as e:
+        print(f"⏱ {e}")
+        return "⏱ That took too long, so your order was not placed yet. Please send *confirm* again."
     except Exception as e:
         print(f"❌ Critical error in confirm_order: {str(e)}")
         import traceback
         traceback.print_exc()
         return "⚠ Critical error. Your order was not processed. Please try again."
 
-# Decorated versions for agent use
+# Decorated versions for agent use (async so blocking Mongo calls run off the event loop,
+# bounded by the current turn's deadline)
 
 @function_tool
-def add_to_order(phone_number: str, item_ids: List[int], quantities: List[int] = None) -> str:
+async def add_to_order(phone_number: str, item_ids: List[int], quantities: List[int] = None) -> str:
     """Adds items to order with better formatting"""
-    return add_to_order_base(phone_number, item_ids, quantities)
+    return await asyncio.to_thread(run_tool_with_deadline, add_to_order_base, phone_number, item_ids, quantities)
 
 @function_tool
-def view_current_order(phone_number: str) -> str:
+async def view_current_order(phone_number: str) -> str:
     """Shows the current order for the user"""
-    return view_current_order_base(phone_number)
+    return await asyncio.to_thread(run_tool_with_deadline, view_current_order_base, phone_number)
 
 @function_tool
-def confirm_order(phone_number: str, delivery_notes: str = "") -> str:
+async def confirm_order(phone_number: str, delivery_notes: str = "") -> str:
     """Confirms and saves the order with proper error handling and notifications"""
-    return confirm_order_base(phone_number, delivery_notes)
+    return await asyncio.to_thread(run_tool_with_deadline, confirm_order_base, phone_number, delivery_notes)
@@ -1,11 +1,12 @@
 from datetime import datetime
 from agents import function_tool
+import asyncio
 from config.database import db
 from utils.phone_utils import clean_phone_number
+from utils.deadline import run_tool_with_deadline
 
-@function_tool
-def validate_and_save_user(phone_number: str, name: str, address: str, city: str, postal_code: str = "") -> str:
-    """Saves user information with minimal validation - let the LLM handle validation logic"""
+def validate_and_save_user_base(phone_number: str, name: str, address: str, city: str, postal_code: str = "") -> str:
+    """Base function that saves user information with minimal validation"""
     try:
         cleaned_phone = clean_phone_number(phone_number)
 
@@ -53,6 +54,12 @@ You're all set! I'll show you our menu now... 🍕 """
         print(f"Error in validate_and_save_user: {str(e)}")
         return " ⚠ Sorry, there was an error saving your details. Please try again."
 
+@function_tool
+async def validate_and_save_user(phone_number: str, name: str, address: str, city: str, postal_code: str = "") -> str:
+    """Saves user information with minimal validation - let the LLM handle validation logic"""
+    return await asyncio.to_thread(run_tool_with_deadline, validate_and_save_user_base,
+                                   phone_number, name, address, city, postal_code)
+
 @function_tool
 def validate_name(name: str) -> str:
     if not name or not name.strip():
@@ -0,0 +1,85 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Optional
+from utils.run_trace import tool_span
+import pymongo
+import time
+
+class DeadlineExceeded(Exception):
+    """Raised when work is started after its message's deadline has passed"""
+
+class Deadline:
+    """Time budget for handling one customer turn.
+
+    It is set in a context variable, so it follows the turn into agent tools, including
+    the ones run through asyncio.to_thread (which copies the context). A deadline is also
+    cancelled explicitly when its agent run is abandoned, so tools still running in a
+    thread don't go on to change the cart or place an order.
+    """
+
+    def __init__(self, seconds: float, started_at: Optional[float] = None):
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self.expires_at = self.started_at + seconds
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        if self.cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.cancelled or time.monotonic() >= self.expires_at
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self, what: str = "work"):
+        """Refuse to start `what` once the deadline has passed"""
+        if self.expired():
+            reason = "cancelled" if self.cancelled else "past its deadline"
+            raise DeadlineExceeded(f"Not starting {what}: message handling was {reason}")
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+@contextmanager
+def deadline_scope(seconds: float, started_at: Optional[float] = None):
+    """Run a block (and everything it awaits or hands to threads) under a deadline"""
+    deadline = Deadline(seconds, started_at)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+def check_deadline(what: str = "work"):
+    """Raise DeadlineExceeded if the current turn's deadline has passed (no-op without one)"""
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(what)
+
+def remaining_time(default: float) -> float:
+    """Seconds left in the current turn, capped at `default`"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return default
+    return min(default, deadline.remaining())
+
+def mongo_deadline():
+    """pymongo.timeout() for the time left in the current turn (blocking Mongo calls)"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return nullcontext()
+    deadline.check("database call")
+    return pymongo.timeout(deadline.remaining())
+
+def run_tool_with_deadline(func, *args, **kwargs) -> str:
+    """Call a blocking tool function under the current turn's deadline (via asyncio.to_thread)"""
+    try:
+        with tool_span(func.__name__.replace("_base", "")), mongo_deadline():
+            return func(*args, **kwargs)
+    except DeadlineExceeded as e:
+        print(f"⏱ {e}")
+        return "⏱ This request took too long and was stopped. Please send it again."
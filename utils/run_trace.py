@@ -0,0 +1,239 @@
+from collections import deque
+from config.settings import settings
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pymongo import monitoring
+from typing import Deque, Dict, List, Optional
+import asyncio
+import hashlib
+import json
+import threading
+import time
+
+class ToolSpan:
+    """One tool call inside an agent turn, with the Mongo time spent inside it"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.monotonic()
+        self.seconds = 0.0
+        self.mongo_ms = 0.0
+        self.mongo_ops = 0
+
+    def to_dict(self) -> Dict:
+        return {"name": self.name, "seconds": round(self.seconds, 3),
+                "mongo_ms": round(self.mongo_ms, 1), "mongo_ops": self.mongo_ops}
+
+class TurnTrace:
+    """Where the time of one agent turn went: queue, model calls, tools and Mongo"""
+
+    def __init__(self, agent: str, phone_number: str = "", tier: str = ""):
+        self.agent = agent
+        # Hashed so traces can be shared without customer phone numbers in them
+        self.customer = hashlib.sha1(phone_number.encode("utf-8")).hexdigest()[:10] if phone_number else ""
+        self.tier = tier
+        self.started_at = datetime.utcnow()
+        self.started = time.monotonic()
+        self.seconds = 0.0
+        self.queue_wait = 0.0
+        self.prompt_tokens = 0
+        self.llm_calls: List[Dict] = []
+        self.tools: List[ToolSpan] = []
+        # Tools the agent started, including ones still running when the turn failed
+        self.tools_started: List[str] = []
+        self.mongo_ms = 0.0
+        self.mongo_ops = 0
+        self.escalations: List[str] = []
+        self.outcome = "ok"
+        self._lock = threading.Lock()
+
+    def add_llm_call(self, model: str, seconds: float, input_tokens: int = 0, output_tokens: int = 0,
+                     error: Optional[str] = None):
+        call = {"model": model, "seconds": round(seconds, 3),
+                "input_tokens": input_tokens, "output_tokens": output_tokens}
+        if error:
+            call["error"] = error
+        with self._lock:
+            self.llm_calls.append(call)
+
+    def add_tool(self, span: ToolSpan):
+        with self._lock:
+            self.tools.append(span)
+
+    def add_mongo(self, milliseconds: float):
+        with self._lock:
+            self.mongo_ms += milliseconds
+            self.mongo_ops += 1
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            tools = [span.to_dict() for span in self.tools]
+            llm_calls = list(self.llm_calls)
+        tool_mongo_ms = sum(span["mongo_ms"] for span in tools)
+        return {
+            "at": self.started_at.isoformat(),
+            "agent": self.agent,
+            "customer": self.customer,
+            "tier": self.tier,
+            "outcome": self.outcome,
+            "seconds": round(self.seconds, 3),
+            "queue_wait": round(self.queue_wait, 3),
+            "prompt_tokens": self.prompt_tokens,
+            "llm_calls": llm_calls,
+            "llm_seconds": round(sum(call["seconds"] for call in llm_calls), 3),
+            "input_tokens": sum(call["input_tokens"] for call in llm_calls),
+            "output_tokens": sum(call["output_tokens"] for call in llm_calls),
+            "tools": tools,
+            "tool_seconds": round(sum(span["seconds"] for span in tools), 3),
+            "mongo_ms": round(self.mongo_ms, 1),
+            "mongo_ms_outside_tools": round(max(0.0, self.mongo_ms - tool_mongo_ms), 1),
+            "mongo_ops": self.mongo_ops,
+            "escalations": list(self.escalations)
+        }
+
+_current_turn: ContextVar[Optional[TurnTrace]] = ContextVar("current_turn", default=None)
+_current_tool: ContextVar[Optional[ToolSpan]] = ContextVar("current_tool", default=None)
+
+def current_turn() -> Optional[TurnTrace]:
+    return _current_turn.get()
+
+@contextmanager
+def tool_span(name: str):
+    """Time a tool call (and its Mongo commands) inside the current turn; no-op without one"""
+    turn = _current_turn.get()
+    if turn is None:
+        yield None
+        return
+    span = ToolSpan(name)
+    token = _current_tool.set(span)
+    try:
+        yield span
+    finally:
+        _current_tool.reset(token)
+        span.seconds = time.monotonic() - span.started
+        turn.add_tool(span)
+
+class MongoCommandTimer(monitoring.CommandListener):
+    """Adds the server round-trip time of every Mongo command to the turn that issued it.
+
+    pymongo publishes command events on the thread running the command, so the turn and
+    tool set in context variables (which asyncio.to_thread copies) are visible here.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.duration_micros)
+
+    def failed(self, event):
+        self._record(event.duration_micros)
+
+    def _record(self, duration_micros: int):
+        turn = _current_turn.get()
+        if turn is None:
+            return
+        milliseconds = duration_micros / 1000
+        turn.add_mongo(milliseconds)
+        span = _current_tool.get()
+        if span is not None:
+            span.mongo_ms += milliseconds
+            span.mongo_ops += 1
+
+class RunTracer:
+    """Keeps the last agent turns in a ring buffer, optionally appending each to a JSONL file.
+
+    Summaries give p50/p95/p99 of turn time, model time per call, tool time and Mongo time,
+    so a slow turn can be split into queueing, model round trips and database work.
+    """
+
+    def __init__(self, buffer_size: int = 500, jsonl_path: str = ""):
+        self._records: Deque[Dict] = deque(maxlen=max(1, buffer_size))
+        self._lock = threading.Lock()
+        self.jsonl_path = jsonl_path
+        self._jsonl = None
+        self.stats = {"turns": 0, "outcomes": {}, "sink_errors": 0}
+
+    @contextmanager
+    def turn(self, agent: str, phone_number: str = "", tier: str = ""):
+        """Trace one agent turn; everything awaited or sent to threads inside it is attributed to it"""
+        trace = TurnTrace(agent, phone_number, tier)
+        token = _current_turn.set(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            if trace.outcome == "ok":
+                trace.outcome = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            raise
+        finally:
+            _current_turn.reset(token)
+            trace.seconds = time.monotonic() - trace.started
+            self.record(trace)
+
+    def record(self, trace: TurnTrace):
+        record = trace.to_dict()
+        with self._lock:
+            self._records.append(record)
+            self.stats["turns"] += 1
+            self.stats["outcomes"][trace.outcome] = self.stats["outcomes"].get(trace.outcome, 0) + 1
+            if self.jsonl_path:
+                self._write(record)
+
+    def _write(self, record: Dict):
+        try:
+            if self._jsonl is None:
+                self._jsonl = open(self.jsonl_path, "a", encoding="utf-8", buffering=1)
+            self._jsonl.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            self.stats["sink_errors"] += 1
+            if self.stats["sink_errors"] == 1:
+                print(f"⚠️ Could not write agent trace to {self.jsonl_path}: {e}")
+
+    def publish(self, collection, worker_id: str, recent: int = 20):
+        """Store this process's summary and latest turns in Mongo for the admin API (blocking)"""
+        collection.replace_one(
+            {"_id": worker_id},
+            {"summary": self.get_stats(), "recent": self.recent(recent), "updated_at": datetime.utcnow()},
+            upsert=True
+        )
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            return list(self._records)[-limit:]
+
+    def get_stats(self) -> Dict:
+        def summary(values: List[float]) -> Dict:
+            ordered = sorted(values)
+            if not ordered:
+                return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+            return {f"p{int(p * 100)}": round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3)
+                    for p in (0.50, 0.95, 0.99)}
+
+        with self._lock:
+            records = list(self._records)
+            stats = {**self.stats, "outcomes": dict(self.stats["outcomes"])}
+
+        calls = [call for record in records for call in record["llm_calls"]]
+        tools: Dict[str, List[float]] = {}
+        for record in records:
+            for span in record["tools"]:
+                tools.setdefault(span["name"], []).append(span["seconds"])
+        return {
+            **stats,
+            "buffered": len(records),
+            "turn_seconds": summary([record["seconds"] for record in records]),
+            "queue_wait_seconds": summary([record["queue_wait"] for record in records]),
+            "llm_call_seconds": summary([call["seconds"] for call in calls]),
+            "llm_calls_per_turn": summary([len(record["llm_calls"]) for record in records]),
+            "tool_seconds": {name: {**summary(values), "calls": len(values)} for name, values in tools.items()},
+            "mongo_ms_per_turn": summary([record["mongo_ms"] for record in records]),
+            "avg_input_tokens": round(sum(record["input_tokens"] for record in records) / len(records), 1)
+            if records else 0.0,
+            "avg_output_tokens": round(sum(record["output_tokens"] for record in records) / len(records), 1)
+            if records else 0.0
+        }
+
+# Global instances (the timer is passed to the MongoClient in config/database.py)
+mongo_command_timer = MongoCommandTimer()
+run_tracer = RunTracer(buffer_size=settings.AGENT_TRACE_BUFFER_SIZE, jsonl_path=settings.AGENT_TRACE_JSONL)